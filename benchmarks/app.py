@@ -0,0 +1,45 @@
+# benchmarks/app.py
+"""
+The service app with prompts loaded from the prompts/ directory.
+
+LangSmith is not reachable in benchmarks, so the prompt manager's caches are
+filled from the local prompt files before the app is used.
+"""
+import re
+from pathlib import Path
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.config import settings
+from src.main import app  # noqa: F401
+from src.utils.langsmith_prompt_manager import LangsmithPromptManager
+
+PROMPTS_DIR = Path(__file__).resolve().parents[1] / "prompts"
+
+FOLLOWUP_TEMPLATE = (
+    "This is step {step_number} of the sequence. Earlier emails:\n{email_history}\n\n"
+    "Write the next follow-up email in the same JSON format."
+)
+
+
+def _to_f_string(template: str) -> str:
+    """Convert a string.Template prompt ($name) into an f-string prompt ({name})"""
+    escaped = template.replace("{", "{{").replace("}", "}}")
+    return re.sub(r"\$(\w+)", r"{\1}", escaped)
+
+
+def install_local_prompts() -> None:
+    """Fill the prompt manager's caches from the local prompt files"""
+    system_prompt = (PROMPTS_DIR / "system_prompt.txt").read_text().strip()
+    user_template = _to_f_string((PROMPTS_DIR / "user_prompt_template.txt").read_text().strip())
+
+    LangsmithPromptManager._system_prompts[settings.LANGSMITH_SYSTEM_PROMPT_ID] = system_prompt
+    LangsmithPromptManager._user_prompt_templates[settings.LANGSMITH_USER_PROMPT_ID] = (
+        ChatPromptTemplate.from_messages([("human", user_template)])
+    )
+    LangsmithPromptManager._user_prompt_templates[settings.LANGSMITH_USER_FOLLOWUP_PROMPT_ID] = (
+        ChatPromptTemplate.from_messages([("human", FOLLOWUP_TEMPLATE)])
+    )
+
+
+install_local_prompts()
@@ -0,0 +1,113 @@
+# benchmarks/bench_adaptive.py
+"""
+Fixed versus adaptive LLM concurrency through a provider capacity drop.
+
+Starts the fake OpenAI backend with --capacity, then drives OpenAI calls
+through an AdmissionController (the same llm_slot the service uses) from more
+concurrent clients than the provider can take, in three phases:
+
+  normal:   provider capacity --capacity
+  dropped:  provider capacity --dropped-capacity
+  restored: provider capacity --capacity
+
+For each limiter and phase it reports successful calls per second, p50
+latency with and p50/p99 latency without the queue wait (the OpenAI call
+itself), throttled and failed calls and the average pool size.
+
+Run with: python -m benchmarks.bench_adaptive [--clients 96] [--phase 10]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.bench_server import FAKE_OPENAI_PORT, start, stop, wait_until_ready
+from src.services.admission import AdaptiveLimiter, AdmissionController
+
+
+def make_controller(max_concurrency: int, adaptive: bool) -> AdmissionController:
+    return AdmissionController(
+        max_concurrency=max_concurrency,
+        rate_per_second=1e9,
+        burst=1e9,
+        limiter=AdaptiveLimiter(min_limit=2, max_limit=max_concurrency) if adaptive else None,
+    )
+
+
+async def run_phase(controller, client, clients: int, duration: float):
+    latencies, call_latencies, throttled, errors, limits = [], [], 0, 0, []
+    deadline = time.monotonic() + duration
+
+    async def client_loop():
+        nonlocal throttled, errors
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                async with controller.llm_slot():
+                    call_started = time.perf_counter()
+                    await client.chat.completions.create(model="fake", messages=[{"role": "user", "content": "x"}])
+                    call_latencies.append(time.perf_counter() - call_started)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                if getattr(e, "status_code", None) == 429:
+                    throttled += 1
+                else:
+                    errors += 1
+
+    async def sample_limit():
+        while time.monotonic() < deadline:
+            limits.append(controller.queue.capacity)
+            await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await asyncio.gather(sample_limit(), *(client_loop() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return latencies, sorted(call_latencies), throttled, errors, statistics.mean(limits), elapsed
+
+
+async def run(args, adaptive: bool, fake_url: str):
+    from openai import AsyncOpenAI
+
+    controller = make_controller(args.max_concurrency, adaptive)
+    client = AsyncOpenAI(api_key="benchmark", base_url=f"{fake_url}/v1", max_retries=0)
+    async with httpx.AsyncClient(base_url=fake_url) as fake:
+        for phase, capacity in (("normal", args.capacity), ("dropped", args.dropped_capacity),
+                                ("restored", args.capacity)):
+            await fake.post("/fake/capacity", json={"capacity": capacity})
+            latencies, calls, throttled, errors, limit, elapsed = await run_phase(
+                controller, client, args.clients, args.phase
+            )
+            print(f"  {'adaptive' if adaptive else 'fixed':<9} {phase:<9} capacity {capacity:>3}  "
+                  f"{len(latencies) / elapsed:6.1f} ok/s  p50 {statistics.median(latencies) * 1000:6.0f} ms  "
+                  f"call p50 {statistics.median(calls) * 1000:5.0f} ms  p99 {calls[int(len(calls) * 0.99)] * 1000:5.0f} ms"
+                  f"  429s {throttled:>5}  errors {errors:>3}  pool {limit:5.1f}")
+    await client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=96)
+    parser.add_argument("--phase", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM latency in seconds")
+    parser.add_argument("--capacity", type=int, default=32)
+    parser.add_argument("--dropped-capacity", type=int, default=8)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    fake_url = f"http://127.0.0.1:{FAKE_OPENAI_PORT}"
+    fake_backend = start([sys.executable, "-m", "benchmarks.fake_openai", "--port", str(FAKE_OPENAI_PORT),
+                          "--latency", str(args.latency)], None)
+    try:
+        wait_until_ready(f"{fake_url}/v1/models")
+        print(f"clients={args.clients} max concurrency={args.max_concurrency} fake latency={args.latency}s")
+        for adaptive in (False, True):
+            asyncio.run(run(args, adaptive, fake_url))
+    finally:
+        stop(fake_backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_prompt_render.py
+"""
+Microbenchmark of rendering the user and follow-up prompts for a request.
+
+Compares the LangChain path (ChatPromptTemplate.invoke and
+convert_prompt_to_openai_format) with the native path (the prompts compiled
+to format strings), using the local prompts the other benchmarks install,
+and checks that both produce the same prompts for every request.
+
+Run with: OPENAI_API_KEY=x LANGSMITH_TRACING=false python -m benchmarks.bench_prompt_render
+"""
+import statistics
+import sys
+import time
+
+from benchmarks.app import install_local_prompts
+from benchmarks.payloads import email_requests
+from src.api.models import EmailRequest
+from src.config import settings
+from src.utils.langsmith_prompt_manager import LangsmithPromptManager
+
+
+def render(request: EmailRequest):
+    return LangsmithPromptManager.render_prompt(
+        request,
+        user_prompt_id=settings.LANGSMITH_USER_PROMPT_ID,
+        system_prompt_id=settings.LANGSMITH_SYSTEM_PROMPT_ID,
+        user_prompt_followup_id=settings.LANGSMITH_USER_FOLLOWUP_PROMPT_ID,
+    )
+
+
+def measure(requests, native: bool, rounds: int):
+    """Return the rendered prompts and the median render time per request, in seconds"""
+    settings.PROMPT_NATIVE_RENDER = native
+    # The first native render of each prompt is checked against LangChain
+    render(requests[0])
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        rendered = [render(request) for request in requests]
+        timings.append((time.perf_counter() - started) / len(requests))
+    return rendered, statistics.median(timings)
+
+
+def main(batch_size: int = 50, rounds: int = 3) -> None:
+    install_local_prompts()
+    requests = [EmailRequest.model_validate(payload) for payload in email_requests(batch_size)]
+
+    langchain_prompts, langchain_time = measure(requests, native=False, rounds=rounds)
+    native_prompts, native_time = measure(requests, native=True, rounds=rounds)
+
+    print(f"{batch_size} follow-up requests, median of {rounds} rounds")
+    print(f"  langchain: {langchain_time * 1e6:10.1f} us/request")
+    print(f"  native:    {native_time * 1e6:10.1f} us/request  ({langchain_time / native_time:.0f}x)")
+    if native_prompts != langchain_prompts:
+        print("  native prompts differ from LangChain")
+        sys.exit(1)
+    print("  prompts identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_replay.py
+"""
+Reproducible benchmark of the service's own overhead, with the LLM replayed.
+
+First record a corpus against OpenAI or the fake backend:
+
+    LLM_RECORD_MODE=record OPENAI_API_KEY=x OPENAI_BASE_URL=http://127.0.0.1:9100/v1 \\
+        python -m benchmarks.bench_replay --distinct 20 --requests 20
+
+then replay it without network, optionally with the recorded latency
+(LLM_REPLAY_TIMING=true) or under cProfile:
+
+    LLM_RECORD_MODE=replay OPENAI_API_KEY=x python -m benchmarks.bench_replay --requests 500 --profile
+
+Requests go through the full ASGI app in-process, so with instant replays the
+measured time is everything the service does besides waiting for the LLM.
+"""
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import time
+
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+import httpx  # noqa: E402
+
+from benchmarks.app import app  # noqa: E402
+from benchmarks.payloads import email_requests  # noqa: E402
+from src.utils.llm_recorder import llm_recorder  # noqa: E402
+
+
+async def drive(payloads, total: int, concurrency: int):
+    """Send `total` requests cycling through `payloads`, returning latencies and failures"""
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def send(index: int):
+            nonlocal failures
+            async with semaphore:
+                started_at = time.perf_counter()
+                response = await client.post("/api/v1/generate-email", json=payloads[index % len(payloads)])
+                latencies.append(time.perf_counter() - started_at)
+                if response.status_code != 200 or response.json()["theme_used"] == "error":
+                    failures += 1
+
+        await asyncio.gather(*(send(index) for index in range(total)))
+    return latencies, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distinct", type=int, default=20, help="distinct request payloads")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--profile", action="store_true", help="print the top functions by cumulative time")
+    args = parser.parse_args()
+
+    payloads = email_requests(args.distinct)
+    # One untimed request warms up imports and prompt rendering
+    asyncio.run(drive(payloads, 1, 1))
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    started_at = time.perf_counter()
+    latencies, failures = asyncio.run(drive(payloads, args.requests, args.concurrency))
+    elapsed = time.perf_counter() - started_at
+    if profiler:
+        profiler.disable()
+
+    latencies.sort()
+    print(f"mode={llm_recorder.mode} corpus={llm_recorder.corpus_path} timing={llm_recorder.replay_timing}")
+    print(f"{args.requests} requests in {elapsed:.2f}s: {args.requests / elapsed:.1f} req/s, "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms, {failures} failed")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_serialization.py
+"""
+Microbenchmark of the per-request serialization work outside the LLM call.
+
+Compares the previous path (model_dump, re-flattening the dump, json parsing,
+rebuilding and re-validating EmailResponse, json encoding) with the lean path
+(to_template_context, orjson, EmailResponse.content_from).
+
+Run with: OPENAI_API_KEY=x python -m benchmarks.bench_serialization
+"""
+import json
+import time
+
+import orjson
+
+from benchmarks.payloads import LLM_OUTPUT, email_requests
+from src.api.models import EmailRequest, EmailResponse
+
+
+def legacy_template_data(request_data):
+    """The flattening render_prompt used to apply to request.model_dump()"""
+    template_data = {}
+    for section in ("prospect", "company"):
+        for key, value in (request_data.get(section) or {}).items():
+            template_data[f"{section}_{key}"] = str(value) if value is not None else ""
+    default_seller = {
+        "product_name": "Ingren.ai",
+        "category": "AI‑powered outbound automation",
+        "headline_benefit": "Turns 8 hrs of prospect research into 8 min",
+        "unique_proof": "87% faster research → 22% more first‑call bookings",
+        "marquee_case_studies": ""
+    }
+    seller_data = {**default_seller, **(request_data.get("seller") or {})}
+    for key, value in seller_data.items():
+        template_data[f"seller_{key}"] = str(value) if value is not None else ""
+    for key, value in (request_data.get("cta") or {}).items():
+        template_data[f"cta_{key}"] = str(value) if value is not None else ""
+    template_data["sender_name"] = request_data.get("sender_name", "Ingren AI")
+    template_data["email_tone"] = request_data.get("email_tone", "professional")
+    if "sample_email" in request_data:
+        template_data["sample_email"] = request_data["sample_email"]
+    for key, value in (request_data.get("metadata") or {}).items():
+        template_data[key] = str(value) if value is not None else ""
+    return template_data
+
+
+def legacy_path(body: bytes) -> bytes:
+    request = EmailRequest.model_validate(json.loads(body))
+    legacy_template_data(request.model_dump(exclude_none=False))
+    email_data = json.loads(LLM_OUTPUT)
+    response = EmailResponse(
+        theme_used=email_data.get("theme_used", "unknown"),
+        anchor_signal=email_data.get("anchor_signal", "unknown"),
+        subject_line=email_data.get("subject_line", ""),
+        email_body=email_data.get("email_body", "")
+    )
+    # FastAPI re-validates against response_model before encoding
+    validated = EmailResponse.model_validate(response.model_dump())
+    return json.dumps(validated.model_dump()).encode()
+
+
+def lean_path(body: bytes) -> bytes:
+    request = EmailRequest.model_validate_json(body)
+    request.to_template_context()
+    email_data = orjson.loads(LLM_OUTPUT)
+    return orjson.dumps(EmailResponse.content_from(email_data))
+
+
+def measure(path, bodies, rounds: int) -> float:
+    """Return requests per second for the best of `rounds` passes"""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for body in bodies:
+            path(body)
+        best = min(best, time.perf_counter() - started)
+    return len(bodies) / best
+
+
+def main(batch_size: int = 5000, rounds: int = 5) -> None:
+    bodies = [orjson.dumps(payload) for payload in email_requests(batch_size)]
+    legacy = measure(legacy_path, bodies, rounds)
+    lean = measure(lean_path, bodies, rounds)
+    print(f"batch of {batch_size} requests, best of {rounds} rounds")
+    print(f"  legacy: {legacy:10.0f} req/s")
+    print(f"  lean:   {lean:10.0f} req/s  ({lean / legacy:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
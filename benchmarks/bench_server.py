@@ -0,0 +1,128 @@
+# benchmarks/bench_server.py
+"""
+Throughput of the dev server mode versus the production server.
+
+Starts the fake OpenAI backend, then for each mode starts the service, drives
+/api/v1/generate-email with concurrent clients for a fixed duration and reports
+requests per second and latency percentiles.
+
+  dev:        uvicorn, single process (what src/main.py runs, minus the reloader)
+  production: python -m src.server (gunicorn, preloaded, WEB_CONCURRENCY workers)
+
+Run with: python -m benchmarks.bench_server [--concurrency 64] [--duration 10]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.payloads import email_requests
+
+ROOT = Path(__file__).resolve().parents[1]
+FAKE_OPENAI_PORT = 9100
+SERVICE_PORT = 9101
+
+MODES = {
+    "dev": [sys.executable, "-m", "uvicorn", "benchmarks.app:app",
+            "--host", "127.0.0.1", "--port", str(SERVICE_PORT), "--log-level", "warning"],
+    "production": [sys.executable, "-m", "src.server", "benchmarks.app:app"],
+}
+
+
+def start(command, env) -> subprocess.Popen:
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+async def drive(base_url: str, concurrency: int, duration: float):
+    """Send requests from `concurrency` clients for `duration` seconds"""
+    payloads = email_requests(concurrency * 4)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def client_loop(index: int):
+        nonlocal errors
+        async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+            sent = 0
+            while time.monotonic() < deadline:
+                payload = payloads[(index + sent * concurrency) % len(payloads)]
+                started = time.perf_counter()
+                response = await client.post("/api/v1/generate-email", json=payload)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+                sent += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(index) for index in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency in seconds")
+    parser.add_argument("--modes", nargs="+", default=list(MODES))
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{FAKE_OPENAI_PORT}/v1",
+        "LANGSMITH_TRACING": "false",
+        "HOST": "127.0.0.1",
+        "PORT": str(SERVICE_PORT),
+        "PYTHONPATH": str(ROOT),
+        # The load generator is a single tenant; keep its quota out of the way
+        "TENANT_RATE_PER_SECOND": "1000000",
+        "TENANT_BURST": "1000000",
+    }
+    fake_openai = start([sys.executable, "-m", "benchmarks.fake_openai", "--port", str(FAKE_OPENAI_PORT),
+                         "--latency", str(args.latency)], env)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{FAKE_OPENAI_PORT}/v1/models")
+        base_url = f"http://127.0.0.1:{SERVICE_PORT}"
+        print(f"concurrency={args.concurrency} duration={args.duration}s fake latency={args.latency}s"
+              f" cores={os.cpu_count()}")
+        for mode in args.modes:
+            service = start(MODES[mode], env)
+            try:
+                wait_until_ready(f"{base_url}/api/v1/health")
+                latencies, errors, elapsed = asyncio.run(drive(base_url, args.concurrency, args.duration))
+            finally:
+                stop(service)
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(f"  {mode:<10} {len(latencies) / elapsed:8.1f} req/s"
+                  f"  p50 {quantiles[49] * 1000:7.1f} ms  p99 {quantiles[98] * 1000:7.1f} ms  errors {errors}")
+    finally:
+        stop(fake_openai)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_tracing.py
+"""
+Latency overhead of LangSmith tracing, against the fake OpenAI and LangSmith backend.
+
+For each mode the service is started with the given tracing settings, driven
+like benchmarks.bench_server, and compared with tracing switched off:
+
+  off:      LANGSMITH_TRACING=false
+  sampled:  LANGSMITH_TRACING=true, TRACING_SAMPLE_RATE=0.1
+  full:     LANGSMITH_TRACING=true, TRACING_SAMPLE_RATE=1.0
+
+The budget is OVERHEAD_BUDGET of p50 latency over "off" in any mode; the
+script exits non-zero if a mode exceeds it.
+
+Run with: python -m benchmarks.bench_tracing [--concurrency 8] [--duration 10]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+
+import httpx
+
+from benchmarks.bench_server import FAKE_OPENAI_PORT, MODES, ROOT, SERVICE_PORT, drive, start, stop, wait_until_ready
+
+# Tracing may add at most this fraction to p50 latency
+OVERHEAD_BUDGET = 0.10
+
+TRACING_MODES = {
+    "off": {"LANGSMITH_TRACING": "false"},
+    "sampled": {"LANGSMITH_TRACING": "true", "TRACING_SAMPLE_RATE": "0.1"},
+    "full": {"LANGSMITH_TRACING": "true", "TRACING_SAMPLE_RATE": "1.0"},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency in seconds")
+    args = parser.parse_args()
+
+    fake_url = f"http://127.0.0.1:{FAKE_OPENAI_PORT}"
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "LANGSMITH_API_KEY": "benchmark",
+        "LANGSMITH_ENDPOINT": fake_url,
+        "PYTHONPATH": str(ROOT),
+        "TENANT_RATE_PER_SECOND": "1000000",
+        "TENANT_BURST": "1000000",
+    }
+    fake_backend = start([sys.executable, "-m", "benchmarks.fake_openai", "--port", str(FAKE_OPENAI_PORT),
+                          "--latency", str(args.latency)], env)
+    base_url = f"http://127.0.0.1:{SERVICE_PORT}"
+    results = {}
+    try:
+        wait_until_ready(f"{fake_url}/v1/models")
+        print(f"concurrency={args.concurrency} duration={args.duration}s fake latency={args.latency}s")
+        for mode, tracing_env in TRACING_MODES.items():
+            runs_before = httpx.get(f"{fake_url}/fake/runs").json()
+            service = start(MODES["dev"], {**env, **tracing_env})
+            try:
+                wait_until_ready(f"{base_url}/api/v1/health")
+                # Untimed warm-up so imports and client setup are not measured
+                asyncio.run(drive(base_url, 1, 1.0))
+                latencies, errors, elapsed = asyncio.run(drive(base_url, args.concurrency, args.duration))
+            finally:
+                # SIGTERM lets the service flush its trace buffer on exit
+                stop(service)
+            runs_after = httpx.get(f"{fake_url}/fake/runs").json()
+            results[mode] = statistics.median(latencies)
+            print(f"  {mode:<8} {len(latencies) / elapsed:7.1f} req/s  p50 {results[mode] * 1000:7.1f} ms"
+                  f"  errors {errors}  runs exported {runs_after['create'] - runs_before['create']}")
+    finally:
+        stop(fake_backend)
+
+    over_budget = False
+    for mode, p50 in results.items():
+        overhead = p50 / results["off"] - 1
+        within = overhead <= OVERHEAD_BUDGET
+        over_budget |= not within
+        print(f"  {mode:<8} overhead {overhead * 100:+6.1f}%  ({'within' if within else 'OVER'} "
+              f"{OVERHEAD_BUDGET * 100:.0f}% budget)")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/cold_start.py
+"""
+Cold-start measurement of the Lambda handler in a fresh interpreter.
+
+Run with: OPENAI_API_KEY=x python -m benchmarks.cold_start
+to print the timings and rewrite benchmarks/import_profile.txt.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+PROFILE_PATH = ROOT / "benchmarks" / "import_profile.txt"
+
+# Modules only needed by some routes; loading them during init is a regression
+LAZY_MODULES = (
+    "openai",
+    "langsmith.client",
+    "langsmith.run_helpers",
+    "langsmith.wrappers",
+    "langchain_core",
+    "uvicorn",
+    "tldextract",
+)
+
+# Imports the handler and serves one API Gateway health-check event
+SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import lambda_handler
+imported = time.perf_counter()
+event = {
+    "resource": "/{proxy+}",
+    "path": "/api/v1/health",
+    "httpMethod": "GET",
+    "headers": {"Host": "localhost"},
+    "multiValueHeaders": {},
+    "queryStringParameters": None,
+    "multiValueQueryStringParameters": None,
+    "pathParameters": None,
+    "stageVariables": None,
+    "requestContext": {
+        "resourcePath": "/{proxy+}",
+        "httpMethod": "GET",
+        "path": "/api/v1/health",
+        "stage": "dev",
+        "requestId": "cold-start",
+        "identity": {"sourceIp": "127.0.0.1"},
+    },
+    "body": None,
+    "isBase64Encoded": False,
+}
+response = lambda_handler.handler(event, object())
+finished = time.perf_counter()
+print(json.dumps({
+    "status_code": response["statusCode"],
+    "import_seconds": imported - started,
+    "init_seconds": finished - started,
+    "loaded_lazy_modules": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def measure_cold_start(importtime: bool = False) -> Tuple[Dict[str, Any], str]:
+    """
+    Import the handler and serve one health check in a fresh interpreter
+
+    Args:
+        importtime: Whether to run the interpreter with -X importtime
+
+    Returns:
+        Tuple of the measured timings and the interpreter's stderr
+    """
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "cold-start"),
+        "LANGSMITH_TRACING": "false",
+        "PYTHONPATH": str(ROOT),
+    }
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", SNIPPET]
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def top_imports(importtime_output: str, limit: int = 30) -> List[Tuple[int, int, str]]:
+    """Parse -X importtime output into (cumulative us, self us, module), slowest first"""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main() -> None:
+    timings, _ = measure_cold_start()
+    _, importtime_output = measure_cold_start(importtime=True)
+
+    lines = [
+        "# Cold-start import profile of lambda_handler (python -m benchmarks.cold_start)",
+        f"# init (import + first health event): {timings['init_seconds']:.3f}s,"
+        f" import: {timings['import_seconds']:.3f}s",
+        f"# lazy modules loaded during init: {timings['loaded_lazy_modules'] or 'none'}",
+        "#",
+        "# cumulative_us   self_us  module",
+    ]
+    for cumulative_us, self_us, module in top_imports(importtime_output):
+        lines.append(f"{cumulative_us:15d} {self_us:9d}  {module}")
+    PROFILE_PATH.write_text("\n".join(lines) + "\n")
+
+    print(json.dumps(timings, indent=2))
+    print(f"Wrote {PROFILE_PATH.relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/fake_openai.py
+"""
+Fake OpenAI-compatible backend for offline benchmarks.
+
+Serves /v1/chat/completions with a canned email after a configurable delay.
+Point the service at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+With --capacity it behaves like a provider with that many concurrent slots:
+calls beyond the capacity share it and slow down proportionally, and calls
+beyond twice the capacity get 429. POST /fake/capacity {"capacity": n}
+changes it at runtime, to simulate a capacity drop.
+
+It also accepts LangSmith trace uploads and counts them (GET /fake/runs), for
+tracing benchmarks with LANGSMITH_ENDPOINT=http://127.0.0.1:<port>.
+
+Run with: python -m benchmarks.fake_openai --port 9100 --latency 0.05 [--capacity 32]
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.payloads import LLM_OUTPUT
+
+
+def create_fake_openai(latency: float = 0.05, capacity: Optional[int] = None) -> FastAPI:
+    """
+    Create the fake backend app
+
+    Args:
+        latency: Seconds to wait before answering each completion
+        capacity: Concurrent completions served at full speed, unlimited if None
+    """
+    app = FastAPI()
+    provider = {"capacity": capacity, "in_flight": 0, "throttled": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: dict):
+        capacity = provider["capacity"]
+        if capacity is not None and provider["in_flight"] >= 2 * capacity:
+            provider["throttled"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after-ms": "100"},
+            )
+        provider["in_flight"] += 1
+        try:
+            slowdown = 1.0 if capacity is None else max(1.0, provider["in_flight"] / capacity)
+            await asyncio.sleep(latency * slowdown)
+        finally:
+            provider["in_flight"] -= 1
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": LLM_OUTPUT},
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/fake/capacity")
+    async def set_capacity(body: dict):
+        provider["capacity"] = body.get("capacity")
+        return provider
+
+    @app.get("/fake/capacity")
+    async def get_capacity():
+        return provider
+
+    received_runs = {"create": 0, "update": 0}
+
+    @app.get("/info")
+    async def langsmith_info():
+        return {"version": "fake"}
+
+    @app.post("/runs")
+    async def create_run():
+        received_runs["create"] += 1
+        return {}
+
+    @app.patch("/runs/{run_id}")
+    async def update_run(run_id: str):
+        received_runs["update"] += 1
+        return {}
+
+    @app.post("/runs/batch")
+    async def batch_runs(request: Request):
+        body = await request.json()
+        received_runs["create"] += len(body.get("post") or [])
+        received_runs["update"] += len(body.get("patch") or [])
+        return {}
+
+    @app.post("/runs/multipart")
+    async def multipart_runs(request: Request):
+        await request.body()
+        received_runs["create"] += 1
+        return {}
+
+    @app.get("/fake/runs")
+    async def runs_received():
+        return received_runs
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "fake"}]}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--capacity", type=int, default=None)
+    args = parser.parse_args()
+    # workers=1 so a WEB_CONCURRENCY meant for the service does not apply here
+    uvicorn.run(create_fake_openai(args.latency, args.capacity), host="127.0.0.1", port=args.port,
+                log_level="warning", workers=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/payloads.py
+"""Representative request payloads and LLM outputs shared by the benchmarks"""
+import copy
+import json
+
+EMAIL_REQUEST = {
+    "prospect": {
+        "first_name": "Sarah",
+        "last_name": "Johnson",
+        "job_title": "VP of Sales",
+        "department": "Sales",
+        "tenure_months": 18,
+        "notable_achievement": "Exceeded Q1 targets by 27%"
+    },
+    "company": {
+        "name": "TechNova Solutions",
+        "industry": "SaaS",
+        "employee_count": 250,
+        "annual_revenue": "$45M",
+        "funding_stage": "Series B",
+        "growth_signals": "30% YoY growth, hiring burst in sales",
+        "recent_news": "Launched new enterprise product line",
+        "technography": "Salesforce, Marketo, Outreach.io",
+        "description": "Cloud-based project management software"
+    },
+    "cta": {
+        "ask": "15-min chat next Tuesday?",
+        "calendar_link": "calendly.com/ingren/demo"
+    },
+    "email_tone": "professional",
+    "sender_name": "John Doe",
+    "metadata": {
+        "email_history": "Step 1: Subject: Scaling TechNova's sales team\nHi Sarah, congrats on the Series B...",
+        "step_number": 2
+    }
+}
+
+LLM_OUTPUT = json.dumps({
+    "theme_used": "trigger_event",
+    "anchor_signal": "Series B and a hiring burst in sales",
+    "subject_line": "Ramping 20 new reps after the Series B?",
+    "email_body": (
+        "Hi Sarah,\n\nCongrats on TechNova's Series B and the push to grow the sales team. "
+        "New reps usually lose their first weeks to account research.\n\n"
+        "Ingren.ai turns 8 hours of prospect research into 8 minutes, and teams like yours "
+        "see 22% more first-call bookings.\n\nOpen to a 15-min chat next Tuesday? "
+        "calendly.com/ingren/demo\n\nJohn Doe"
+    ),
+})
+
+
+def email_requests(count: int):
+    """Return `count` distinct request payloads based on EMAIL_REQUEST"""
+    payloads = []
+    for index in range(count):
+        payload = copy.deepcopy(EMAIL_REQUEST)
+        payload["prospect"]["first_name"] = f"Prospect{index}"
+        payload["company"]["name"] = f"Company {index % 50}"
+        payloads.append(payload)
+    return payloads
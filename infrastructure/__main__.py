@@ -29,6 +29,10 @@ branches = {
 current_branch = config.get("current_branch")
 if current_branch is None:
     raise ValueError("Current branch is required")
+# "alias": each branch's version path is served by its own Lambda alias.
+# "in_process": every version path is served by the main alias, which selects
+# the prompt version from the path (see PROMPT_VERSIONS), sharing one warm pool.
+prompt_routing = config.get("prompt_routing") or "alias"
 
 # Create an IAM role for the Lambda function
 lambda_role = aws.iam.Role(
@@ -132,6 +136,8 @@ lambda_function = lambda_.Function(
             "LANGSMITH_ENDPOINT": os.environ.get("LANGSMITH_ENDPOINT"),
             "LANGSMITH_PROJECT": os.environ.get("LANGSMITH_PROJECT"),
             "LANGSMITH_TRACING": os.environ.get("LANGSMITH_TRACING"),
+            "PROMPT_VERSIONS": os.environ.get("PROMPT_VERSIONS", "{}"),
+            "PROMPT_VERSION_WEIGHTS": os.environ.get("PROMPT_VERSION_WEIGHTS", "{}"),
         },
     ),
 )
@@ -166,10 +172,16 @@ api_resource = apigateway.Resource(
 )
 
 deployment_resources = []
+main_alias = None
 # Create a branch for each environment
 for branch_name, version in branches.items():
     branch = Branch(branch_name, lambda_function, version, existing_versions_output[branch_name])
-    alias = branch.create_alias(current_branch)
+    if prompt_routing == "in_process" and not branch.is_main_branch:
+        alias = main_alias
+    else:
+        alias = branch.create_alias(current_branch)
+        if branch.is_main_branch:
+            main_alias = alias
     resources = branch.create_api_gateway_resources(rest_api, api_resource.id, alias, lambda_function)
     deployment_resources.extend(resources)
 
@@ -1,9 +1,68 @@
 """
 Lambda handler for the Ingren LLM Email API using Mangum to adapt FastAPI to AWS Lambda
 """
+import asyncio
+import time
 
 from mangum import Mangum
+from src.config import settings
 from src.main import app
+from src.utils import tracing
 
 # Create the Mangum handler
-handler = Mangum(app)
\ No newline at end of file
+_asgi_handler = Mangum(app)
+
+# Buffered traces are flushed by an extension once each invocation has returned
+tracing.start_lambda_extension()
+
+
+def handler(event, context):
+    """Lambda entry point for API Gateway events"""
+    try:
+        return _asgi_handler(event, context)
+    finally:
+        tracing.invocation_done.set()
+
+
+_batch_processor = None
+_loop = None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """Reuse one event loop across invocations so async clients stay usable"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def batch_handler(event, context):
+    """
+    Lambda entry point for queue-style batch events, bypassing API Gateway and ASGI
+
+    Accepts an SQS event whose message bodies are EmailRequest documents, or a
+    direct invocation of the form {"records": [EmailRequest, ...]}. Generated
+    emails are sent to BATCH_RESULT_QUEUE_URL when it is set. Records are not
+    started within BATCH_DEADLINE_MARGIN_SECONDS of the Lambda timeout. Returns
+    the SQS partial batch response so only failed and unstarted records are
+    retried.
+    """
+    global _batch_processor
+    if _batch_processor is None:
+        from src.api.routes import email_generator
+        from src.services.batch_processor import BatchProcessor, SqsResultSink
+        result_sink = None
+        if settings.BATCH_RESULT_QUEUE_URL:
+            result_sink = SqsResultSink(settings.BATCH_RESULT_QUEUE_URL)
+        elif "Records" in event:
+            print("BATCH_RESULT_QUEUE_URL is not set: emails generated for SQS records are not delivered")
+        _batch_processor = BatchProcessor(email_generator, result_sink=result_sink)
+    deadline = None
+    if context is not None:
+        remaining = context.get_remaining_time_in_millis() / 1000
+        deadline = time.monotonic() + remaining - settings.BATCH_DEADLINE_MARGIN_SECONDS
+    try:
+        return _event_loop().run_until_complete(_batch_processor.process_event(event, deadline))
+    finally:
+        tracing.invocation_done.set()
@@ -1,11 +1,39 @@
 # src/api/models.py
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator
 from typing import Dict, Any, Optional, List, Union
 
+
+def _flatten_into(context: Dict[str, str], prefix: str, model_class, model) -> None:
+    """
+    Add a model's fields to a flat template context as prefixed strings
+
+    A missing model contributes empty strings so every template variable is set.
+    """
+    if model is None:
+        for name in model_class.model_fields:
+            context[prefix + name] = ""
+        return
+    for name in model_class.model_fields:
+        value = getattr(model, name)
+        context[prefix + name] = "" if value is None else str(value)
+
 class HealthResponse(BaseModel):
     status: str = "healthy"
     version: str
 
+
+class DependencyStatus(BaseModel):
+    status: str = Field(..., description="ok, failing, or unknown before the first probe")
+    critical: bool = Field(..., description="Whether the service is unavailable while the dependency fails")
+    last_latency_ms: Optional[float] = Field(None, description="Latency of the last probe")
+    last_checked_seconds_ago: Optional[float] = Field(None, description="Age of the last probe")
+    success_rate: Optional[float] = Field(None, description="Share of the recent probes that succeeded")
+    last_error: Optional[str] = Field(None, description="Error of the last probe, if it failed")
+
+
+class DeepHealthResponse(HealthResponse):
+    dependencies: Dict[str, DependencyStatus] = Field(default_factory=dict)
+
 class EmailMetadata(BaseModel):
     theme: Optional[str] = Field(description="The outbound theme used for the email", default=None)
     email_history: Optional[str] = Field(default=None, description="The history of emails to the prospect")
@@ -22,7 +50,12 @@ class ProspectData(BaseModel):
 
 
 class CompanyData(BaseModel):
-    name: str = Field(..., description="Company name")
+    name: Optional[str] = Field(
+        None,
+        validation_alias=AliasChoices("name", "company_name"),
+        description="Company name (looked up from the URL when omitted)"
+    )
+    url: Optional[str] = Field(None, description="Company website, used to enrich missing fields")
     industry: Optional[str] = Field(None, description="Industry sector")
     employee_count: Optional[int] = Field(None, description="Number of employees")
     annual_revenue: Optional[str] = Field(None, description="Annual revenue")
@@ -32,6 +65,12 @@ class CompanyData(BaseModel):
     technography: Optional[str] = Field(None, description="Tools and technologies used")
     description: Optional[str] = Field(None, description="Brief company description")
 
+    @model_validator(mode="after")
+    def check_name_or_url(self):
+        if not self.name and not self.url:
+            raise ValueError("company requires either a name or a url")
+        return self
+
 
 class SellerData(BaseModel):
     product_name: str = Field("Ingren.ai", description="Product name")
@@ -47,11 +86,32 @@ class SellerData(BaseModel):
     marquee_case_studies: Optional[str] = Field(None, description="Brief case study highlights")
 
 
+# Template variables for requests that do not override the seller
+DEFAULT_SELLER_CONTEXT: Dict[str, str] = {}
+_flatten_into(DEFAULT_SELLER_CONTEXT, "seller_", SellerData, SellerData())
+
+
 class CTAData(BaseModel):
     ask: Optional[str] = Field(None, description="Call to action ask (e.g., '15-min chat next week?')")
     calendar_link: Optional[str] = Field(None, description="Meeting scheduling link")
 
 
+# Request fields that are the same for every email of a campaign
+SHARED_CONTEXT_FIELDS = ("seller", "cta", "email_tone", "sender_name", "sample_email")
+
+
+def _shared_context_into(context: Dict[str, str], source) -> None:
+    """Add the seller, CTA, tone and signature variables of a request or campaign"""
+    if source.seller is None:
+        context.update(DEFAULT_SELLER_CONTEXT)
+    else:
+        _flatten_into(context, "seller_", SellerData, source.seller)
+    _flatten_into(context, "cta_", CTAData, source.cta)
+    context["sender_name"] = source.sender_name or "Ingren AI"
+    context["email_tone"] = source.email_tone or "professional"
+    context["sample_email"] = source.sample_email or ""
+
+
 class EmailRequest(BaseModel):
     prospect: ProspectData
     company: CompanyData
@@ -83,6 +143,53 @@ class EmailRequest(BaseModel):
         description="Sample email to be used as the basis for the response"
     )
 
+    campaign_id: Optional[str] = Field(
+        default=None,
+        description="Registered campaign supplying seller, cta, email_tone, sender_name and sample_email"
+    )
+
+    synthesize: bool = Field(
+        default=False,
+        description="Write the email from a template without calling the LLM (degraded fast path)"
+    )
+
+    @field_validator("company", mode="before")
+    @classmethod
+    def company_from_url(cls, value):
+        # A bare string is treated as the company website to be enriched
+        if isinstance(value, str):
+            return {"url": value}
+        return value
+
+    def to_template_context(self, shared_context: Optional[Dict[str, str]] = None,
+                            company_context: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Flatten the request into the string variables used by the prompt templates
+
+        Built straight from the validated model, without an intermediate dump.
+
+        Args:
+            shared_context: Pre-flattened seller, CTA, tone and signature
+                variables of a campaign, used instead of the request's own
+            company_context: company_* variables to use instead of the
+                request's company, e.g. a company digest
+
+        Returns:
+            Dictionary of prospect_*, company_*, seller_*, cta_* and root variables
+        """
+        context: Dict[str, str] = {}
+        _flatten_into(context, "prospect_", ProspectData, self.prospect)
+        if company_context is None:
+            _flatten_into(context, "company_", CompanyData, self.company)
+        else:
+            context.update(company_context)
+        if shared_context is None:
+            _shared_context_into(context, self)
+        else:
+            context.update(shared_context)
+        _flatten_into(context, "", EmailMetadata, self.metadata)
+        return context
+
     model_config = {
         "json_schema_extra": {
             "examples": [
@@ -122,11 +229,167 @@ class EmailRequest(BaseModel):
     }
 
 
+class CampaignRequest(BaseModel):
+    seller: Optional[SellerData] = Field(
+        default=None,
+        description="Seller information (defaults provided if not specified)"
+    )
+    cta: Optional[CTAData] = Field(default=None, description="Call to action details")
+    email_tone: Optional[str] = Field(default="professional", description="Email tone")
+    sender_name: Optional[str] = Field(default=None, description="Sender Email name to be used in signature")
+    sample_email: Optional[str] = Field(
+        default=None,
+        description="Sample email to be used as the basis for the response"
+    )
+
+    def to_shared_context(self) -> Dict[str, str]:
+        """
+        Flatten the campaign into the template variables shared by all its emails
+
+        Returns:
+            Dictionary of seller_*, cta_*, sender_name, email_tone and sample_email
+        """
+        context: Dict[str, str] = {}
+        _shared_context_into(context, self)
+        return context
+
+
+class CampaignResponse(BaseModel):
+    campaign_id: str = Field(..., description="ID to send as campaign_id with each email request")
+    expires_in_seconds: int = Field(..., description="Seconds until the campaign must be registered again")
+
+
+class ThreadRequest(BaseModel):
+    prospect: ProspectData
+    company: CompanyData
+    seller: Optional[SellerData] = Field(
+        default=None,
+        description="Seller information (defaults provided if not specified)"
+    )
+    cta: Optional[CTAData] = Field(default=None, description="Call to action details")
+    email_tone: Optional[str] = Field(default="professional", description="Email tone")
+    sender_name: Optional[str] = Field(default=None, description="Sender Email name to be used in signature")
+    sample_email: Optional[str] = Field(
+        default=None,
+        description="Sample email to be used as the basis for the response"
+    )
+    campaign_id: Optional[str] = Field(
+        default=None,
+        description="Registered campaign supplying seller, cta, email_tone, sender_name and sample_email"
+    )
+    email_history: Optional[str] = Field(
+        default=None,
+        description="Emails already sent to the prospect before the thread was created"
+    )
+
+    @field_validator("company", mode="before")
+    @classmethod
+    def company_from_url(cls, value):
+        return EmailRequest.company_from_url(value)
+
+    def with_signals(self, prospect: Optional[Dict[str, Any]] = None,
+                     company: Optional[Dict[str, Any]] = None) -> Optional["ThreadRequest"]:
+        """
+        The thread context with changed prospect fields and new company signals applied
+
+        Returns:
+            The updated context, or None if there is nothing to apply
+
+        Raises:
+            ValidationError: If the updated prospect or company is invalid
+        """
+        if not prospect and not company:
+            return None
+        updated = self.model_dump(exclude_unset=True)
+        if prospect:
+            updated["prospect"] = {**updated["prospect"], **prospect}
+        if company:
+            updated["company"] = {**updated["company"], **company}
+        return ThreadRequest.model_validate(updated)
+
+    def to_email_request(self, metadata: "EmailMetadata") -> EmailRequest:
+        """
+        Build the email request for one step of the thread
+
+        The thread's fields were validated when it was created or updated, so
+        they are not validated again.
+        """
+        fields = self.model_fields_set - {"email_history"}
+        return EmailRequest.model_construct(
+            fields | {"metadata"},
+            metadata=metadata,
+            **{field: getattr(self, field) for field in fields},
+        )
+
+
+class ThreadStepRequest(BaseModel):
+    step_number: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Step of the sequence (defaults to the step after the last email of the thread)"
+    )
+    theme: Optional[str] = Field(default=None, description="Outbound theme to use for this step")
+    prospect: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Prospect fields that changed since the thread was created, kept for later steps"
+    )
+    company: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="New company signals (e.g. recent_news), kept for later steps"
+    )
+
+
+class ThreadEmail(BaseModel):
+    step_number: int = Field(..., description="Step of the sequence the email was generated for")
+    theme_used: str = Field(..., description="The outbound theme used for the email")
+    anchor_signal: str = Field(..., description="The key fact/pain triggering outreach")
+    subject_line: str = Field(..., description="The email subject line")
+    email_body: str = Field(..., description="The generated email body text")
+    synthesized: bool = Field(False, description="Whether the email was written from a template instead of the LLM")
+
+
+class ThreadResponse(BaseModel):
+    thread_id: str = Field(..., description="ID of the thread, used in /threads/{thread_id}/emails")
+    emails: List[ThreadEmail] = Field(default_factory=list, description="Emails generated in the thread so far")
+    expires_in_seconds: int = Field(..., description="Seconds of inactivity after which the thread is removed")
+
+
 class EmailResponse(BaseModel):
     theme_used: str = Field(..., description="The outbound theme used for the email")
     anchor_signal: str = Field(..., description="The key fact/pain triggering outreach")
     subject_line: str = Field(..., description="The email subject line")
     email_body: str = Field(..., description="The generated email body text")
+    synthesized: bool = Field(False, description="Whether the email was written from a template instead of the LLM")
+
+    @staticmethod
+    def content_from(email_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the response body directly from generated email data
+
+        Produces the same fields as an EmailResponse without constructing and
+        re-validating the model on the hot path.
+
+        Args:
+            email_data: Email data parsed from the LLM output
+
+        Returns:
+            Dictionary with the EmailResponse fields
+        """
+        content: Dict[str, Any] = {}
+        for field, default in EMAIL_RESPONSE_DEFAULTS:
+            value = email_data.get(field)
+            content[field] = default if value is None else value if isinstance(value, str) else str(value)
+        content["synthesized"] = email_data.get("synthesized") is True
+        return content
+
+
+# Field defaults applied when the LLM omits a response field
+EMAIL_RESPONSE_DEFAULTS = (
+    ("theme_used", "unknown"),
+    ("anchor_signal", "unknown"),
+    ("subject_line", ""),
+    ("email_body", ""),
+)
 
 
 # Add to src/api/models.py
@@ -158,4 +421,17 @@ class CompanyDescriptionResponse(BaseModel):
                 }
             ]
         }
-    }
\ No newline at end of file
+    }
+
+
+class CompanyBatchRequest(BaseModel):
+    company_urls: List[str] = Field(..., min_length=1, description="URLs of the company websites")
+
+
+class CompanyBatchResult(BaseModel):
+    domain: str = Field(..., description="Normalized domain the URLs were deduplicated to")
+    company_urls: List[str] = Field(..., description="Requested URLs that resolved to this domain")
+    status: str = Field(..., description="'ok' if the lookup succeeded, otherwise 'error'")
+    cached: bool = Field(False, description="Whether the result was served from the cache")
+    company: Optional[CompanyDescriptionResponse] = Field(None, description="Company information when status is 'ok'")
+    error: Optional[str] = Field(None, description="Failure reason when status is 'error'")
@@ -1,13 +1,281 @@
 # src/api/routes.py
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import hmac
+import math
+import time
+from typing import Optional
 
-from src.api.models import EmailRequest, EmailResponse, HealthResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+
+from src.api.models import (
+    CampaignRequest, CampaignResponse, DeepHealthResponse, EmailRequest, EmailResponse, HealthResponse,
+    ThreadEmail, ThreadRequest, ThreadResponse, ThreadStepRequest,
+)
+from src.services.admission import (
+    ANONYMOUS_TENANT, BATCH, INTERACTIVE, PRIORITIES, OverloadedError, QuotaExceededError,
+    admission_controller, current_deadline, current_priority, current_tenant,
+)
+from src.services.campaign_store import CampaignNotFoundError, CampaignStore
+from src.services.company_info_service import CompanyInfoService
 from src.services.email_generator import EmailGenerator
+from src.services.health_prober import HealthProber
+from src.services.step_pregenerator import StepPregenerator
+from src.services.thread_store import ThreadNotFoundError, create_thread_store
 from src.config import settings
+from src.utils.idempotency import IdempotencyConflictError, IdempotencyStore
+from src.utils.metrics import counter, render_prometheus
+from src.utils.profiler import SamplingProfiler
+from src.utils.prompt_versions import UnknownPromptVersionError, pinned_prompt_version, prompt_router
+from src.utils.tracing import sample_route
 
 router = APIRouter()
-email_generator = EmailGenerator()
+
+# The company info service is shared so generate-email enrichment uses its cache
+company_info_service = CompanyInfoService()
+campaign_store = CampaignStore(
+    ttl_seconds=settings.CAMPAIGN_TTL_SECONDS,
+    max_entries=settings.CAMPAIGN_MAX_ENTRIES,
+)
+email_generator = EmailGenerator(company_info_service, campaign_store)
+thread_store = create_thread_store(
+    settings.THREAD_STORE_URL,
+    ttl_seconds=settings.THREAD_TTL_SECONDS,
+    max_entries=settings.THREAD_MAX_ENTRIES,
+)
+step_pregenerator = StepPregenerator(
+    thread_store,
+    email_generator,
+    ttl_seconds=settings.THREAD_TTL_SECONDS,
+    max_entries=settings.THREAD_MAX_ENTRIES,
+)
+
+
+async def _probe_openai():
+    # Run in a thread so the synchronous client does not block the event loop
+    # The SDK's own timeout (600s by default, with retries) would outlive the prober's,
+    # keeping the thread busy long after the probe has been given up on
+    client = email_generator.client.with_options(timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS, max_retries=0)
+    await asyncio.to_thread(client.models.list)
+
+
+async def _probe_langsmith():
+    import httpx
+
+    async with httpx.AsyncClient(timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS) as client:
+        response = await client.get(f"{settings.LANGSMITH_ENDPOINT}/info",
+                                    headers={"x-api-key": settings.LANGSMITH_API_KEY})
+        response.raise_for_status()
+
+
+# Probes dependencies in the background so deep health checks answer from memory;
+# prompts are cached once pulled, so a LangSmith outage only degrades the service
+health_probes = {"openai": (_probe_openai, True)}
+if settings.LANGSMITH_API_KEY:
+    health_probes["langsmith"] = (_probe_langsmith, False)
+health_prober = HealthProber(
+    health_probes,
+    interval=settings.HEALTH_PROBE_INTERVAL_SECONDS,
+    timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS,
+    failure_threshold=settings.HEALTH_PROBE_FAILURE_THRESHOLD,
+)
+
+# Samples stacks for the /debug/profile routes and X-Profile requests; idle until one is taken
+profiler = SamplingProfiler(settings.DEBUG_PROFILE_INTERVAL_SECONDS)
+
+# Replays results of retried requests carrying an Idempotency-Key header
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+)
+
+
+async def _run_idempotent(response: Response, scope: str, idempotency_key: Optional[str],
+                          request, operation, should_store=None):
+    """
+    Run a route operation once per Idempotency-Key
+
+    Without a key the operation simply runs. With one, concurrent duplicates
+    share the in-flight result and later duplicates get the stored result,
+    marked with an Idempotent-Replayed response header. A pinned prompt
+    version is part of the request, so reusing a key for another version is
+    a conflict rather than a replay of the other version's result.
+    """
+    if not idempotency_key:
+        return await operation()
+
+    payload = request.model_dump_json()
+    pinned_version = pinned_prompt_version.get()
+    if pinned_version is not None:
+        payload += f"\nprompt_version={pinned_version}"
+    try:
+        result, replayed = await idempotency_store.run(
+            # Keys are chosen by clients, so each tenant has its own
+            f"{current_tenant.get()}:{scope}:{idempotency_key}",
+            payload,
+            operation,
+            should_store=should_store,
+        )
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+CLIENT_DISCONNECTS = counter("client_disconnects_total", "Requests whose work was cancelled after the client left")
+
+
+def _retry_after(seconds: float) -> dict:
+    return {"Retry-After": str(math.ceil(min(max(seconds, 1.0), 24 * 60 * 60)))}
+
+
+def _service_unavailable(error: OverloadedError) -> HTTPException:
+    """Turn shed load into a 503 telling the client when to retry"""
+    return HTTPException(status_code=503, detail=str(error), headers=_retry_after(error.retry_after))
+
+
+def _request_budget(request: Request, request_timeout: Optional[float]) -> float:
+    """
+    Seconds the request may take: the configured deadline, shortened by an
+    X-Request-Timeout header or by the time left in the Lambda invocation
+    """
+    budget = settings.REQUEST_DEADLINE_SECONDS
+    if request_timeout is not None and request_timeout > 0:
+        budget = min(budget, request_timeout)
+    lambda_context = request.scope.get("aws.context")
+    if lambda_context is not None:
+        remaining = lambda_context.get_remaining_time_in_millis() / 1000
+        budget = min(budget, remaining - settings.DEADLINE_SAFETY_MARGIN_SECONDS)
+    return budget
+
+
+def admission(default_priority: str = INTERACTIVE, deadline: bool = True):
+    """
+    Build a dependency that admits a request to the LLM-backed routes
+
+    The API key identifies the tenant and is charged against its quota.
+    Requests are scheduled at `default_priority` unless an X-Request-Priority
+    header names another one. Raises 429 with a Retry-After header when the
+    quota is used up, and 503 with Retry-After when the LLM queue is too long
+    to answer within the request's deadline. Streaming routes pass
+    `deadline=False`: their LLM calls run for as long as the stream does.
+    """
+    async def admit(
+            request: Request,
+            x_api_key: Optional[str] = Header(default=None),
+            x_request_priority: Optional[str] = Header(default=None),
+            x_request_timeout: Optional[float] = Header(default=None)
+    ):
+        tenant = x_api_key or ANONYMOUS_TENANT
+        try:
+            admission_controller.check_quota(tenant)
+        except QuotaExceededError as e:
+            raise HTTPException(
+                status_code=429,
+                detail="Request quota exceeded for this API key",
+                headers=_retry_after(e.retry_after),
+            )
+        current_tenant.set(tenant)
+        current_priority.set(x_request_priority if x_request_priority in PRIORITIES else default_priority)
+        if not deadline:
+            current_deadline.set(None)
+            return
+        current_deadline.set(time.monotonic() + _request_budget(request, x_request_timeout))
+
+        try:
+            admission_controller.check_deadline()
+        except OverloadedError as e:
+            raise _service_unavailable(e)
+
+    return admit
+
+
+def traced_route(route: str):
+    """Build a dependency deciding whether the request is traced, at the route's sample rate"""
+    async def decide():
+        sample_route(route)
+
+    return decide
+
+
+# Path prefix every route is served under; other /api/<version> prefixes pin a prompt version
+API_PREFIX = "/api/v1"
+
+
+def prompt_version():
+    """
+    Build a dependency selecting the request's prompt version
+
+    An X-Prompt-Version header or an /api/<version> path prefix other than
+    API_PREFIX pins the version; otherwise it is drawn from the configured
+    traffic split. The version used is returned in an X-Prompt-Version
+    response header. Raises 400 for a version that is not configured.
+    """
+    async def select(
+            request: Request,
+            response: Response,
+            x_prompt_version: Optional[str] = Header(default=None)
+    ):
+        requested = x_prompt_version
+        if requested is None and not request.url.path.startswith(API_PREFIX + "/"):
+            requested = request.url.path.split("/")[2]
+        try:
+            version = prompt_router.select(requested)
+        except UnknownPromptVersionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response.headers["X-Prompt-Version"] = version.name
+
+    return select
+
+
+async def _cancel_on_disconnect(http_request: Request, operation):
+    """
+    Await a route operation, cancelling it if the client disconnects first
+
+    Work shared through an Idempotency-Key is shielded and keeps running for
+    retries; only this request's wait for it is cancelled.
+    """
+    async def wait_for_disconnect():
+        # The body has already been read, so the next message is the disconnect
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+
+    work = asyncio.ensure_future(operation)
+    disconnect = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        done, _ = await asyncio.wait({work, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not work.done():
+            work.cancel()
+
+    if work not in done:
+        CLIENT_DISCONNECTS.inc()
+        raise HTTPException(status_code=499, detail="Client closed request")
+    return work.result()
+
+
+def _debug_token_valid(token: Optional[str]) -> bool:
+    """Whether profiling is enabled and the token matches DEBUG_PROFILE_TOKEN"""
+    expected = settings.DEBUG_PROFILE_TOKEN
+    return bool(expected) and token is not None and hmac.compare_digest(token.encode(), expected.encode())
+
+
+async def debug_access(x_debug_token: Optional[str] = Header(default=None)):
+    """
+    Dependency guarding the debug routes
+
+    Raises 404 when DEBUG_PROFILE_TOKEN is not set, so the routes do not
+    exist, and 403 when the X-Debug-Token header does not match it.
+    """
+    if not settings.DEBUG_PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not _debug_token_valid(x_debug_token):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
 
 
 @router.get("/health", response_model=HealthResponse, tags=["Health"])
@@ -18,70 +286,326 @@ async def health_check():
     return HealthResponse(version=settings.API_VERSION)
 
 
-@router.get("/health/deep", response_model=HealthResponse, tags=["Health"])
+@router.get("/health/deep", response_model=DeepHealthResponse, tags=["Health"])
 async def deep_health_check():
     """
-    Deep health check that verifies OpenAI connection
+    Deep health check reporting the OpenAI and LangSmith connections from the background probes
+
+    Answers 503 while OpenAI is failing, and "degraded" while only an
+    optional dependency (LangSmith) is.
     """
-    try:
-        # Test OpenAI connection by making a minimal API call
-        client = email_generator.client
-        client.models.list(limit=1)
-        return HealthResponse(version=settings.API_VERSION)
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
+    await health_prober.ensure_running()
+    dependencies = health_prober.report()
+    if not health_prober.healthy:
+        failing = ", ".join(
+            f"{name} ({dependency['last_error']})"
+            for name, dependency in dependencies.items()
+            if dependency["critical"] and dependency["status"] == "failing"
+        )
+        return JSONResponse(status_code=503, content={
+            "detail": f"Service unavailable: {failing}",
+            "status": "unhealthy",
+            "version": settings.API_VERSION,
+            "dependencies": dependencies,
+        })
+    return DeepHealthResponse(
+        status="degraded" if health_prober.degraded else "healthy",
+        version=settings.API_VERSION,
+        dependencies=dependencies,
+    )
+
+
+@router.get("/metrics", tags=["Health"])
+async def get_metrics():
+    """
+    Metrics in the Prometheus text format, including LLM queue depth and wait time
+    """
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 # Add to src/api/routes.py
 
 from src.api.models import CompanyURLRequest, CompanyDescriptionResponse
-from src.services.company_info_service import CompanyInfoService
+from src.api.models import CompanyBatchRequest, CompanyBatchResult
 
-# Initialize the company info service
-company_info_service = CompanyInfoService()
 
-@router.post("/company-description", response_model=CompanyDescriptionResponse, tags=["Company"])
-async def get_company_description(request: CompanyURLRequest):
+def _company_description_response(company_data):
+    """Build a CompanyDescriptionResponse from a company info dictionary"""
+    return CompanyDescriptionResponse(
+        company_name=company_data.get("company_name", "Unknown"),
+        description=company_data.get("description", "No description available."),
+        industry=company_data.get("industry"),
+        employee_count=company_data.get("employee_count"),
+        headquarters=company_data.get("headquarters"),
+        founded_year=company_data.get("founded_year"),
+        products_services=company_data.get("products_services")
+    )
+
+
+@router.post(
+    "/company-description",
+    response_model=CompanyDescriptionResponse,
+    dependencies=[Depends(admission()), Depends(traced_route("company-description"))],
+    tags=["Company"],
+)
+async def get_company_description(
+        request: CompanyURLRequest,
+        response: Response,
+        http_request: Request,
+        idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
     """
     Get company description and information based on the company URL
     """
-    try:
-        # Call the company info service to get the description
-        company_data = await company_info_service.get_company_description(request.company_url)
-
-        # Return the data as a CompanyDescriptionResponse
-        return CompanyDescriptionResponse(
-            company_name=company_data.get("company_name", "Unknown"),
-            description=company_data.get("description", "No description available."),
-            industry=company_data.get("industry"),
-            employee_count=company_data.get("employee_count"),
-            headquarters=company_data.get("headquarters"),
-            founded_year=company_data.get("founded_year"),
-            products_services=company_data.get("products_services")
+    async def describe_company():
+        try:
+            # Call the company info service to get the description
+            company_data = await company_info_service.get_company_description(request.company_url)
+
+            # Return the data as a CompanyDescriptionResponse
+            return _company_description_response(company_data)
+        except OverloadedError as e:
+            raise _service_unavailable(e)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Company information retrieval failed: {str(e)}")
+
+    return await _cancel_on_disconnect(http_request, _run_idempotent(
+        response, "company-description", idempotency_key, request, describe_company,
+        # Fallback descriptions for failed lookups are not worth replaying
+        should_store=lambda company: company.company_name != "Error",
+    ))
+
+
+@router.post(
+    "/company-descriptions:batch",
+    # The response streams for as long as the lookups take, so it has no request deadline
+    dependencies=[Depends(admission(BATCH, deadline=False)), Depends(traced_route("company-descriptions:batch"))],
+    tags=["Company"],
+)
+async def get_company_descriptions_batch(request: CompanyBatchRequest):
+    """
+    Get company descriptions for many URLs, streamed as one JSON line per domain
+
+    URLs are deduplicated by domain, cached domains are returned first, and a
+    failed lookup is reported in its own line with status "error".
+    """
+    if len(request.company_urls) > settings.COMPANY_BATCH_MAX_URLS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.COMPANY_BATCH_MAX_URLS} company URLs are accepted per batch"
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Company information retrieval failed: {str(e)}")
+
+    async def stream_results():
+        async for result in company_info_service.iter_company_descriptions(request.company_urls):
+            try:
+                company = _company_description_response(result["company"]) if "company" in result else None
+                error = result.get("error")
+            except Exception as e:
+                company, error = None, f"Invalid company information: {str(e)}"
+            line = CompanyBatchResult(
+                domain=result["domain"],
+                company_urls=result["company_urls"],
+                status="ok" if company is not None else "error",
+                cached=result["cached"],
+                company=company,
+                error=error,
+            )
+            yield line.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.post("/campaigns", response_model=CampaignResponse, tags=["Email"])
+async def register_campaign(request: CampaignRequest):
+    """
+    Register the seller, CTA, tone and signature shared by a campaign's emails
+
+    Email requests then send only prospect and company data plus the returned
+    campaign_id. The ID is derived from the content, so registering the same
+    campaign again returns the same ID; do so when a request gets a 404.
+    """
+    campaign = campaign_store.register(request)
+    return CampaignResponse(campaign_id=campaign.campaign_id, expires_in_seconds=settings.CAMPAIGN_TTL_SECONDS)
+
 
 # Other routes...
 
-@router.post("/generate-email", response_model=EmailResponse, tags=["Email"])
-async def generate_email(request: EmailRequest):
+@router.post(
+    "/generate-email",
+    # The body is built by EmailResponse.content_from, so FastAPI skips re-validating it
+    response_model=None,
+    responses={200: {"model": EmailResponse}},
+    dependencies=[Depends(admission()), Depends(traced_route("generate-email")), Depends(prompt_version())],
+    tags=["Email"],
+)
+async def generate_email(
+        request: EmailRequest,
+        response: Response,
+        http_request: Request,
+        idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+        x_profile: Optional[str] = Header(default=None),
+        x_debug_token: Optional[str] = Header(default=None)
+):
     """
     Generate a personalized email based on provided parameters
+
+    With `synthesize`, or with EMAIL_SYNTHESIS_FALLBACK while OpenAI is
+    failing, the email is written from a template and flagged `synthesized`.
+
+    With an X-Profile header and a valid X-Debug-Token, the generation is
+    profiled and the X-Profile-Id response header names the profile to fetch
+    from /debug/profile/{profile_id}.
     """
+    async def generate():
+        try:
+            # Generate the email using our service
+            email_data = await email_generator.generate_email(request)
+
+            # Return the data in the EmailResponse shape
+            return EmailResponse.content_from(email_data)
+        except CampaignNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except OverloadedError as e:
+            raise _service_unavailable(e)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Email generation failed: {str(e)}")
+
+    if x_profile is not None and _debug_token_valid(x_debug_token):
+        generate = profiler.profile_request(generate)
+        response.headers["X-Profile-Id"] = generate.profile_id
+
+    # A client that gave up (e.g. the gateway timed out) no longer needs the email,
+    # so the LLM call is cancelled instead of being paid for
+    return await _cancel_on_disconnect(http_request, _run_idempotent(
+        response, "generate-email", idempotency_key, request, generate,
+        # Error and template emails should be regenerated on retry rather than replayed
+        should_store=lambda email: email["theme_used"] != "error" and not email["synthesized"],
+    ))
+
+
+def _thread_response(thread) -> ThreadResponse:
+    return ThreadResponse(
+        thread_id=thread.thread_id,
+        emails=thread.emails,
+        expires_in_seconds=settings.THREAD_TTL_SECONDS,
+    )
+
+
+def _get_thread(thread_id: str):
     try:
-        # Convert Pydantic model to dict for processing
-        request_data = request.model_dump(exclude_none=False)
-
-        # Generate the email using our service
-        email_data = await email_generator.generate_email(request_data)
-
-        # Return the data as an EmailResponse
-        return EmailResponse(
-            theme_used=email_data.get("theme_used", "unknown"),
-            anchor_signal=email_data.get("anchor_signal", "unknown"),
-            subject_line=email_data.get("subject_line", ""),
-            email_body=email_data.get("email_body", "")
+        return thread_store.get(thread_id)
+    except ThreadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/threads", response_model=ThreadResponse, tags=["Email"])
+async def create_thread(request: ThreadRequest):
+    """
+    Create a sequence thread holding the prospect, company, seller and CTA shared by its emails
+
+    Each step is then generated with POST /threads/{thread_id}/emails, which
+    only carries the step and any new signals. Generated emails are kept in
+    the thread and become the history of the following steps.
+    """
+    return _thread_response(thread_store.create(request))
+
+
+@router.get("/threads/{thread_id}", response_model=ThreadResponse, tags=["Email"])
+async def get_thread(thread_id: str):
+    """
+    Get a thread with the emails generated in it so far
+    """
+    return _thread_response(_get_thread(thread_id))
+
+
+@router.post(
+    "/threads/{thread_id}/emails",
+    response_model=None,
+    responses={200: {"model": ThreadEmail}},
+    dependencies=[Depends(admission()), Depends(traced_route("thread-email")), Depends(prompt_version())],
+    tags=["Email"],
+)
+async def generate_thread_email(
+        thread_id: str,
+        request: ThreadStepRequest,
+        response: Response,
+        http_request: Request,
+        idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
+    """
+    Generate the next email of a thread and append it to the thread
+
+    Prospect and company fields sent with the step are merged into the
+    thread, so later steps use them too. With THREAD_PREGENERATION on, the
+    following step is generated in the background and served from there
+    when it is requested with no new signals.
+    """
+    thread = _get_thread(thread_id)
+    try:
+        updated = thread.request.with_signals(request.prospect, request.company)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    if updated is not None:
+        thread_store.update_request(thread_id, updated)
+        thread.request = updated
+    step_number = request.step_number or thread.next_step()
+
+    async def generate():
+        try:
+            email = None
+            if settings.THREAD_PREGENERATION:
+                email = await step_pregenerator.take(thread, step_number, request.theme)
+            if email is None:
+                email_request = thread.request.to_email_request(thread.metadata(step_number, request.theme))
+                email_data = await email_generator.generate_email(email_request)
+                email = {"step_number": step_number, **EmailResponse.content_from(email_data)}
+        except CampaignNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except OverloadedError as e:
+            raise _service_unavailable(e)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Email generation failed: {str(e)}")
+
+        # Error emails are not part of the sequence, so the step can be retried
+        if email["theme_used"] != "error":
+            try:
+                thread_store.append_email(thread_id, email)
+            except ThreadNotFoundError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            if settings.THREAD_PREGENERATION:
+                step_pregenerator.schedule(thread_id)
+        return email
+
+    return await _cancel_on_disconnect(http_request, _run_idempotent(
+        response, f"thread-email:{thread_id}", idempotency_key, request, generate,
+        should_store=lambda email: email["theme_used"] != "error",
+    ))
+
+
+@router.get("/debug/profile", dependencies=[Depends(debug_access)], include_in_schema=False, tags=["Debug"])
+async def profile_window(seconds: float = Query(default=10, gt=0)):
+    """
+    Sample every thread of this process for `seconds` and return the stacks
+    in the collapsed-stack format, e.g. for flamegraph.pl or speedscope
+    """
+    if seconds > settings.DEBUG_PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"seconds must be at most {settings.DEBUG_PROFILE_MAX_SECONDS}",
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Email generation failed: {str(e)}")
\ No newline at end of file
+    session = profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop(session)
+    return PlainTextResponse(session.collapsed(), headers={"X-Profile-Id": session.profile_id})
+
+
+@router.get("/debug/profile/{profile_id}", dependencies=[Depends(debug_access)], include_in_schema=False,
+            tags=["Debug"])
+async def get_request_profile(profile_id: str):
+    """The collapsed stacks of a request profiled with an X-Profile header"""
+    session = profiler.request_profile(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return PlainTextResponse(session.collapsed())
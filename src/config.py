@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 import os
 
 
@@ -14,9 +14,98 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = "gpt-4.1-nano"
     OPENAI_MODEL_WEB_SEARCH: str = "gpt-4o-mini-search-preview"
 
+    # LLM record/replay settings ("off", "record" or "replay")
+    LLM_RECORD_MODE: str = "off"
+    LLM_CORPUS_PATH: str = "benchmarks/llm_corpus.jsonl"
+    LLM_REPLAY_TIMING: bool = False
+
+    # Company lookup settings
+    COMPANY_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    COMPANY_CACHE_MAX_ENTRIES: int = 10000
+    COMPANY_BATCH_CONCURRENCY: int = 8
+    COMPANY_BATCH_MAX_URLS: int = 5000
+    # Match new domains to known companies by brand label, e.g. acme.io to acme.com.
+    # Off by default: unrelated companies can share a brand label
+    COMPANY_ALIAS_MATCHING: bool = False
+
     # Prompt settings
     SYSTEM_PROMPT_PATH: str = "prompts/system_prompt.txt"
     USER_PROMPT_TEMPLATE_PATH: str = "prompts/user_prompt_template.txt"
+    # Render pulled f-string prompts with str.format instead of LangChain prompt objects
+    PROMPT_NATIVE_RENDER: bool = True
+
+    # Health probe settings (/health/deep reports the last probes)
+    HEALTH_PROBE_INTERVAL_SECONDS: float = 30.0
+    HEALTH_PROBE_TIMEOUT_SECONDS: float = 5.0
+    # Consecutive failed probes before a healthy dependency is reported failing
+    HEALTH_PROBE_FAILURE_THRESHOLD: int = 2
+
+    # Batch event settings
+    BATCH_CONCURRENCY: int = 10
+    # SQS queue the batch handler sends generated emails to
+    BATCH_RESULT_QUEUE_URL: Optional[str] = None
+    # No record is started this close to the Lambda timeout, leaving time to deliver results
+    BATCH_DEADLINE_MARGIN_SECONDS: float = 5.0
+
+    # Admission control settings
+    LLM_MAX_CONCURRENCY: int = 16
+    # Adapt the pool size to OpenAI latency and throttling, between these bounds
+    LLM_ADAPTIVE_CONCURRENCY: bool = True
+    LLM_MIN_CONCURRENCY: int = 2
+    # Calls slower than this multiple of the no-load latency shrink the pool
+    LLM_LATENCY_TOLERANCE: float = 2.0
+    TENANT_RATE_PER_SECOND: float = 5.0
+    TENANT_BURST: int = 20
+    # Per API key overrides of "rate", "burst" and "weight", as JSON
+    TENANT_QUOTAS: Dict[str, Dict[str, float]] = {}
+    # Rate limit state is kept for at most this many API keys
+    TENANT_BUCKET_MAX_ENTRIES: int = 10000
+    INTERACTIVE_PRIORITY_WEIGHT: float = 8.0
+    # API Gateway gives up on a request after 29 seconds
+    REQUEST_DEADLINE_SECONDS: float = 29.0
+    DEADLINE_SAFETY_MARGIN_SECONDS: float = 0.5
+
+    # Email post-processing settings
+    EMAIL_POST_PROCESSING: bool = True
+    # Extra LLM calls allowed per email to fix rule violations that cannot be fixed locally
+    EMAIL_MAX_REGENERATIONS: int = 1
+
+    # Choose the theme and anchor signal locally and send only that theme's rules
+    EMAIL_LOCAL_THEME_SELECTION: bool = True
+
+    # Degraded mode settings: emails written from templates while OpenAI is failing
+    EMAIL_TEMPLATES_PATH: str = "prompts/email_templates.json"
+    # Answer with a synthesized email instead of a 503 or an error email when OpenAI fails
+    EMAIL_SYNTHESIS_FALLBACK: bool = False
+    # Consecutive failed OpenAI calls that open the circuit, and seconds before a trial call
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+
+    # Follow-up histories longer than this are sent as a digest of their emails
+    EMAIL_HISTORY_DIGEST: bool = True
+    EMAIL_HISTORY_DIGEST_MAX_CHARS: int = 1500
+    EMAIL_HISTORY_CACHE_MAX_ENTRIES: int = 10000
+
+    # Company data is sent as a digest built once per company and shared by its prospects
+    EMAIL_COMPANY_DIGEST: bool = True
+    EMAIL_COMPANY_DIGEST_MAX_CHARS: int = 1200
+    EMAIL_COMPANY_DIGEST_TTL_SECONDS: int = 24 * 60 * 60
+    EMAIL_COMPANY_DIGEST_MAX_ENTRIES: int = 10000
+
+    # Campaign settings
+    CAMPAIGN_TTL_SECONDS: int = 24 * 60 * 60
+    CAMPAIGN_MAX_ENTRIES: int = 1000
+
+    # Thread settings ("memory://" or "sqlite:///<path>")
+    THREAD_STORE_URL: str = "memory://"
+    THREAD_TTL_SECONDS: int = 30 * 24 * 60 * 60
+    THREAD_MAX_ENTRIES: int = 10000
+    # Generate step N+1 of a thread in the background once step N succeeds
+    THREAD_PREGENERATION: bool = False
+
+    # Idempotency settings
+    IDEMPOTENCY_TTL_SECONDS: int = 10 * 60
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
 
     # LangSmith settings
     LANGSMITH_API_KEY: Optional[str] = None
@@ -27,10 +116,38 @@ class Settings(BaseSettings):
     LANGSMITH_USER_PROMPT_ID: Optional[str] = "ingren_email_user"
     LANGSMITH_USER_FOLLOWUP_PROMPT_ID: Optional[str] = "ingren_email_followup"
 
+    # Prompt version settings (see src.utils.prompt_versions)
+    # Extra versions as JSON, e.g. {"v2": {"system": "ingren_email_system:v2"}}
+    PROMPT_VERSIONS: Dict[str, Dict[str, str]] = {}
+    PROMPT_DEFAULT_VERSION: str = "v1"
+    # Share of unpinned requests per version, as JSON, e.g. {"v1": 0.9, "v2": 0.1}
+    PROMPT_VERSION_WEIGHTS: Dict[str, float] = {}
+
+    # Tracing settings (when LANGSMITH_TRACING is "true")
+    TRACING_SAMPLE_RATE: float = 1.0
+    # Per route overrides of the sample rate, as JSON, e.g. {"company-descriptions:batch": 0}
+    TRACING_ROUTE_SAMPLE_RATES: Dict[str, float] = {}
+    TRACING_BUFFER_SIZE: int = 10000
+    TRACING_IDLE_DELAY_SECONDS: float = 2.0
+    TRACING_FLUSH_TIMEOUT_SECONDS: float = 2.0
+
+    # Profiling settings (see src.utils.profiler)
+    # The /debug/profile endpoints and X-Profile header only work when a token is set
+    DEBUG_PROFILE_TOKEN: Optional[str] = None
+    DEBUG_PROFILE_MAX_SECONDS: int = 60
+    DEBUG_PROFILE_INTERVAL_SECONDS: float = 0.005
+
     # Server settings
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
+    # Production server settings (python -m src.server)
+    WEB_CONCURRENCY: Optional[int] = None  # Defaults to the number of CPU cores
+    GRACEFUL_TIMEOUT_SECONDS: int = 30
+    WORKER_TIMEOUT_SECONDS: int = 120
+    KEEPALIVE_SECONDS: int = 5
+    BACKLOG: int = 2048
+
     # Replace the old class Config with model_config
     model_config = {
         "env_file": ".env",
@@ -1,10 +1,11 @@
 # src/main.py
-import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from src.api.routes import router
+from src.api.routes import API_PREFIX, router
 from src.config import settings
+from src.utils.prompt_versions import prompt_router
 
 
 def create_app() -> FastAPI:
@@ -15,6 +16,7 @@ def create_app() -> FastAPI:
         version=settings.API_VERSION,
         docs_url="/docs",
         redoc_url="/redoc",
+        default_response_class=ORJSONResponse,
     )
 
     # Add CORS middleware
@@ -27,7 +29,11 @@ def create_app() -> FastAPI:
     )
 
     # Include API routes
-    app.include_router(router, prefix="/api/v1")
+    app.include_router(router, prefix=API_PREFIX)
+    # The same routes under /api/<version> serve that prompt version
+    for version in prompt_router.versions:
+        if f"/api/{version}" != API_PREFIX:
+            app.include_router(router, prefix=f"/api/{version}", include_in_schema=False)
 
     return app
 
@@ -35,6 +41,9 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
+    # Imported here so the Lambda handler does not load the dev server
+    import uvicorn
+
     uvicorn.run(
         "src.main:app",
         host=settings.HOST,
@@ -0,0 +1,98 @@
+# src/server.py
+"""
+Production server: gunicorn managing uvicorn workers.
+
+The app and prompts are loaded in the master before forking so workers share
+them copy-on-write, and SIGTERM drains in-flight requests before exiting.
+Tuned through the WEB_CONCURRENCY, GRACEFUL_TIMEOUT_SECONDS,
+WORKER_TIMEOUT_SECONDS, KEEPALIVE_SECONDS and BACKLOG settings.
+
+Run with: python -m src.server [module:app]
+"""
+import multiprocessing
+import sys
+from typing import Any, Dict
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.util import import_app
+from uvicorn_worker import UvicornWorker
+
+from src.config import settings
+
+
+class GracefulUvicornWorker(UvicornWorker):
+    """Uvicorn worker that waits for in-flight requests on shutdown"""
+    CONFIG_KWARGS = {
+        "loop": "auto",
+        "http": "auto",
+        "timeout_graceful_shutdown": settings.GRACEFUL_TIMEOUT_SECONDS,
+    }
+
+
+def preload_app(app_path: str):
+    """
+    Import the app and warm everything workers would otherwise load per process
+
+    Args:
+        app_path: Import string of the ASGI app, e.g. "src.main:app"
+
+    Returns:
+        The ASGI application
+    """
+    app = import_app(app_path)
+
+    # Modules that routes import lazily (see src.utils.tracing)
+    import langchain_core.prompts  # noqa: F401
+    import langsmith.run_helpers  # noqa: F401
+    import langsmith.wrappers  # noqa: F401
+    import openai  # noqa: F401
+
+    # Every prompt version is pulled, so all of them are warm in each worker
+    from src.api.routes import email_generator
+    email_generator.prefetch_prompts()
+    return app
+
+
+def post_fork(server, worker) -> None:
+    """Drop clients created in the master; their connections must not be shared"""
+    from src.utils.langsmith_prompt_manager import LangsmithPromptManager
+    LangsmithPromptManager._client = None
+
+
+def build_options() -> Dict[str, Any]:
+    """Gunicorn options derived from settings"""
+    return {
+        "bind": f"{settings.HOST}:{settings.PORT}",
+        "workers": settings.WEB_CONCURRENCY or multiprocessing.cpu_count(),
+        "worker_class": "src.server.GracefulUvicornWorker",
+        "preload_app": True,
+        # Leave uvicorn time to finish draining before gunicorn kills the worker
+        "graceful_timeout": settings.GRACEFUL_TIMEOUT_SECONDS + 5,
+        "timeout": settings.WORKER_TIMEOUT_SECONDS,
+        "keepalive": settings.KEEPALIVE_SECONDS,
+        "backlog": settings.BACKLOG,
+        "post_fork": post_fork,
+    }
+
+
+class ProductionServer(BaseApplication):
+    def __init__(self, app_path: str, options: Dict[str, Any]):
+        self.app_path = app_path
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return preload_app(self.app_path)
+
+
+def main() -> None:
+    app_path = sys.argv[1] if len(sys.argv) > 1 else "src.main:app"
+    ProductionServer(app_path, build_options()).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+# src/services/admission.py
+"""
+Per-tenant admission control in front of the LLM.
+
+Each API key gets a token bucket that limits its request rate, and every
+OpenAI call waits for a slot in a shared concurrency pool. Waiting calls are
+served by a weighted fair queue, so one tenant's large campaign cannot starve
+another tenant's interactive requests, and interactive requests are weighted
+above batch work.
+
+The size of the pool adapts to the provider: an AdaptiveLimiter grows it
+while OpenAI call latency stays near its no-load baseline and cuts it when
+latency climbs or OpenAI throttles (429), between LLM_MIN_CONCURRENCY and
+LLM_MAX_CONCURRENCY.
+
+When a request carries a deadline, LLM calls whose estimated queue wait and
+service time would overrun it are shed up front with OverloadedError rather
+than being queued for a result nobody will receive.
+
+The tenant, priority and deadline of the current request travel in context
+variables, set by the API routes or the batch processor and read where the
+LLM is called.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.utils import metrics
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+ANONYMOUS_TENANT = "anonymous"
+
+current_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("current_tenant", default=ANONYMOUS_TENANT)
+current_priority: contextvars.ContextVar[str] = contextvars.ContextVar("current_priority", default=INTERACTIVE)
+# Absolute time.monotonic() deadline of the current request, if it has one
+current_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("current_deadline", default=None)
+
+QUEUE_DEPTH = metrics.gauge("llm_queue_depth", "LLM calls waiting for a concurrency slot")
+IN_FLIGHT = metrics.gauge("llm_in_flight", "LLM calls holding a concurrency slot")
+QUEUE_WAIT = metrics.histogram("llm_queue_wait_seconds", "Time LLM calls waited for a concurrency slot")
+REJECTED = metrics.counter("admission_rejected_total", "Requests rejected by admission control")
+CONCURRENCY_LIMIT = metrics.gauge("llm_concurrency_limit", "Current size of the LLM concurrency pool")
+THROTTLED = metrics.counter("llm_throttled_total", "LLM calls the provider rejected as over capacity")
+
+# Weight of the latest sample in the moving average of LLM call duration
+SERVICE_TIME_SMOOTHING = 0.2
+
+# How fast the no-load latency baseline follows slower calls, per call
+BASELINE_DRIFT = 0.01
+
+# Provider responses that mean it is over capacity
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def deadline_options() -> Dict[str, float]:
+    """OpenAI request options bounding a call by the current request's deadline"""
+    remaining = remaining_time()
+    return {} if remaining is None else {"timeout": max(remaining, 0.001)}
+
+
+class QuotaExceededError(Exception):
+    """Raised when a tenant has used up its request quota"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Request quota exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class OverloadedError(Exception):
+    """Raised when an LLM call cannot complete before the request's deadline"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM capacity is saturated, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `burst` tokens"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """
+        Take `cost` tokens if available
+
+        Returns:
+            0.0 if the tokens were taken, otherwise the seconds until they will be
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (cost - self.tokens) / self.rate
+
+
+class FairQueue:
+    """
+    Concurrency pool whose waiters are served in weighted fair order.
+
+    Each flow's waiters get consecutive virtual finish tags spaced 1/weight
+    apart, starting no earlier than the tag last served (self-clocked fair
+    queueing). Slots go to the smallest tag, so backlogged flows share the pool
+    in proportion to their weights and an idle flow does not bank credit.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_flight = 0
+        self._heap: List[Tuple[float, int, str, "asyncio.Future[None]"]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._finish_tags: Dict[str, float] = {}
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        """Number of waiters, optionally for one priority"""
+        if priority is not None:
+            return self._waiting[priority]
+        return sum(self._waiting.values())
+
+    async def acquire(self, flow: str, weight: float, priority: str = INTERACTIVE) -> float:
+        """
+        Wait for a slot
+
+        Args:
+            flow: Identifier of the flow the waiter belongs to
+            weight: Share of the pool the flow gets relative to other flows
+            priority: Priority class, used for queue depth reporting
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.in_flight < self.capacity and self.depth() == 0:
+            self.in_flight += 1
+            return 0.0
+
+        finish_tag = max(self._virtual_time, self._finish_tags.get(flow, 0.0)) + 1.0 / weight
+        self._finish_tags[flow] = finish_tag
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish_tag, next(self._sequence), priority, future))
+        self._waiting[priority] += 1
+        enqueued_at = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # Still queued; the stale heap entry is skipped when popped
+                self._waiting[priority] -= 1
+            else:
+                # The slot was granted just before the waiter was cancelled
+                self.release()
+            raise
+        return time.monotonic() - enqueued_at
+
+    def resize(self, capacity: int) -> None:
+        """Change the number of slots; waiters are admitted at once if it grew"""
+        self.capacity = capacity
+        self._dispatch()
+
+    def release(self) -> None:
+        """Return a slot to the pool and hand it to the next waiter"""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.capacity and self._heap:
+            finish_tag, _, priority, future = heapq.heappop(self._heap)
+            if future.done():
+                continue
+            self._waiting[priority] -= 1
+            self._virtual_time = finish_tag
+            self.in_flight += 1
+            future.set_result(None)
+
+        if len(self._finish_tags) > 1024:
+            # Tags at or below the virtual time behave exactly like missing ones
+            self._finish_tags = {
+                flow: tag for flow, tag in self._finish_tags.items() if tag > self._virtual_time
+            }
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit driven by LLM call latency and throttling.
+
+    While calls finish within `tolerance` times the no-load latency baseline
+    and the pool is saturated, the limit grows by about one per round trip
+    (1/limit per call). A slower call cuts it by `backoff`, a throttled one by
+    `throttle_backoff`. Cuts happen at most once per round trip, so calls that
+    were in flight together count as one congestion signal.
+    """
+
+    def __init__(
+            self,
+            min_limit: int,
+            max_limit: int,
+            tolerance: float = 2.0,
+            backoff: float = 0.8,
+            throttle_backoff: float = 0.5
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.throttle_backoff = throttle_backoff
+        self.limit = float(max_limit)
+        # Lowest recent call latency, drifting slowly up towards slower calls
+        self.baseline: Optional[float] = None
+        self._decreased_at = float("-inf")
+
+    def on_success(self, latency: float, saturated: bool) -> None:
+        """
+        Record a completed call
+
+        Args:
+            latency: Seconds the call took
+            saturated: Whether every slot was in use, so the limit was what held calls back
+        """
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += BASELINE_DRIFT * (latency - self.baseline)
+
+        if latency > self.baseline * self.tolerance:
+            self._decrease(self.backoff, latency)
+        elif saturated:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, latency: float) -> None:
+        """Record a call the provider rejected as over capacity"""
+        self._decrease(self.throttle_backoff, max(latency, self.baseline or 0.0))
+
+    def _decrease(self, factor: float, round_trip: float) -> None:
+        now = time.monotonic()
+        if now - self._decreased_at < round_trip:
+            return
+        self._decreased_at = now
+        self.limit = max(float(self.min_limit), self.limit * factor)
+
+
+class AdmissionController:
+    """
+    Applies per-tenant quotas and schedules LLM calls fairly across tenants.
+
+    Tenants without an entry in `tenant_quotas` get the default rate and burst
+    and a weight of 1. An entry may override any of "rate", "burst" and
+    "weight". At most `max_buckets` token buckets are kept; the least recently
+    used is dropped first, so arbitrary API keys cannot grow memory without
+    bound.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int,
+            rate_per_second: float,
+            burst: float,
+            tenant_quotas: Optional[Dict[str, Dict[str, float]]] = None,
+            interactive_weight: float = 8.0,
+            limiter: Optional[AdaptiveLimiter] = None,
+            max_buckets: int = 10000
+    ):
+        self.queue = FairQueue(max_concurrency)
+        # Without a limiter the pool keeps max_concurrency slots
+        self.limiter = limiter
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.tenant_quotas = tenant_quotas or {}
+        self.interactive_weight = interactive_weight
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # Moving average of how long an LLM call holds its slot
+        self.service_time: Optional[float] = None
+
+    def check_quota(self, tenant: str, cost: float = 1.0) -> None:
+        """
+        Charge a request against the tenant's token bucket
+
+        Args:
+            tenant: Tenant identifier, normally the API key
+            cost: Number of tokens the request uses
+
+        Raises:
+            QuotaExceededError: If the tenant has no tokens left
+        """
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            quota = self.tenant_quotas.get(tenant, {})
+            bucket = TokenBucket(quota.get("rate", self.rate_per_second), quota.get("burst", self.burst))
+            self._buckets[tenant] = bucket
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(tenant)
+
+        retry_after = bucket.try_acquire(cost)
+        if retry_after > 0:
+            REJECTED.inc(reason="quota")
+            raise QuotaExceededError(retry_after)
+
+    def weight(self, tenant: str, priority: str) -> float:
+        """Fair-queue weight of a tenant's requests at the given priority"""
+        tenant_weight = self.tenant_quotas.get(tenant, {}).get("weight", 1.0)
+        return tenant_weight * (self.interactive_weight if priority == INTERACTIVE else 1.0)
+
+    def estimated_wait(self, priority: str = INTERACTIVE) -> float:
+        """
+        Estimate how long a new LLM call would wait for a slot
+
+        Interactive calls are only counted behind other interactive waiters,
+        since the fair queue serves them well ahead of batch work.
+        """
+        queue = self.queue
+        if queue.in_flight < queue.capacity and queue.depth() == 0:
+            return 0.0
+        ahead = queue.depth(INTERACTIVE) if priority == INTERACTIVE else queue.depth()
+        return (ahead + 1) / max(queue.capacity, 1) * (self.service_time or 0.0)
+
+    def check_deadline(self) -> None:
+        """
+        Shed the current request if an LLM call would not finish before its deadline
+
+        Raises:
+            OverloadedError: If the estimated queue wait plus call duration
+                exceeds the time remaining
+        """
+        remaining = remaining_time()
+        if remaining is None:
+            return
+        estimated_wait = self.estimated_wait(current_priority.get())
+        if remaining <= 0 or estimated_wait + (self.service_time or 0.0) > remaining:
+            REJECTED.inc(reason="deadline")
+            raise OverloadedError(max(estimated_wait, 1.0))
+
+    @asynccontextmanager
+    async def llm_slot(self) -> AsyncIterator[None]:
+        """
+        Hold an LLM concurrency slot for the current tenant and priority
+
+        Raises:
+            OverloadedError: If the call is expected to miss, or does miss while
+                queued, the current request's deadline
+        """
+        self.check_deadline()
+        tenant = current_tenant.get()
+        priority = current_priority.get()
+        # Interactive and batch work of one tenant are separate flows, so a
+        # tenant's own previews do not queue behind its campaign
+        acquire = self.queue.acquire(f"{tenant}:{priority}", self.weight(tenant, priority), priority)
+        remaining = remaining_time()
+        try:
+            waited = await (acquire if remaining is None else asyncio.wait_for(acquire, remaining))
+        except asyncio.TimeoutError:
+            REJECTED.inc(reason="deadline")
+            raise OverloadedError(max(self.estimated_wait(priority), 1.0))
+        QUEUE_WAIT.observe(waited, priority=priority)
+
+        started_at = time.monotonic()
+        completed = False
+        throttled = False
+        try:
+            yield
+            completed = True
+        except Exception as e:
+            throttled = getattr(e, "status_code", None) in THROTTLE_STATUS_CODES
+            raise
+        finally:
+            elapsed = time.monotonic() - started_at
+            saturated = self.queue.in_flight >= self.queue.capacity or self.queue.depth() > 0
+            self.queue.release()
+            # Only completed calls say how long a call takes: a fast error, a
+            # timeout or a cancelled call would drag the baseline down
+            if throttled:
+                THROTTLED.inc()
+            elif completed:
+                if self.service_time is None:
+                    self.service_time = elapsed
+                else:
+                    self.service_time += SERVICE_TIME_SMOOTHING * (elapsed - self.service_time)
+            if self.limiter is not None and (completed or throttled):
+                self._adapt(elapsed, saturated, throttled)
+
+    def _adapt(self, elapsed: float, saturated: bool, throttled: bool) -> None:
+        """Feed a finished call to the limiter and resize the pool to its limit"""
+        if throttled:
+            self.limiter.on_throttle(elapsed)
+        else:
+            self.limiter.on_success(elapsed, saturated)
+        capacity = int(self.limiter.limit)
+        if capacity != self.queue.capacity:
+            self.queue.resize(capacity)
+
+
+admission_controller = AdmissionController(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    rate_per_second=settings.TENANT_RATE_PER_SECOND,
+    burst=settings.TENANT_BURST,
+    tenant_quotas=settings.TENANT_QUOTAS,
+    interactive_weight=settings.INTERACTIVE_PRIORITY_WEIGHT,
+    limiter=AdaptiveLimiter(
+        min_limit=min(settings.LLM_MIN_CONCURRENCY, settings.LLM_MAX_CONCURRENCY),
+        max_limit=settings.LLM_MAX_CONCURRENCY,
+        tolerance=settings.LLM_LATENCY_TOLERANCE,
+    ) if settings.LLM_ADAPTIVE_CONCURRENCY else None,
+    max_buckets=settings.TENANT_BUCKET_MAX_ENTRIES,
+)
+
+for _priority in PRIORITIES:
+    QUEUE_DEPTH.set_function(lambda priority=_priority: admission_controller.queue.depth(priority), priority=_priority)
+IN_FLIGHT.set_function(lambda: admission_controller.queue.in_flight)
+CONCURRENCY_LIMIT.set_function(lambda: admission_controller.queue.capacity)
@@ -0,0 +1,164 @@
+# src/services/batch_processor.py
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import orjson
+
+from src.api.models import EmailRequest, EmailResponse
+from src.config import settings
+from src.services.admission import BATCH, current_deadline, current_priority
+from src.services.email_generator import EmailGenerator
+
+
+# Most messages SQS accepts in one SendMessageBatch call
+SQS_BATCH_SIZE = 10
+
+
+class SqsResultSink:
+    """
+    Delivers generated emails to an SQS queue, one message per record.
+
+    SQS ignores a Lambda's return value apart from batchItemFailures, so
+    without a sink the emails of SQS-triggered batches would be lost. Each
+    message body is {"id", "request", "email"}, where "id" is the source
+    record's identifier.
+
+    Args:
+        queue_url: URL of the result queue
+        client: SQS client, created with boto3 on first use when omitted
+    """
+
+    def __init__(self, queue_url: str, client: Any = None):
+        self.queue_url = queue_url
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("sqs")
+        return self._client
+
+    async def send(self, results: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Send results to the queue
+
+        Args:
+            results: Dictionaries with id, request and email
+
+        Returns:
+            Error message by id of each result that was not delivered
+        """
+        return await asyncio.to_thread(self._send, results)
+
+    def _send(self, results: List[Dict[str, Any]]) -> Dict[str, str]:
+        failed: Dict[str, str] = {}
+        for start in range(0, len(results), SQS_BATCH_SIZE):
+            chunk = results[start:start + SQS_BATCH_SIZE]
+            # Entry IDs only allow a restricted alphabet, so they index the chunk
+            entries = [
+                {"Id": str(index), "MessageBody": orjson.dumps(result).decode()}
+                for index, result in enumerate(chunk)
+            ]
+            try:
+                response = self.client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as e:
+                failed.update((result["id"], str(e)) for result in chunk)
+                continue
+            for failure in response.get("Failed", []):
+                failed[chunk[int(failure["Id"])]["id"]] = failure.get("Message") or failure.get("Code", "")
+        return failed
+
+
+class BatchProcessor:
+    """
+    Generates emails for queue-style batch events inside one invocation.
+
+    Accepts SQS events ({"Records": [{"messageId", "body"}]}, where each body
+    is an EmailRequest JSON document) and direct invocations
+    ({"records": [EmailRequest, ...]}, identified by list index). Records are
+    generated concurrently and failures are reported per record in the SQS
+    partial batch response format. With a result sink, generated emails are
+    delivered to it, and records it could not take are reported as failed so
+    they are retried. With a deadline, records not started by then are
+    reported as failed too, and LLM calls in flight are bounded by it.
+    """
+
+    def __init__(self, email_generator: EmailGenerator, concurrency: Optional[int] = None,
+                 result_sink: Optional[SqsResultSink] = None):
+        self.email_generator = email_generator
+        self.concurrency = concurrency or settings.BATCH_CONCURRENCY
+        self.result_sink = result_sink
+
+    @staticmethod
+    def _records_from_event(event: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """Extract (identifier, raw request) pairs from an SQS or direct event"""
+        if "Records" in event:
+            return [(record["messageId"], record.get("body")) for record in event["Records"]]
+        return [(str(index), record) for index, record in enumerate(event.get("records") or [])]
+
+    async def _process_record(self, identifier: str, raw_request: Any,
+                              semaphore: asyncio.Semaphore,
+                              deadline: Optional[float]) -> Tuple[Dict[str, Any], Optional[EmailRequest]]:
+        """Validate and generate one record, reporting rather than raising failures"""
+        try:
+            if isinstance(raw_request, (str, bytes)):
+                request = EmailRequest.model_validate_json(raw_request)
+            else:
+                request = EmailRequest.model_validate(raw_request)
+        except Exception as e:
+            return {"id": identifier, "status": "error", "error": f"Invalid email request: {str(e)}"}, None
+
+        async with semaphore:
+            if deadline is not None and time.monotonic() >= deadline:
+                return {"id": identifier, "status": "error", "error": "Not started before the invocation deadline"}, request
+            try:
+                email_data = await self.email_generator.generate_email(request)
+            except Exception as e:
+                return {"id": identifier, "status": "error", "error": f"Email generation failed: {str(e)}"}, request
+
+        email = EmailResponse.content_from(email_data)
+        if email["theme_used"] == "error":
+            return {"id": identifier, "status": "error", "error": email["email_body"]}, request
+        return {"id": identifier, "status": "ok", "email": email}, request
+
+    async def _deliver(self, processed: List[Tuple[Dict[str, Any], Optional[EmailRequest]]]) -> None:
+        """Send the generated emails to the result sink, failing the records it did not take"""
+        delivered = [
+            {"id": result["id"], "request": request.model_dump(mode="json"), "email": result["email"]}
+            for result, request in processed
+            if result["status"] == "ok"
+        ]
+        if not delivered:
+            return
+        failed = await self.result_sink.send(delivered)
+        for result, _ in processed:
+            if result["id"] in failed:
+                result.update(status="error", error=f"Result delivery failed: {failed[result['id']]}")
+
+    async def process_event(self, event: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Generate emails for every record in a batch event
+
+        Args:
+            event: SQS or direct batch event
+            deadline: time.monotonic() after which no record is started
+
+        Returns:
+            Dictionary with SQS-style 'batchItemFailures' and per-record 'results'
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Queued records yield LLM capacity to interactive API requests
+        current_priority.set(BATCH)
+        current_deadline.set(deadline)
+        processed = await asyncio.gather(*(
+            self._process_record(identifier, raw_request, semaphore, deadline)
+            for identifier, raw_request in self._records_from_event(event)
+        ))
+        if self.result_sink is not None:
+            await self._deliver(processed)
+        results = [result for result, _ in processed]
+        failures = [{"itemIdentifier": result["id"]} for result in results if result["status"] != "ok"]
+        print(f"Processed batch of {len(results)} records with {len(failures)} failures")
+        return {"batchItemFailures": failures, "results": list(results)}
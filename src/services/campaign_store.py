@@ -0,0 +1,85 @@
+# src/services/campaign_store.py
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from src.api.models import SHARED_CONTEXT_FIELDS, CampaignRequest, EmailRequest
+
+
+class CampaignNotFoundError(Exception):
+    """Raised when an email request names a campaign that is not registered (or has expired)"""
+
+
+class Campaign:
+    """A registered campaign with its shared template variables flattened once"""
+
+    def __init__(self, campaign_id: str, request: CampaignRequest):
+        self.campaign_id = campaign_id
+        self.request = request
+        self.shared_context = request.to_shared_context()
+
+    def shared_context_for(self, email_request: EmailRequest) -> Dict[str, str]:
+        """
+        Shared template variables for one email of the campaign
+
+        Fields the email request sets explicitly override the campaign's.
+        """
+        overrides = email_request.model_fields_set.intersection(SHARED_CONTEXT_FIELDS)
+        if not overrides:
+            return self.shared_context
+        merged = self.request.model_copy(update={field: getattr(email_request, field) for field in overrides})
+        return merged.to_shared_context()
+
+
+class CampaignStore:
+    """
+    In-memory registry of campaigns.
+
+    Campaign IDs are derived from the campaign content, so registering the same
+    campaign again (e.g. on another instance, or after it expired) returns the
+    same ID and clients can simply re-register when a campaign is not found.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._campaigns: "OrderedDict[str, Tuple[float, Campaign]]" = OrderedDict()
+
+    @staticmethod
+    def campaign_id(request: CampaignRequest) -> str:
+        """Content-derived ID of a campaign"""
+        digest = hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+        return f"cmp_{digest[:24]}"
+
+    def register(self, request: CampaignRequest) -> Campaign:
+        """
+        Register a campaign, or refresh it if already registered
+
+        Args:
+            request: Context shared by every email of the campaign
+
+        Returns:
+            The registered campaign
+        """
+        campaign_id = self.campaign_id(request)
+        entry = self._campaigns.get(campaign_id)
+        campaign = entry[1] if entry is not None else Campaign(campaign_id, request)
+        self._campaigns[campaign_id] = (time.monotonic(), campaign)
+        self._campaigns.move_to_end(campaign_id)
+        while len(self._campaigns) > self.max_entries:
+            self._campaigns.popitem(last=False)
+        return campaign
+
+    def get(self, campaign_id: str) -> Campaign:
+        """
+        Get a registered campaign
+
+        Raises:
+            CampaignNotFoundError: If the campaign is unknown or expired
+        """
+        entry = self._campaigns.get(campaign_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            self._campaigns.pop(campaign_id, None)
+            raise CampaignNotFoundError(f"Campaign {campaign_id} is not registered or has expired")
+        return entry[1]
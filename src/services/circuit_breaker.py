@@ -0,0 +1,108 @@
+# src/services/circuit_breaker.py
+"""
+Circuit breaker for calls to OpenAI.
+
+After `failure_threshold` consecutive failed calls (connection errors,
+timeouts, throttling or server errors) the circuit opens: requests stop
+calling OpenAI and are answered from the email synthesizer, or with the
+error email, instead of each waiting for its own failure. After `reset_seconds` one
+trial call is let through; its success closes the circuit, its failure opens
+it again.
+"""
+import time
+from typing import Optional
+
+from src.services.admission import THROTTLE_STATUS_CODES
+from src.utils import metrics
+
+CIRCUIT_OPEN = metrics.gauge("llm_circuit_open", "1 while the OpenAI circuit breaker is open or half-open, else 0")
+CIRCUIT_TRANSITIONS = metrics.counter("llm_circuit_transitions_total", "OpenAI circuit breaker state changes")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_outage(error: BaseException, deadline_bound: bool = False) -> bool:
+    """
+    Whether a failed call points at OpenAI being down rather than at the request
+
+    Connection errors, 5xx and throttling count. Timeouts only count when the
+    call was not cut short by the request's own deadline (e.g. a tight
+    X-Request-Timeout), so one client cannot open the circuit for everyone.
+
+    Args:
+        error: What the OpenAI call raised
+        deadline_bound: Whether the call's timeout was the request's deadline
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500 or status_code in THROTTLE_STATUS_CODES
+    # Only raised by calls, so openai is already imported
+    from openai import APIConnectionError, APITimeoutError
+    if isinstance(error, (APITimeoutError, TimeoutError)):
+        return not deadline_bound
+    return isinstance(error, (APIConnectionError, ConnectionError))
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive OpenAI failures and stops calls while they persist.
+
+    Args:
+        failure_threshold: Consecutive failed calls that open the circuit
+        reset_seconds: Seconds the circuit stays open before a trial call
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to OpenAI now
+
+        While half-open, only one caller at a time gets True; a trial that
+        neither succeeds nor fails (e.g. it was cancelled) is replaced after
+        `reset_seconds`.
+        """
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < self.reset_seconds:
+                return False
+            self._transition(HALF_OPEN)
+        elif self._trial_started_at is not None and now - self._trial_started_at < self.reset_seconds:
+            return False
+        self._trial_started_at = now
+        return True
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a call through again"""
+        if self.state == CLOSED:
+            return 0.0
+        return max(self.reset_seconds - (time.monotonic() - self._opened_at), 1.0)
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._trial_started_at = None
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_started_at = None
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        print(f"OpenAI circuit breaker {self.state} -> {state} after {self.consecutive_failures} failures")
+        self.state = state
+        CIRCUIT_TRANSITIONS.inc(state=state)
+        CIRCUIT_OPEN.set(0.0 if state == CLOSED else 1.0)
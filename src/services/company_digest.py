@@ -0,0 +1,173 @@
+# src/services/company_digest.py
+"""
+Compact digests of a company's data, shared by the prospects at that company.
+
+Account-based campaigns send many prospects at one company, and each request
+repeats the company block: long descriptions from the company lookup, news
+and growth signals that often restate each other, and full tool lists.
+CompanyDigester condenses the block into the company_* template variables
+once per company: text is cut at sentence (or list item) boundaries,
+sentences already given by a fresher field are dropped, and the whole
+block is kept under `max_chars` characters (about a quarter as many tokens).
+
+Digests are cached by company key (its domain, or its name without a URL)
+and version (Python's hash of the company's field values, so prospects sent
+with different signals for one company get their own digest), and rebuilt
+after `ttl_seconds`. The version costs a couple of microseconds, against
+tens for building a digest.
+"""
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from src.api.models import CompanyData
+from src.services.company_info_service import normalize_company_domain
+from src.utils import metrics
+
+COMPANY_DIGESTS = metrics.counter("company_digests_total", "Company digests by cache result (hit, miss, stale)")
+COMPANY_DIGEST_CHARS = metrics.counter(
+    "company_digest_chars_total", "Characters of company data before and after digesting, by stage"
+)
+
+# Bump when the digest format changes, so cached digests are rebuilt
+DIGEST_VERSION = 1
+
+# Short fields, kept as they are up to this length
+SHORT_FIELDS = ("name", "url", "industry", "employee_count", "annual_revenue", "funding_stage")
+MAX_SHORT_CHARS = 80
+
+# Free-text fields, freshest first: a sentence already given by an earlier field is dropped from a later one
+TEXT_FIELDS = ("recent_news", "growth_signals", "technography", "description")
+
+_FIELDS = tuple(CompanyData.model_fields)
+
+_SPACES = re.compile(r"\s+")
+# Sentence and list item ends: punctuation followed by whitespace (not the dot of $2.5M or acme.io)
+_BOUNDARY = re.compile(r"(?<=[.!?;,])\s+")
+
+
+def company_key(company: CompanyData) -> str:
+    """The key of a company's digest: its domain, or its lowercased name without a URL"""
+    if company.url:
+        return normalize_company_domain(company.url)
+    return _SPACES.sub(" ", (company.name or "").strip().lower())
+
+
+def _parts(text: str) -> List[str]:
+    """Sentences and list items of a text, with their punctuation"""
+    return [part for part in _BOUNDARY.split(text) if part]
+
+
+def _fit(parts: List[str], budget: int) -> str:
+    """Join as many whole parts as fit in the budget, ending with an ellipsis if any were left out"""
+    text = " ".join(parts)
+    if len(text) <= budget:
+        return text
+    if budget <= 1:
+        return ""
+    # One character is kept for the ellipsis
+    kept: List[str] = []
+    size = -1
+    for part in parts:
+        if size + 1 + len(part) > budget - 1:
+            break
+        kept.append(part)
+        size += 1 + len(part)
+    if not kept:
+        # A single long sentence is cut at a word boundary
+        return parts[0][:budget - 1].rsplit(" ", 1)[0].rstrip(",;") + "…"
+    return " ".join(kept).rstrip(",;") + "…"
+
+
+class CompanyDigester:
+    """
+    Builds and caches the company_* template variables of companies.
+
+    Args:
+        max_chars: Most characters of all company variables together
+        ttl_seconds: Age after which a company's digest is rebuilt
+        max_entries: Most companies kept, least recently used dropped first
+    """
+
+    def __init__(self, max_chars: int, ttl_seconds: float, max_entries: int):
+        self.max_chars = max_chars
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # (company key, version) -> (built at, template variables)
+        self._digests: "OrderedDict[Tuple[str, int], Tuple[float, Dict[str, str]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    @staticmethod
+    def version(company: CompanyData) -> int:
+        """Cheap version of a company's data; only compared within this process"""
+        return hash((DIGEST_VERSION, *(getattr(company, field) for field in _FIELDS)))
+
+    def digest(self, company: CompanyData) -> Dict[str, str]:
+        """
+        The company_* template variables of a company, condensed
+
+        Args:
+            company: The company, after enrichment
+
+        Returns:
+            A value for every company_* variable of the prompt templates
+        """
+        key = (company_key(company), self.version(company))
+        entry = self._digests.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+            COMPANY_DIGESTS.inc(result="hit")
+            self._digests.move_to_end(key)
+            return entry[1]
+        COMPANY_DIGESTS.inc(result="miss" if entry is None else "stale")
+
+        variables = self.build(company)
+        self._digests[key] = (time.monotonic(), variables)
+        self._digests.move_to_end(key)
+        if len(self._digests) > self.max_entries:
+            self._digests.popitem(last=False)
+        return variables
+
+    def build(self, company: CompanyData) -> Dict[str, str]:
+        """Condense a company into its template variables, without the cache"""
+        variables: Dict[str, str] = {}
+        original = 0
+        for field in CompanyData.model_fields:
+            value = getattr(company, field)
+            text = "" if value is None else _SPACES.sub(" ", str(value)).strip()
+            original += len(text)
+            if field in SHORT_FIELDS:
+                variables[f"company_{field}"] = text if len(text) <= MAX_SHORT_CHARS else text[:MAX_SHORT_CHARS - 1] + "…"
+            else:
+                variables[f"company_{field}"] = text
+
+        # The free-text fields share what the short fields leave of the budget
+        budget = self.max_chars - sum(len(variables[f"company_{field}"]) for field in SHORT_FIELDS)
+        seen = set()
+        texts: Dict[str, List[str]] = {}
+        for field in TEXT_FIELDS:
+            parts = []
+            for part in _parts(variables[f"company_{field}"]):
+                normalized = part.rstrip(".!?;,").lower()
+                if normalized not in seen:
+                    seen.add(normalized)
+                    parts.append(part)
+            texts[field] = parts
+
+        # Shorter fields first, each getting an even share of what is left, so
+        # what a short field does not use goes to the longer ones
+        fields = sorted((field for field in TEXT_FIELDS if texts[field]),
+                        key=lambda field: sum(len(part) + 1 for part in texts[field]))
+        for index, field in enumerate(fields):
+            share = max(budget, 0) // (len(fields) - index)
+            variables[f"company_{field}"] = _fit(texts[field], share)
+            budget -= len(variables[f"company_{field}"])
+        for field in TEXT_FIELDS:
+            if not texts[field]:
+                variables[f"company_{field}"] = ""
+
+        COMPANY_DIGEST_CHARS.inc(original, stage="original")
+        COMPANY_DIGEST_CHARS.inc(sum(len(value) for value in variables.values()), stage="digested")
+        return variables
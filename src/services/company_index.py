@@ -0,0 +1,148 @@
+# src/services/company_index.py
+"""
+Index of known companies for resolving near-duplicate lookups.
+
+The same company turns up under many hosts: "app.acme.com/login",
+"www.acme.com" and "acme.io". The index maps every looked-up company's
+registrable domain (eTLD+1) and its name aliases to the domain its data is
+cached under. A new host then resolves to a known company through its
+registrable domain or, when alias matching is turned on, through its brand
+label (e.g. "acme" from "acme.io") matching a company name seen before.
+
+Registrable domains come from the Public Suffix List, private suffixes
+included, so "acme.github.io" and "other.github.io" stay two companies.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional, Set, Tuple
+
+# Words dropped from company names before they are used as aliases
+NAME_SUFFIX_WORDS = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation", "co", "company",
+    "gmbh", "ag", "sa", "sas", "srl", "bv", "nv", "plc", "pty", "oy", "ab", "as",
+    "group", "holdings", "technologies", "technology", "solutions", "software", "systems",
+    "labs", "hq",
+}
+
+# Placeholder names returned for failed lookups, never used as aliases
+UNKNOWN_NAMES = {"unknown", "error"}
+
+_AMBIGUOUS = ""
+
+
+@lru_cache(maxsize=1)
+def _suffix_extractor():
+    # Imported on first use to keep it out of the Lambda cold start. The
+    # snapshot of the list bundled with tldextract is used, never fetched.
+    import tldextract
+    return tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None, include_psl_private_domains=True)
+
+
+def registrable_domain(host: str) -> str:
+    """
+    Reduce a host to its registrable domain (eTLD+1)
+
+    Args:
+        host: Normalized host, e.g. "app.acme.co.uk"
+
+    Returns:
+        The registrable domain, e.g. "acme.co.uk"; IP addresses and hosts
+        without a public suffix are returned as is
+    """
+    parts = _suffix_extractor()(host)
+    if not parts.suffix or not parts.domain:
+        return host
+    return f"{parts.domain}.{parts.suffix}"
+
+
+def brand_label(host: str) -> str:
+    """The label naming the brand in a host, e.g. acme in app.acme.co.uk"""
+    return registrable_domain(host).split(".")[0]
+
+
+def name_alias(company_name: str) -> str:
+    """
+    Normalize a company name for matching against brand labels
+
+    "Acme, Inc." and "ACME Technologies" both become "acme".
+    """
+    words = re.findall(r"[a-z0-9]+", company_name.lower())
+    while len(words) > 1 and words[-1] in NAME_SUFFIX_WORDS:
+        words.pop()
+    if words and words[0] == "the" and len(words) > 1:
+        words.pop(0)
+    return "".join(words)
+
+
+class CompanyIndex:
+    """
+    Maps registrable domains and name aliases to the domain a company is cached under.
+
+    A name alias claimed by two different companies is marked ambiguous and
+    no longer matches. Aliases only resolve with `match_aliases`, since a
+    brand label alone (acme.io, acme.com) does not prove the same company.
+    """
+
+    def __init__(self, match_aliases: bool = False):
+        self.match_aliases = match_aliases
+        self._by_registrable: Dict[str, str] = {}
+        self._by_alias: Dict[str, str] = {}
+        self._keys: Dict[str, Set[Tuple[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, domain: str, company_data: Dict[str, Any]) -> None:
+        """
+        Index a looked-up company
+
+        Args:
+            domain: Normalized domain the company data is cached under
+            company_data: Lookup result, whose company_name is used as an alias
+        """
+        keys = self._keys.setdefault(domain, set())
+
+        registrable = registrable_domain(domain)
+        self._by_registrable.setdefault(registrable, domain)
+        if self._by_registrable[registrable] == domain:
+            keys.add(("registrable", registrable))
+
+        aliases = {brand_label(domain)}
+        company_name = str(company_data.get("company_name") or "")
+        if company_name.lower() not in UNKNOWN_NAMES:
+            aliases.add(name_alias(company_name))
+        for alias in aliases - {""}:
+            owner = self._by_alias.get(alias)
+            if owner is None:
+                self._by_alias[alias] = domain
+                keys.add(("alias", alias))
+            elif owner not in (domain, _AMBIGUOUS) and registrable_domain(owner) != registrable:
+                # Two different companies claim the alias
+                self._by_alias[alias] = _AMBIGUOUS
+
+    def remove(self, domain: str) -> None:
+        """Drop every index entry pointing at a domain, e.g. when its cache entry is evicted"""
+        for kind, key in self._keys.pop(domain, ()):
+            entries = self._by_registrable if kind == "registrable" else self._by_alias
+            if entries.get(key) == domain:
+                del entries[key]
+
+    def resolve(self, domain: str) -> Optional[Tuple[str, str]]:
+        """
+        Find the known company a domain most likely belongs to
+
+        Args:
+            domain: Normalized domain being looked up
+
+        Returns:
+            Tuple of the domain the company is cached under and the match kind
+            ("registrable_domain" or "name_alias"), or None if it is unknown
+        """
+        known = self._by_registrable.get(registrable_domain(domain))
+        if known and known != domain:
+            return known, "registrable_domain"
+        if self.match_aliases:
+            known = self._by_alias.get(brand_label(domain))
+            if known and known != domain:
+                return known, "name_alias"
+        return None
@@ -1,19 +1,210 @@
 # src/services/company_info_service.py
-from typing import Dict, Any
+from collections import OrderedDict, defaultdict
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
 import json
+import time
 
-from langsmith import traceable
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
+import orjson
 
-from src.api.models import CompanyDescriptionResponse
 from src.config import settings
+from src.services.admission import OverloadedError, admission_controller, deadline_options
+from src.services.company_index import CompanyIndex, registrable_domain
+from src.utils import metrics
+from src.utils.llm_recorder import llm_recorder
+from src.utils.tracing import traceable
+
+LOOKUPS = metrics.counter("company_lookups_total", "Company lookups by how they were resolved")
+HIT_RATIO = metrics.gauge("company_lookup_hit_ratio", "Share of company lookups answered without a web search")
+HIT_RATIO.set_function(
+    lambda: 1 - LOOKUPS.value(result="web_search") / LOOKUPS.total() if LOOKUPS.total() else 0.0
+)
+
+
+def normalize_company_domain(company_url: str) -> str:
+    """
+    Reduce a company URL to the bare host used as the lookup cache key
+
+    Args:
+        company_url: URL or bare domain of the company website
+
+    Returns:
+        The lowercase host without scheme, port, path or a leading "www."
+    """
+    value = company_url.strip().lower()
+    if "://" not in value:
+        value = f"//{value}"
+    try:
+        host = urlsplit(value).hostname or ""
+    except ValueError:
+        host = ""
+    if host.startswith("www."):
+        host = host[4:]
+    return host.rstrip(".") or company_url.strip().lower()
 
 
 class CompanyInfoService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # The OpenAI client is created on first use to keep openai out of cold start
+        self._client = None
         self.model = settings.OPENAI_MODEL_WEB_SEARCH
+        self.cache_ttl = settings.COMPANY_CACHE_TTL_SECONDS
+        self.cache_max_entries = settings.COMPANY_CACHE_MAX_ENTRIES
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Resolves subdomains and sibling domains to companies already looked up
+        self.index = CompanyIndex(match_aliases=settings.COMPANY_ALIAS_MATCHING)
+
+    @property
+    def client(self):
+        """Asynchronous OpenAI client used for web-search lookups"""
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = llm_recorder.wrap(AsyncOpenAI(api_key=settings.OPENAI_API_KEY))
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def get_cached(self, domain: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a previously looked up company by its normalized domain
+
+        Args:
+            domain: Domain as returned by normalize_company_domain
+
+        Returns:
+            A copy of the cached company data, or None if missing or expired
+        """
+        entry = self._cache.get(domain)
+        if entry is None:
+            return None
+        stored_at, company_data = entry
+        if time.monotonic() - stored_at > self.cache_ttl:
+            del self._cache[domain]
+            self.index.remove(domain)
+            return None
+        self._cache.move_to_end(domain)
+        return dict(company_data)
+
+    def resolve_cached(self, domain: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a known company for a domain, matching near-duplicates of cached domains
+
+        An exact cache hit is tried first, then the company index, so
+        "app.acme.com" or "acme.io" can be answered from a lookup of "acme.com".
+        Hits are counted in company_lookups_total by how they were resolved.
+
+        Args:
+            domain: Domain as returned by normalize_company_domain
+
+        Returns:
+            A copy of the cached company data, or None if no known company matches
+        """
+        cached = self.get_cached(domain)
+        if cached is not None:
+            LOOKUPS.inc(result="exact")
+            return cached
+
+        match = self.index.resolve(domain)
+        if match is not None:
+            known_domain, match_kind = match
+            cached = self.get_cached(known_domain)
+            if cached is not None:
+                LOOKUPS.inc(result=match_kind)
+                return cached
+        return None
+
+    def _store(self, domain: str, company_data: Dict[str, Any]) -> None:
+        """Cache and index a successful lookup, evicting the least recently used entries"""
+        self._cache[domain] = (time.monotonic(), dict(company_data))
+        self._cache.move_to_end(domain)
+        self.index.add(domain, company_data)
+        while len(self._cache) > self.cache_max_entries:
+            evicted_domain, _ = self._cache.popitem(last=False)
+            self.index.remove(evicted_domain)
+
+    async def lookup_company(self, company_url: str) -> Dict[str, Any]:
+        """
+        Look up company information, serving it from the cache when possible
+
+        Unlike get_company_description, failures are raised rather than turned
+        into a fallback description, and only successful lookups are cached.
+
+        Args:
+            company_url: URL of the company website
+
+        Returns:
+            Dictionary with company information
+        """
+        domain = normalize_company_domain(company_url)
+        cached = self.resolve_cached(domain)
+        if cached is not None:
+            return cached
+
+        LOOKUPS.inc(result="web_search")
+        company_data = await self._search_company(company_url)
+        self._store(domain, company_data)
+        return company_data
+
+    async def iter_company_descriptions(
+            self,
+            company_urls: List[str],
+            concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Look up many companies, yielding one result per distinct domain
+
+        URLs are deduplicated by normalized domain. Cached domains are yielded
+        first; the rest are searched with at most `concurrency` lookups in
+        flight and yielded as they complete. A failed lookup is reported in
+        its own result instead of aborting the batch.
+
+        Args:
+            company_urls: URLs of the company websites
+            concurrency: Maximum concurrent lookups (defaults to settings)
+
+        Returns:
+            Async iterator of dictionaries with domain, company_urls, cached and
+            either company or error
+        """
+        domains: Dict[str, List[str]] = {}
+        for company_url in company_urls:
+            domains.setdefault(normalize_company_domain(company_url), []).append(company_url)
+
+        pending = []
+        for domain, urls in domains.items():
+            cached = self.resolve_cached(domain)
+            if cached is not None:
+                yield {"domain": domain, "company_urls": urls, "cached": True, "company": cached}
+            else:
+                pending.append((domain, urls))
+
+        semaphore = asyncio.Semaphore(concurrency or settings.COMPANY_BATCH_CONCURRENCY)
+        # Hosts of one registrable domain are looked up one after another, so
+        # "app.acme.com" is answered by the "acme.com" lookup in the same batch
+        registrable_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+        async def fetch(domain: str, urls: List[str]) -> Dict[str, Any]:
+            result = {"domain": domain, "company_urls": urls, "cached": False}
+            async with registrable_locks[registrable_domain(domain)], semaphore:
+                try:
+                    result["company"] = await self.lookup_company(urls[0])
+                except json.JSONDecodeError:
+                    result["error"] = "Could not parse company information returned by the model"
+                except Exception as e:
+                    result["error"] = str(e)
+            return result
+
+        tasks = [asyncio.create_task(fetch(domain, urls)) for domain, urls in pending]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # The consumer may stop early, e.g. when the client disconnects
+            for task in tasks:
+                task.cancel()
 
     @traceable
     async def get_company_description(self, company_url: str) -> Dict[str, Any]:
@@ -27,61 +218,15 @@ class CompanyInfoService:
             Dictionary with company information
         """
         try:
-            # System prompt to instruct the model to search for company information
-            system_prompt = """
-            You are a helpful assistant that provides accurate information about companies.
-            Use web search to find information when necessary. 
-            ALWAYS format your response as a valid JSON object with the following fields:
-            - company_name (string, required): Name of the company
-            - description (string, required): Detailed description of what the company does
-            - industry (string, optional): Industry or sector
-            - employee_count (string, optional): Approximate number of employees
-            - headquarters (string, optional): Location of headquarters
-            - founded_year (string, optional): Year founded
-            - products_services (string, optional): Main products or services
-
-            If you cannot find certain information, omit the field rather than providing guesses.
-            """
-
-            # User prompt with the company URL
-            user_prompt = f"""
-            I need information about the company with the website: {company_url}
-
-            Please search the web to find details about this company and return structured information in JSON format 
-            with their name, description, industry, size, headquarters, founding year, and main products/services.
-            """
-
-            # Call OpenAI API with web search tool
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=1000,
-                web_search_options={},
-            )
-            print(response.choices[0].message.content)
-
-            # Parse the JSON response
-            try:
-                company_data = json.loads(response.choices[0].message.content)
-
-                # Ensure required fields are present
-                if "company_name" not in company_data:
-                    company_data["company_name"] = "Unknown"
-                if "description" not in company_data:
-                    company_data["description"] = "No description available."
-
-                return company_data
-            except json.JSONDecodeError:
-                # Fallback if the response is not valid JSON
-                return {
-                    "company_name": "Unknown",
-                    "description": "Could not retrieve company information from the provided URL."
-                }
+            return await self.lookup_company(company_url)
+        except json.JSONDecodeError:
+            # Fallback if the response is not valid JSON
+            return {
+                "company_name": "Unknown",
+                "description": "Could not retrieve company information from the provided URL."
+            }
+        except OverloadedError:
+            raise
         except Exception as e:
             # Log the error for debugging
             import traceback
@@ -92,4 +237,68 @@ class CompanyInfoService:
             return {
                 "company_name": "Error",
                 "description": f"An error occurred while retrieving company information: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+    async def _search_company(self, company_url: str) -> Dict[str, Any]:
+        """
+        Search the web for the company and parse the model's JSON answer
+
+        Args:
+            company_url: URL of the company website
+
+        Returns:
+            Dictionary with company information
+
+        Raises:
+            json.JSONDecodeError: If the model did not answer with valid JSON
+        """
+        # System prompt to instruct the model to search for company information
+        system_prompt = """
+        You are a helpful assistant that provides accurate information about companies.
+        Use web search to find information when necessary.
+        ALWAYS format your response as a valid JSON object with the following fields:
+        - company_name (string, required): Name of the company
+        - description (string, required): Detailed description of what the company does
+        - industry (string, optional): Industry or sector
+        - employee_count (string, optional): Approximate number of employees
+        - headquarters (string, optional): Location of headquarters
+        - founded_year (string, optional): Year founded
+        - products_services (string, optional): Main products or services
+
+        If you cannot find certain information, omit the field rather than providing guesses.
+        """
+
+        # User prompt with the company URL
+        user_prompt = f"""
+        I need information about the company with the website: {company_url}
+
+        Please search the web to find details about this company and return structured information in JSON format
+        with their name, description, industry, size, headquarters, founding year, and main products/services.
+        """
+
+        # Call OpenAI API with web search tool
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+        async with admission_controller.llm_slot():
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=1000,
+                web_search_options={},
+                **deadline_options()
+            )
+        print(response.choices[0].message.content)
+
+        # Parse the JSON response
+        company_data = orjson.loads(response.choices[0].message.content)
+
+        # Ensure required fields are present
+        if "company_name" not in company_data:
+            company_data["company_name"] = "Unknown"
+        if "description" not in company_data:
+            company_data["description"] = "No description available."
+
+        return company_data
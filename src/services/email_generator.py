@@ -1,94 +1,365 @@
 # src/services/email_generator.py
-import json
-from typing import Dict, Any
+import asyncio
+import re
+from typing import Dict, Any, List, Optional
 
-from langsmith import traceable
-from langsmith.wrappers import wrap_openai
-from openai import OpenAI
+import orjson
+from pydantic import ValidationError
 
+from src.api.models import CompanyData, EmailRequest
 from src.config import settings
+from src.services.admission import OverloadedError, admission_controller, deadline_options
+from src.services.campaign_store import CampaignNotFoundError, CampaignStore
+from src.services.circuit_breaker import CircuitBreaker, is_outage
+from src.services.company_digest import CompanyDigester
+from src.services.company_info_service import CompanyInfoService
+from src.services.email_quality import REGENERATIONS, UNRESOLVED, check_email
+from src.services.email_synthesizer import EmailSynthesizer
+from src.services.history_digest import HistoryDigester
+from src.services.theme_scorer import ThemeChoice, ThemeScorer
 from src.utils.langsmith_prompt_manager import LangsmithPromptManager
+from src.utils.llm_recorder import llm_recorder
+from src.utils.prompt_versions import PromptVersion, prompt_router
+from src.utils.tracing import traceable, wrap_openai
+
+# CompanyData fields that can be filled from a company lookup, mapped to the
+# key CompanyInfoService uses for them
+ENRICHMENT_FIELDS = {
+    "name": "company_name",
+    "description": "description",
+    "industry": "industry",
+    "employee_count": "employee_count",
+}
+
+# Employee counts as lookups write them: "1,200", "500+" or a range like "250-500" (its lower bound is used)
+_EMPLOYEE_COUNT = re.compile(r"^\s*([\d,]+)\s*(?:\+|[-–]\s*[\d,]+\+?)?\s*(?:employees)?\s*$", re.IGNORECASE)
 
 
 class EmailGenerator:
-    def __init__(self):
-        self.client = wrap_openai(OpenAI(api_key=settings.OPENAI_API_KEY))
+    def __init__(
+            self,
+            company_info_service: Optional[CompanyInfoService] = None,
+            campaign_store: Optional[CampaignStore] = None,
+            history_digester: Optional[HistoryDigester] = None,
+            theme_scorer: Optional[ThemeScorer] = None,
+            circuit_breaker: Optional[CircuitBreaker] = None,
+            company_digester: Optional[CompanyDigester] = None
+    ):
+        # OpenAI clients are created on first use to keep openai out of cold start
+        self._client = None
+        self._async_client = None
         self.prompt_manager = LangsmithPromptManager()
         self.model = settings.OPENAI_MODEL
+        self.company_info_service = company_info_service or CompanyInfoService()
+        self.campaign_store = campaign_store
+        self.history_digester = history_digester or HistoryDigester(
+            settings.EMAIL_HISTORY_DIGEST_MAX_CHARS, settings.EMAIL_HISTORY_CACHE_MAX_ENTRIES
+        )
+        self.theme_scorer = theme_scorer or ThemeScorer()
+        self.company_digester = company_digester or CompanyDigester(
+            settings.EMAIL_COMPANY_DIGEST_MAX_CHARS,
+            settings.EMAIL_COMPANY_DIGEST_TTL_SECONDS,
+            settings.EMAIL_COMPANY_DIGEST_MAX_ENTRIES,
+        )
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS
+        )
+        # Templates are read on first use, i.e. when OpenAI first fails
+        self._synthesizer: Optional[EmailSynthesizer] = None
+
+    @property
+    def client(self):
+        """Synchronous OpenAI client, used for health checks"""
+        if self._client is None:
+            from openai import OpenAI
+            self._client = wrap_openai(OpenAI(api_key=settings.OPENAI_API_KEY))
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def synthesizer(self) -> EmailSynthesizer:
+        """Template email synthesizer, used in degraded mode"""
+        if self._synthesizer is None:
+            self._synthesizer = EmailSynthesizer.from_file(settings.EMAIL_TEMPLATES_PATH)
+        return self._synthesizer
+
+    @synthesizer.setter
+    def synthesizer(self, synthesizer: EmailSynthesizer):
+        self._synthesizer = synthesizer
+
+    @property
+    def async_client(self):
+        """Asynchronous OpenAI client, used for email generation"""
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            # Completions are recorded or replayed when LLM_RECORD_MODE asks for it
+            self._async_client = llm_recorder.wrap(wrap_openai(AsyncOpenAI(api_key=settings.OPENAI_API_KEY)))
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
 
     @traceable
     async def generate_email(
             self,
-            request_data: Dict[str, Any]
+            request: EmailRequest,
+            theme_choice: Optional[ThemeChoice] = None
     ) -> Dict[str, Any]:
         """
         Generate a personalized email using the LLM
 
+        Requests asking to `synthesize`, and with EMAIL_SYNTHESIS_FALLBACK
+        requests made while OpenAI is failing, get an email written from a
+        template instead, flagged `synthesized`.
+
         Args:
-            request_data: Complete request data with prospect, company, etc.
+            request: Validated email request with prospect, company, etc.
+            theme_choice: Theme already chosen for the request, e.g. by scoring a batch
 
         Returns:
             The generated email data as a dictionary
+
+        Raises:
+            CampaignNotFoundError: If the request names an unknown campaign
         """
+        shared_context = None
+        if request.campaign_id is not None:
+            if self.campaign_store is None:
+                raise CampaignNotFoundError(f"Campaign {request.campaign_id} is not registered or has expired")
+            shared_context = self.campaign_store.get(request.campaign_id).shared_context_for(request)
+
+        if request.synthesize:
+            return self._synthesize(request, theme_choice, shared_context, "requested")
+        if not self.circuit_breaker.allow():
+            if settings.EMAIL_SYNTHESIS_FALLBACK:
+                return self._synthesize(request, theme_choice, shared_context, "circuit_open")
+            return self._error_email(f"OpenAI is failing, retry after {self.circuit_breaker.retry_after():.0f}s")
+
+        prompt_version = prompt_router.current()
         try:
-            # Ensure request_data is a dictionary
-            if request_data is None:
-                request_data = {}
+            # Look the company up from its URL while the prompts are fetched
+            if self._needs_enrichment(request.company):
+                enrichment = asyncio.create_task(self._lookup_company(request.company.url))
+                step_number = request.metadata.step_number if request.metadata else 1
+                await asyncio.to_thread(self.prefetch_prompts, step_number, [prompt_version])
+                company = self._merge_enrichment(request.company, await enrichment)
+                if company is not request.company:
+                    request = request.model_copy(update={"company": company})
+
+            # Long follow-up histories are sent as a digest of their emails
+            email_history = None
+            if settings.EMAIL_HISTORY_DIGEST and request.metadata is not None and request.metadata.step_number > 1:
+                email_history = self.history_digester.digest(request.metadata.email_history)
+
+            # Company data is condensed once per company and reused for its other prospects
+            company_context = None
+            if settings.EMAIL_COMPANY_DIGEST:
+                company_context = self.company_digester.digest(request.company)
 
-            # Ensure required sections exist
-            if "prospect" not in request_data:
-                request_data["prospect"] = {}
-            if "company" not in request_data:
-                request_data["company"] = {}
+            # The theme is chosen locally, so the prompt only carries that theme's rules
+            if theme_choice is None and settings.EMAIL_LOCAL_THEME_SELECTION:
+                theme_choice = self.theme_scorer.score(
+                    request.prospect, request.company, request.metadata.theme if request.metadata else None
+                )
 
-            # Render both prompts using the LangsmithPromptManager
+            # Render both prompts of the request's prompt version using the LangsmithPromptManager
             prompts = self.prompt_manager.render_prompt(
-                request_data,
-                user_prompt_id=settings.LANGSMITH_USER_PROMPT_ID,
-                system_prompt_id=settings.LANGSMITH_SYSTEM_PROMPT_ID,
-                user_prompt_followup_id=settings.LANGSMITH_USER_FOLLOWUP_PROMPT_ID
+                request,
+                user_prompt_id=prompt_version.user_prompt_id,
+                system_prompt_id=prompt_version.system_prompt_id,
+                user_prompt_followup_id=prompt_version.user_prompt_followup_id,
+                shared_context=shared_context,
+                email_history=email_history,
+                company_context=company_context
             )
 
+            system_prompt, user_prompt = prompts["system_prompt"], prompts["user_prompt"]
+            if theme_choice is not None:
+                system_prompt = self.theme_scorer.system_prompt(system_prompt, theme_choice.theme)
+                user_prompt += ThemeScorer.anchor_context(theme_choice)
+
             messages = [
-                {"role": "system", "content": prompts["system_prompt"]},
-                {"role": "user", "content": prompts["user_prompt"]}
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
             ]
 
             if "user_followup_prompt" in prompts:
                 messages.append({"role": "user", "content": prompts["user_followup_prompt"]})
 
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                store=True,
-                temperature=0.7,
-                max_tokens=1500,
-                response_format={"type": "json_object"}  # Enforce JSON response
-            )
+            content = await self._complete(messages)
 
             # Parse the JSON response
             try:
-                email_data = json.loads(response.choices[0].message.content)
-                return email_data
-            except json.JSONDecodeError:
+                email_data = orjson.loads(content)
+            except orjson.JSONDecodeError:
                 # Fallback if the response is not valid JSON
                 return {
                     "theme_used": "unknown",
                     "anchor_signal": "unknown",
                     "subject_line": "Error in generation",
-                    "email_body": response.choices[0].message.content
+                    "email_body": content
                 }
+
+            if settings.EMAIL_POST_PROCESSING and isinstance(email_data, dict):
+                sender_name = (shared_context or {}).get("sender_name") or request.sender_name or "Ingren AI"
+                email_data = await self._enforce_rules(email_data, messages, request.prospect.first_name, sender_name)
+            if theme_choice is not None and isinstance(email_data, dict):
+                # Report the chosen theme even if the LLM named another one
+                email_data["theme_used"] = theme_choice.theme
+                if theme_choice.anchor_signal:
+                    email_data["anchor_signal"] = theme_choice.anchor_signal
+            return email_data
+        except OverloadedError:
+            # Shed load is reported to the caller rather than as an error email
+            raise
         except Exception as e:
             # Log the error for debugging
             import traceback
             print(f"Error in generate_email: {str(e)}")
             print(traceback.format_exc())
 
+            if settings.EMAIL_SYNTHESIS_FALLBACK:
+                try:
+                    return self._synthesize(request, theme_choice, shared_context, "error")
+                except Exception as synthesis_error:
+                    print(f"Email synthesis failed: {str(synthesis_error)}")
+
             # Return a fallback response
-            return {
-                "theme_used": "error",
-                "anchor_signal": "error",
-                "subject_line": "Error in email generation",
-                "email_body": f"An error occurred during email generation: {str(e)}"
-            }
\ No newline at end of file
+            return self._error_email(str(e))
+
+    @staticmethod
+    def _error_email(error: str) -> Dict[str, Any]:
+        return {
+            "theme_used": "error",
+            "anchor_signal": "error",
+            "subject_line": "Error in email generation",
+            "email_body": f"An error occurred during email generation: {error}"
+        }
+
+    def _synthesize(self, request: EmailRequest, theme_choice: Optional[ThemeChoice],
+                    shared_context: Optional[Dict[str, str]], reason: str) -> Dict[str, Any]:
+        """Write the email from a template, choosing the theme locally if it was not chosen yet"""
+        if theme_choice is None:
+            theme_choice = self.theme_scorer.score(
+                request.prospect, request.company, request.metadata.theme if request.metadata else None
+            )
+        return self.synthesizer.synthesize(request, theme_choice, reason, shared_context)
+
+    async def _complete(self, messages: List[Dict[str, str]]) -> str:
+        """Call OpenAI once a fair-queued concurrency slot is free, returning the message content"""
+        async with admission_controller.llm_slot():
+            options = deadline_options()
+            try:
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    store=True,
+                    temperature=0.7,
+                    max_tokens=1500,
+                    response_format={"type": "json_object"},  # Enforce JSON response
+                    **options
+                )
+            except Exception as e:
+                if is_outage(e, deadline_bound=bool(options)):
+                    self.circuit_breaker.record_failure()
+                raise
+        self.circuit_breaker.record_success()
+        return response.choices[0].message.content
+
+    async def _enforce_rules(
+            self,
+            email_data: Dict[str, Any],
+            messages: List[Dict[str, str]],
+            first_name: str,
+            sender_name: str
+    ) -> Dict[str, Any]:
+        """
+        Apply the local fixes of the copy rules, regenerating only for violations they cannot fix
+
+        A regenerated email replaces the first one only if it is valid JSON.
+        If regenerating is not possible (e.g. the deadline is too close), the
+        locally fixed email is returned as is.
+        """
+        report = check_email(email_data, first_name, sender_name)
+        for _ in range(settings.EMAIL_MAX_REGENERATIONS):
+            if not report.needs_regeneration:
+                break
+            REGENERATIONS.inc()
+            retry_messages = messages + [
+                {"role": "assistant", "content": orjson.dumps(email_data).decode()},
+                {"role": "user", "content": report.feedback()},
+            ]
+            try:
+                candidate = orjson.loads(await self._complete(retry_messages))
+            except Exception as e:
+                print(f"Keeping the first email, regeneration failed: {str(e)}")
+                break
+            if not isinstance(candidate, dict):
+                break
+            email_data = candidate
+            report = check_email(email_data, first_name, sender_name)
+
+        if report.needs_regeneration:
+            UNRESOLVED.inc()
+        return report.email
+
+    @staticmethod
+    def _needs_enrichment(company: CompanyData) -> bool:
+        """Whether the company has a URL and is missing any enrichable field"""
+        if not company.url:
+            return False
+        return any(not getattr(company, field) for field in ENRICHMENT_FIELDS)
+
+    async def _lookup_company(self, company_url: str) -> Dict[str, Any]:
+        """Look the company up, treating a failed lookup as no enrichment"""
+        try:
+            return await self.company_info_service.lookup_company(company_url)
+        except Exception as e:
+            print(f"Company enrichment failed for {company_url}: {str(e)}")
+            return {}
+
+    @staticmethod
+    def _merge_enrichment(company: CompanyData, enrichment: Dict[str, Any]) -> CompanyData:
+        """
+        Fill fields the client left empty from the company lookup
+
+        The merged company is validated; lookup values that do not fit their
+        field (e.g. an employee count of "about 300") are dropped.
+        """
+        updates = {
+            field: enrichment[source]
+            for field, source in ENRICHMENT_FIELDS.items()
+            if not getattr(company, field) and enrichment.get(source)
+        }
+        if isinstance(updates.get("employee_count"), str):
+            match = _EMPLOYEE_COUNT.match(updates["employee_count"])
+            if match:
+                updates["employee_count"] = match.group(1).replace(",", "")
+        while updates:
+            try:
+                return CompanyData.model_validate({**company.model_dump(), **updates})
+            except ValidationError as e:
+                invalid = {error["loc"][0] for error in e.errors() if error["loc"]} & set(updates)
+                if not invalid:
+                    break
+                for field in invalid:
+                    del updates[field]
+        return company
+
+    def prefetch_prompts(self, step_number: int = 2, versions: Optional[List[PromptVersion]] = None) -> None:
+        """
+        Pull the prompts used up to this step (by default all of them) into the prompt cache
+
+        Args:
+            step_number: Sequence step whose prompts are needed
+            versions: Prompt versions to pull, by default every configured version
+        """
+        for version in versions or prompt_router.versions.values():
+            self.prompt_manager.get_system_prompt(version.system_prompt_id)
+            self.prompt_manager.get_user_prompt_template(version.user_prompt_id)
+            if step_number > 1:
+                self.prompt_manager.get_user_prompt_template(version.user_prompt_followup_id)
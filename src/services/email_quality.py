@@ -0,0 +1,253 @@
+# src/services/email_quality.py
+"""
+Local checks and fixes for the copy rules of the system prompt.
+
+The system prompt asks for a subject of at most MAX_SUBJECT_CHARS characters,
+a body of at most MAX_BODY_WORDS words, the prospect's first name used once,
+no P.S. and a signature with the sender's name. check_email validates a
+generated email against these rules with precompiled regular expressions and
+applies the fixes that cannot change what the email says: whitespace,
+subject, signature and P.S. normalization, trimming a slightly long subject
+at a word boundary, and dropping extra vocative uses of the first name. Whatever is
+left ("hard" violations, including a body that never names the prospect) can
+only be fixed by regenerating the email.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils import metrics
+
+MAX_SUBJECT_CHARS = 55
+MAX_BODY_WORDS = 120
+
+# A long subject is only trimmed if that keeps at least this much of it
+MIN_SUBJECT_KEPT = 2 / 3
+
+# Rule names used in metrics and regeneration feedback
+WHITESPACE = "whitespace"
+POSTSCRIPT = "postscript"
+SIGNATURE = "signature"
+FIRST_NAME = "first_name"
+BODY_LENGTH = "body_length"
+SUBJECT_LENGTH = "subject_length"
+SUBJECT_FORMAT = "subject_format"
+
+EMAILS_CHECKED = metrics.counter("email_quality_checked_total", "Generated emails checked against the copy rules")
+RULE_VIOLATIONS = metrics.counter(
+    "email_rule_violations_total", "Copy rule violations by rule and outcome (fixed or regenerate)"
+)
+REGENERATIONS = metrics.counter("email_regenerations_total", "Emails regenerated because of hard rule violations")
+UNRESOLVED = metrics.counter(
+    "email_rule_unresolved_total", "Emails returned with hard rule violations after regenerating"
+)
+
+CLOSINGS = (
+    "best regards", "warm regards", "kind regards", "warmest regards", "regards", "all the best",
+    "best wishes", "best", "cheers", "thanks", "thank you", "many thanks", "sincerely", "talk soon",
+)
+_CLOSING = re.compile(r"^(%s)\s*(?:[,.!]\s*(.*))?$" % "|".join(re.escape(c) for c in CLOSINGS), re.IGNORECASE)
+_NAME_PLACEHOLDER = re.compile(
+    r"[\[<{(]\s*(your|sender'?s?|my)?[ _]*(full[ _])?name\s*[\]>})]", re.IGNORECASE
+)
+_POSTSCRIPT = re.compile(r"^p\.?\s?s\.?\b", re.IGNORECASE)
+_SUBJECT_PREFIX = re.compile(r"^(subject( line)?\s*:\s*)", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_TRAILING_WORDS = re.compile(r"(\s+(and|or|for|to|with|of|the|a|an|your|in|on|at|by|from|&|\+|-|–|—))+$",
+                             re.IGNORECASE)
+
+_name_patterns: Dict[str, Tuple["re.Pattern[str]", "re.Pattern[str]", "re.Pattern[str]"]] = {}
+
+
+def _first_name_patterns(first_name: str) -> Tuple["re.Pattern[str]", "re.Pattern[str]", "re.Pattern[str]"]:
+    """Patterns for any use, a trailing vocative (", Sarah?") and a leading vocative ("Sarah, ...")"""
+    patterns = _name_patterns.get(first_name)
+    if patterns is None:
+        name = re.escape(first_name)
+        patterns = (
+            re.compile(rf"\b{name}\b"),
+            re.compile(rf",\s*{name}\b(?=\s*[.?!])"),
+            re.compile(rf"(^|(?<=[.?!]\s)|(?<=\n)){name},\s+(\w)"),
+        )
+        if len(_name_patterns) < 10000:
+            _name_patterns[first_name] = patterns
+    return patterns
+
+
+class QualityReport:
+    """Result of checking an email: the fixed email, the fixes applied and the hard violations left"""
+
+    def __init__(self, email: Dict[str, Any], fixed: List[str], violations: List[str], details: Dict[str, str]):
+        self.email = email
+        self.fixed = fixed
+        self.violations = violations
+        self.details = details
+
+    @property
+    def needs_regeneration(self) -> bool:
+        return bool(self.violations)
+
+    def feedback(self) -> str:
+        """Instruction asking the model to rewrite the email without the hard violations"""
+        problems = "\n".join(f"- {self.details[rule]}" for rule in self.violations)
+        return (
+            "The email above breaks these copy rules:\n"
+            f"{problems}\n"
+            "Rewrite it so it follows every rule. Return valid JSON only, in the same format."
+        )
+
+
+def _normalize_whitespace(text: str) -> str:
+    lines = [_SPACES.sub(" ", line).strip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _split_paragraphs(body: str) -> List[str]:
+    return [paragraph for paragraph in body.split("\n\n") if paragraph]
+
+
+def _is_closing(line: str) -> bool:
+    """A sign-off closing such as "Best," or "Thanks for reading," """
+    return bool(_CLOSING.match(line)) or (line.endswith(",") and len(line.split()) <= 5)
+
+
+def _split_signature(paragraphs: List[str], sender_name: str) -> Tuple[List[str], Optional[List[str]]]:
+    """
+    Split the body into content paragraphs and the sign-off lines
+
+    The sign-off is the tail of the last paragraph, from a closing line or a
+    line with just the sender's (first) name. It is None if there is none.
+    """
+    if not paragraphs:
+        return paragraphs, None
+    last = paragraphs[-1].split("\n")
+    sender_names = {sender_name, sender_name.split(" ")[0]}
+    for index in range(max(len(last) - 3, 0), len(last)):
+        line = last[index]
+        # A closing needs a name line or to be the last line; a name line ends the paragraph
+        is_sign_off = (_CLOSING.match(line) and (index == len(last) - 1 or len(last[index + 1].split()) <= 4)) or \
+            (_is_closing(line) and 0 < len(last) - 1 - index <= 2) or \
+            (line in sender_names and index == len(last) - 1)
+        if is_sign_off and (index > 0 or len(paragraphs) > 1):
+            content = paragraphs[:-1] + (["\n".join(last[:index])] if index else [])
+            return content, last[index:]
+    return paragraphs, None
+
+
+def _normalize_signature(sign_off: Optional[List[str]], sender_name: str) -> List[str]:
+    """A sign-off of a closing line ending in a comma followed by the sender's name"""
+    if sign_off is None:
+        return ["Best,", sender_name]
+    match = _CLOSING.match(sign_off[0])
+    if match is not None:
+        closing, inline_name = match.groups()
+        closing = closing[0].upper() + closing[1:] + ","
+        names = [inline_name or ""] + sign_off[1:]
+    elif _is_closing(sign_off[0]):
+        closing, names = sign_off[0], sign_off[1:]
+    else:
+        closing, names = "Best,", sign_off
+    names = [_NAME_PLACEHOLDER.sub(sender_name, name).strip() for name in names if name.strip()]
+    return [closing] + (names or [sender_name])
+
+
+def _fix_first_name(content: str, first_name: str) -> str:
+    """Drop vocative uses of the first name after the first one"""
+    any_use, trailing_vocative, leading_vocative = _first_name_patterns(first_name)
+    first_use = any_use.search(content)
+    if first_use is None:
+        return content
+    head, tail = content[:first_use.end()], content[first_use.end():]
+    tail = trailing_vocative.sub("", tail)
+    tail = leading_vocative.sub(lambda m: m.group(1) + m.group(2).upper(), tail)
+    return head + tail
+
+
+def _trim_subject(subject: str) -> Optional[str]:
+    """Cut a long subject at a word boundary, or None if that would lose too much of it"""
+    cut = subject[:MAX_SUBJECT_CHARS + 1].rsplit(" ", 1)[0] if " " in subject else subject[:MAX_SUBJECT_CHARS]
+    cut = _TRAILING_WORDS.sub("", cut).rstrip(" ,;:-–—&")
+    if len(cut) < len(subject) * MIN_SUBJECT_KEPT:
+        return None
+    return cut
+
+
+def check_email(email: Dict[str, Any], first_name: Optional[str], sender_name: str) -> QualityReport:
+    """
+    Check a generated email against the copy rules and apply the safe fixes
+
+    Args:
+        email: Email data parsed from the LLM output
+        first_name: Prospect's first name, which the body must use exactly once
+        sender_name: Name the email must be signed with
+
+    Returns:
+        QualityReport with the fixed email and the violations that need regeneration
+    """
+    subject, body = email.get("subject_line"), email.get("email_body")
+    if not isinstance(subject, str) or not isinstance(body, str):
+        return QualityReport(email, [], [], {})
+    EMAILS_CHECKED.inc()
+    fixed: List[str] = []
+    violations: List[str] = []
+    details: Dict[str, str] = {}
+
+    normalized = _normalize_whitespace(body)
+    if normalized != body:
+        fixed.append(WHITESPACE)
+
+    paragraphs = _split_paragraphs(normalized)
+    content, sign_off = _split_signature(paragraphs, sender_name)
+    # A P.S. after the body or the sign-off is dropped
+    if content and _POSTSCRIPT.match(content[-1]) and sign_off is None:
+        content, sign_off = _split_signature(content[:-1], sender_name)
+        fixed.append(POSTSCRIPT)
+    elif sign_off is not None and len(sign_off) > 1 and _POSTSCRIPT.match(sign_off[-1]):
+        sign_off = sign_off[:-1]
+        fixed.append(POSTSCRIPT)
+    signature = _normalize_signature(sign_off, sender_name)
+    if signature != sign_off:
+        fixed.append(SIGNATURE)
+
+    text = "\n\n".join(content)
+    if first_name:
+        count = len(_first_name_patterns(first_name)[0].findall(text))
+        if count != 1:
+            text = _fix_first_name(text, first_name)
+            count = len(_first_name_patterns(first_name)[0].findall(text))
+            if count == 1:
+                fixed.append(FIRST_NAME)
+            else:
+                violations.append(FIRST_NAME)
+                details[FIRST_NAME] = f"Use the prospect's first name ({first_name}) exactly once, not {count} times."
+
+    words = len(text.split())
+    if words > MAX_BODY_WORDS:
+        violations.append(BODY_LENGTH)
+        details[BODY_LENGTH] = f"Keep the body to {MAX_BODY_WORDS} words or fewer; it has {words}."
+
+    new_subject = _normalize_whitespace(_SUBJECT_PREFIX.sub("", subject.strip()).strip("\"'")).replace("\n", " ")
+    if len(new_subject) > MAX_SUBJECT_CHARS:
+        trimmed = _trim_subject(new_subject)
+        if trimmed is None:
+            violations.append(SUBJECT_LENGTH)
+            details[SUBJECT_LENGTH] = (
+                f"Keep the subject line to {MAX_SUBJECT_CHARS} characters or fewer; it has {len(new_subject)}."
+            )
+        else:
+            new_subject = trimmed
+            fixed.append(SUBJECT_LENGTH)
+    elif new_subject != subject:
+        fixed.append(SUBJECT_FORMAT)
+
+    for rule in dict.fromkeys(fixed):
+        RULE_VIOLATIONS.inc(rule=rule, outcome="fixed")
+    for rule in violations:
+        RULE_VIOLATIONS.inc(rule=rule, outcome="regenerate")
+
+    fixed_email = {
+        **email,
+        "subject_line": new_subject,
+        "email_body": "\n\n".join(filter(None, [text, "\n".join(signature)])),
+    }
+    return QualityReport(fixed_email, list(dict.fromkeys(fixed)), violations, details)
@@ -0,0 +1,205 @@
+# src/services/email_synthesizer.py
+"""
+LLM-free email synthesis for degraded mode.
+
+When OpenAI is failing, EmailSynthesizer writes emails from templates
+instead: each theme has one or more templates taken from approved past
+emails, with the prospect, company, seller, CTA and anchor signal replaced
+by placeholders, e.g.
+
+    {"trigger_event": [{"subject_line": "After the news at {company}",
+                        "email_body": "Hi {first_name},\\n\\nCongrats on ..."}]}
+
+Filling a template is plain str.format, so an email takes microseconds.
+Emails written this way are flagged `synthesized`, for callers to decide
+whether to send or hold them.
+
+New templates are seeded from approved emails with
+
+    python -m src.services.email_synthesizer approved.jsonl > prompts/email_templates.json
+
+where each line is {"request": <EmailRequest>, "email": <EmailResponse>}.
+"""
+import json
+import re
+import string
+import sys
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from src.api.models import EmailRequest, SellerData
+from src.services.company_index import brand_label
+from src.services.company_info_service import normalize_company_domain
+from src.services.email_quality import check_email
+from src.services.theme_scorer import FALLBACK_THEME, ThemeChoice
+from src.utils import metrics
+
+SYNTHESIZED = metrics.counter("emails_synthesized_total", "Emails written from templates, by reason")
+
+# Templates used for steps after the first, whatever the theme
+FOLLOW_UP = "follow_up"
+
+PLACEHOLDERS = (
+    "first_name", "job_title", "company", "anchor", "anchor_sentence", "product", "category",
+    "benefit", "benefit_lower", "proof", "proof_lower", "cta", "sender",
+)
+DEFAULT_CTA = "Worth a 15-minute chat next week?"
+DEFAULT_ANCHOR = "your recent growth"
+DEFAULT_SELLER = SellerData()
+
+
+def _lower_first(text: str) -> str:
+    return text[:1].lower() + text[1:]
+
+
+def _upper_first(text: str) -> str:
+    return text[:1].upper() + text[1:]
+
+
+class EmailSynthesizer:
+    """
+    Fills per-theme email templates with the fields of a request.
+
+    Args:
+        templates: Theme (or "follow_up") -> templates with "subject_line" and "email_body"
+
+    Raises:
+        ValueError: If a template uses an unknown placeholder or no template exists
+            for the fallback theme
+    """
+
+    def __init__(self, templates: Mapping[str, List[Dict[str, str]]]):
+        for theme, theme_templates in templates.items():
+            for template in theme_templates:
+                for text in (template["subject_line"], template["email_body"]):
+                    unknown = {name for _, name, _, _ in string.Formatter().parse(text)
+                               if name is not None and name not in PLACEHOLDERS}
+                    if unknown:
+                        raise ValueError(f"Template of {theme} uses unknown placeholders: {', '.join(sorted(unknown))}")
+        if not templates.get(FALLBACK_THEME):
+            raise ValueError(f"Templates need at least one {FALLBACK_THEME} template")
+        self.templates = {theme: list(theme_templates) for theme, theme_templates in templates.items()
+                          if theme_templates}
+
+    @classmethod
+    def from_file(cls, path: str) -> "EmailSynthesizer":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def values(request: EmailRequest, anchor_signal: str,
+               shared_context: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """The placeholder values of a request"""
+        shared_context = shared_context or {}
+        seller = request.seller or DEFAULT_SELLER
+        # Without a name, the company is named after the brand in its domain, e.g. Acme for acme.io
+        company = request.company.name or brand_label(normalize_company_domain(request.company.url)).capitalize()
+        benefit = shared_context.get("seller_headline_benefit") or seller.headline_benefit
+        proof = shared_context.get("seller_unique_proof") or seller.unique_proof
+        anchor = anchor_signal or DEFAULT_ANCHOR
+        return {
+            "first_name": request.prospect.first_name,
+            "job_title": request.prospect.job_title,
+            "company": company,
+            "anchor": anchor,
+            "anchor_sentence": _upper_first(anchor),
+            "product": shared_context.get("seller_product_name") or seller.product_name,
+            "category": shared_context.get("seller_category") or seller.category,
+            "benefit": benefit,
+            "benefit_lower": _lower_first(benefit),
+            "proof": proof,
+            "proof_lower": _lower_first(proof),
+            "cta": shared_context.get("cta_ask") or (request.cta.ask if request.cta else None) or DEFAULT_CTA,
+            "sender": shared_context.get("sender_name") or request.sender_name or "Ingren AI",
+        }
+
+    def synthesize(self, request: EmailRequest, theme_choice: ThemeChoice, reason: str,
+                   shared_context: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Write an email for a request from the templates of its theme
+
+        The template is picked deterministically per prospect, and the result
+        gets the same local copy-rule fixes as generated emails.
+
+        Args:
+            request: The email request
+            theme_choice: Theme and anchor signal chosen for the request
+            reason: Why the email is synthesized, for the metrics
+            shared_context: Flattened campaign fields used instead of the request's own
+
+        Returns:
+            Email data with theme_used, anchor_signal, subject_line, email_body and synthesized
+        """
+        values = self.values(request, theme_choice.anchor_signal, shared_context)
+        step_number = request.metadata.step_number if request.metadata else 1
+        theme = theme_choice.theme if theme_choice.theme in self.templates else FALLBACK_THEME
+        templates = self.templates.get(FOLLOW_UP) if step_number > 1 else None
+        templates = templates or self.templates[theme]
+        key = f"{values['first_name']}|{request.prospect.last_name}|{values['company']}|{step_number}"
+        template = templates[zlib.crc32(key.encode()) % len(templates)]
+
+        email = {
+            "theme_used": theme,
+            "anchor_signal": theme_choice.anchor_signal or "none",
+            "subject_line": template["subject_line"].format_map(values),
+            "email_body": template["email_body"].format_map(values),
+        }
+        email = check_email(email, values["first_name"], values["sender"]).email
+        email["synthesized"] = True
+        SYNTHESIZED.inc(reason=reason)
+        return email
+
+
+def templatize(request: EmailRequest, email: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Turn an approved email into a template by replacing the request's values with placeholders
+
+    Args:
+        request: The request the email was generated for
+        email: The approved email, with subject_line, email_body and anchor_signal
+
+    Returns:
+        The template's subject_line and email_body
+    """
+    values = EmailSynthesizer.values(request, email.get("anchor_signal") or "")
+    names: Dict[str, str] = {}
+    for name, value in values.items():
+        if name != "anchor_sentence" and value and value not in (DEFAULT_ANCHOR, DEFAULT_CTA):
+            names.setdefault(value, name)
+    # Longer values first, so e.g. a company name is not split by a first name inside it
+    pattern = re.compile("|".join(re.escape(value) for value in sorted(names, key=len, reverse=True)))
+
+    def replace(text: str) -> str:
+        text = text.replace("{", "{{").replace("}", "}}")
+        return pattern.sub(lambda match: "{" + names[match.group(0)] + "}", text)
+
+    return {"subject_line": replace(email["subject_line"]), "email_body": replace(email["email_body"])}
+
+
+def seed_templates(records: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Build the templates file from approved emails
+
+    Args:
+        records: {"request": <EmailRequest>, "email": <EmailResponse>} records
+
+    Returns:
+        Theme (or "follow_up") -> templates
+    """
+    templates: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+    for record in records:
+        request = EmailRequest.model_validate(record["request"])
+        email = record["email"]
+        step_number = request.metadata.step_number if request.metadata else 1
+        theme = FOLLOW_UP if step_number > 1 else email.get("theme_used") or FALLBACK_THEME
+        template = templatize(request, email)
+        if template not in templates[theme]:
+            templates[theme].append(template)
+    return dict(templates)
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        seeded = seed_templates(json.loads(line) for line in f if line.strip())
+    print(json.dumps(seeded, indent=2, ensure_ascii=False))
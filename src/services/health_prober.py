@@ -0,0 +1,168 @@
+# src/services/health_prober.py
+"""
+Background probing of the service's upstream dependencies.
+
+The deep health check used to call OpenAI on every load-balancer probe.
+HealthProber instead checks each dependency on an interval in a background
+task and keeps a rolling state per dependency (status, last probe latency,
+recent success rate), which /health/deep reports from memory.
+
+A dependency is only marked failing after `failure_threshold` consecutive
+failed probes, so a brief blip does not take an instance out of service.
+On Lambda the task only runs while an invocation does; a health check that
+finds the state older than `stale_after` seconds starts a new round without
+waiting for it.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from src.utils import metrics
+
+DEPENDENCY_UP = metrics.gauge("dependency_up", "1 if the dependency's recent probes succeed, else 0")
+PROBE_LATENCY = metrics.gauge("dependency_probe_latency_seconds", "Latency of the last probe of the dependency")
+
+# Probes kept per dependency for the success rate
+PROBE_WINDOW = 10
+
+OK = "ok"
+FAILING = "failing"
+UNKNOWN = "unknown"
+
+
+class DependencyHealth:
+    """Rolling health state of one dependency"""
+
+    def __init__(self, name: str, critical: bool):
+        self.name = name
+        self.critical = critical
+        self.status = UNKNOWN
+        self.last_latency: Optional[float] = None
+        self.last_checked: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.recent: Deque[bool] = deque(maxlen=PROBE_WINDOW)
+
+    def record(self, ok: bool, latency: float, error: Optional[str], failure_threshold: int) -> None:
+        self.last_latency = latency
+        self.last_checked = time.time()
+        self.recent.append(ok)
+        if ok:
+            self.consecutive_failures = 0
+            self.last_error = None
+            self.status = OK
+        else:
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.consecutive_failures >= failure_threshold or self.status == UNKNOWN:
+                self.status = FAILING
+        DEPENDENCY_UP.set(1.0 if self.status == OK else 0.0, dependency=self.name)
+        PROBE_LATENCY.set(latency, dependency=self.name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "critical": self.critical,
+            "last_latency_ms": None if self.last_latency is None else round(self.last_latency * 1000, 1),
+            "last_checked_seconds_ago": None if self.last_checked is None else round(time.time() - self.last_checked, 1),
+            "success_rate": round(sum(self.recent) / len(self.recent), 2) if self.recent else None,
+            "last_error": self.last_error,
+        }
+
+
+class HealthProber:
+    """
+    Probes dependencies in the background and keeps their health in memory.
+
+    Args:
+        probes: Dependency name -> (async probe raising on failure, whether the service needs it)
+        interval: Seconds between probe rounds
+        timeout: Seconds a probe may take before it counts as failed
+        failure_threshold: Consecutive failures before a healthy dependency is marked failing
+    """
+
+    def __init__(self, probes: Dict[str, Tuple[Callable[[], Awaitable[Any]], bool]],
+                 interval: float, timeout: float, failure_threshold: int):
+        self.probes = probes
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.stale_after = 3 * interval
+        self.dependencies = {name: DependencyHealth(name, critical) for name, (_, critical) in probes.items()}
+        self._task: Optional[asyncio.Task] = None
+        self._round: Optional[asyncio.Future] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_round: Optional[float] = None
+
+    async def _probe(self, name: str) -> None:
+        probe, _ = self.probes[name]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+            ok, error = True, None
+        except asyncio.TimeoutError:
+            ok, error = False, f"probe timed out after {self.timeout:g}s"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        self.dependencies[name].record(ok, time.perf_counter() - started, error, self.failure_threshold)
+
+    async def probe_once(self) -> None:
+        """Probe every dependency concurrently"""
+        self._last_round = time.monotonic()
+        await asyncio.gather(*(self._probe(name) for name in self.probes))
+
+    async def _run(self) -> None:
+        while True:
+            await self._probe_round()
+            await asyncio.sleep(self.interval)
+
+    async def _probe_round(self) -> None:
+        # A round started by a stale health check is shared rather than repeated
+        if self._round is None or self._round.done():
+            self._round = asyncio.ensure_future(self.probe_once())
+        try:
+            await asyncio.shield(self._round)
+        except Exception as e:
+            print(f"Health probe round failed: {str(e)}")
+
+    async def ensure_running(self) -> None:
+        """
+        Start the background task if it is not running
+
+        The first call waits for the first probe round, so the state it
+        reports is never empty. Later calls return at once, starting a new
+        round in the background if the state is stale.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks of another (e.g. closed) event loop never finish here
+            self._task, self._round, self._loop = None, None, loop
+        if self._task is None or self._task.done():
+            first_start = self._last_round is None
+            self._task = asyncio.ensure_future(self._run())
+            if first_start:
+                await self._probe_round()
+                return
+        if self._last_round is not None and time.monotonic() - self._last_round > self.stale_after:
+            asyncio.ensure_future(self._probe_round())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def healthy(self) -> bool:
+        """Whether no dependency the service needs is failing"""
+        return not any(dependency.critical and dependency.status == FAILING
+                       for dependency in self.dependencies.values())
+
+    @property
+    def degraded(self) -> bool:
+        """Whether some dependency is failing, needed or not"""
+        return any(dependency.status == FAILING for dependency in self.dependencies.values())
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """The health of each dependency"""
+        return {name: dependency.to_dict() for name, dependency in self.dependencies.items()}
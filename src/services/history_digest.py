@@ -0,0 +1,158 @@
+# src/services/history_digest.py
+"""
+Compact digests of a sequence's email history for the follow-up prompt.
+
+EmailMetadata.email_history is free-form text that grows by one email with
+every step. It is split into emails, at "Email N"/"Step N" headers,
+"Subject:" lines and "---" separators, and each email is reduced to one
+line: its subject, opening sentence and call to action. A long history is
+replaced by the lines of its most recent emails, up to a fixed size, so the
+follow-up prompt stays about the same size however long the sequence gets.
+
+Lines are cached by a chained hash of the history up to and including their
+email. The next step of a sequence, whose history is the previous one plus
+a new email, only digests the new email.
+"""
+import hashlib
+import re
+from collections import OrderedDict
+from typing import List, Optional
+
+from src.services.email_quality import CLOSINGS
+from src.utils import metrics
+
+HISTORY_DIGESTS = metrics.counter(
+    "email_history_digests_total", "Follow-up email histories by how they were sent (verbatim or digested)"
+)
+DIGEST_LINES = metrics.counter("email_history_digest_lines_total", "Digested history emails by cache result")
+
+# Longest opening sentence and call to action kept per email
+MAX_SENTENCE_CHARS = 160
+
+_HEADER = re.compile(r"^\W*(email|step|message|follow[- ]?up|touch(point)?)\s*#?\s*\d+\b", re.IGNORECASE)
+_SEPARATOR = re.compile(r"^\s*([-=*_#]\s*){3,}$")
+_SUBJECT = re.compile(r"^\W*subject(\s+line)?\s*:\s*(.*)$", re.IGNORECASE)
+_GREETING = re.compile(r"^(hi|hello|hey|dear)\b[^.?!]{0,40}[,!]?$", re.IGNORECASE)
+_CLOSING = re.compile(r"^(%s)\b[^.?!]{0,20}[,.!]?$" % "|".join(re.escape(c) for c in CLOSINGS), re.IGNORECASE)
+_SENTENCE = re.compile(r"[^.?!]+[.?!]*")
+
+
+def split_emails(history: str) -> List[str]:
+    """
+    Split an email history into the emails it contains
+
+    Args:
+        history: Free-form history, as sent in EmailMetadata.email_history
+
+    Returns:
+        The text of each email, oldest first
+    """
+    emails: List[List[str]] = [[]]
+    for line in history.replace("\r\n", "\n").split("\n"):
+        stripped = line.strip()
+        current = emails[-1]
+        has_body = any(not _HEADER.match(text) and not _SUBJECT.match(text) for text in current)
+        if _SEPARATOR.match(stripped):
+            emails.append([])
+        elif (_HEADER.match(stripped) and current) or (_SUBJECT.match(stripped) and has_body):
+            emails.append([stripped])
+        elif stripped:
+            current.append(stripped)
+    return ["\n".join(lines) for lines in emails if lines]
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_SENTENCE_CHARS:
+        return text
+    return text[:MAX_SENTENCE_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def digest_email(email: str) -> str:
+    """Reduce one email to its subject, opening sentence and call to action"""
+    subject = None
+    body: List[str] = []
+    for line in email.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        subject_match = _SUBJECT.match(line)
+        if subject_match and subject is None and not body:
+            subject = subject_match.group(2).strip().strip("\"'")
+        elif _CLOSING.match(line) and body:
+            break
+        elif not _HEADER.match(line) and not (not body and _GREETING.match(line)):
+            body.append(line)
+
+    sentences = [sentence.strip() for sentence in _SENTENCE.findall(" ".join(body)) if sentence.strip()]
+    parts = [f'subject "{subject}"'] if subject else []
+    if sentences:
+        parts.append(f"opened: {_truncate(sentences[0])}")
+        questions = [sentence for sentence in sentences[1:] if sentence.endswith("?")]
+        if questions:
+            parts.append(f"asked: {_truncate(questions[-1])}")
+    return "; ".join(parts) or _truncate(email.replace("\n", " "))
+
+
+class HistoryDigester:
+    """
+    Digests email histories, caching the line of each email by history prefix.
+
+    Histories up to `max_chars` characters are used verbatim. Longer ones are
+    replaced by the digest lines of as many of their latest emails as fit in
+    `max_chars`.
+    """
+
+    def __init__(self, max_chars: int, max_entries: int):
+        self.max_chars = max_chars
+        self.max_entries = max_entries
+        self._lines: "OrderedDict[bytes, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def digest(self, history: Optional[str]) -> Optional[str]:
+        """
+        The history to put in the follow-up prompt
+
+        Args:
+            history: The request's email history
+
+        Returns:
+            The history itself if it is short, otherwise its digest
+        """
+        if not history or len(history) <= self.max_chars:
+            HISTORY_DIGESTS.inc(result="verbatim")
+            return history
+        HISTORY_DIGESTS.inc(result="digested")
+
+        emails = split_emails(history)
+        lines = []
+        prefix = b""
+        for number, email in enumerate(emails, start=1):
+            prefix = hashlib.blake2b(prefix + email.encode("utf-8"), digest_size=16).digest()
+            line = self._lines.get(prefix)
+            if line is None:
+                DIGEST_LINES.inc(cache="miss")
+                line = digest_email(email)
+                self._lines[prefix] = line
+                if len(self._lines) > self.max_entries:
+                    self._lines.popitem(last=False)
+            else:
+                DIGEST_LINES.inc(cache="hit")
+                self._lines.move_to_end(prefix)
+            lines.append(f"- Email {number}: {line}")
+
+        # Keep the latest emails that fit, noting how many earlier ones were left out
+        kept: List[str] = []
+        size = 0
+        for line in reversed(lines):
+            if kept and size + len(line) + 1 > self.max_chars:
+                break
+            kept.append(line)
+            size += len(line) + 1
+        kept.reverse()
+        omitted = len(lines) - len(kept)
+        header = f"Digest of the {len(lines)} earlier emails"
+        if omitted:
+            header += f" ({omitted} oldest not shown)"
+        return "\n".join([header + ":"] + kept)
@@ -0,0 +1,166 @@
+# src/services/step_pregenerator.py
+"""
+Speculative generation of the next step of a thread.
+
+Sequences are generated one step at a time, and each step after the first
+waits for a follow-up prompt completion. With THREAD_PREGENERATION on, a
+successful step N schedules a background job that generates step N+1 of the
+same thread (through the follow-up prompt, as the real request would) and
+keeps the email keyed by thread and step. When step N+1 is then requested,
+it is served from there instead of calling the LLM again.
+
+The job runs at batch priority, so its LLM call queues behind interactive
+traffic, and it is only scheduled while the LLM pool has idle slots. A
+pre-generated email is only used if the request would have produced the
+same prompt: it is keyed with a fingerprint of the thread context, history,
+step, theme and prompt version, and any change (e.g. new company signals)
+discards it. A step requested while its job is still running waits for the
+job rather than generating the email twice.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+import orjson
+
+from src.api.models import EmailResponse
+from src.services.admission import (
+    BATCH, INTERACTIVE, admission_controller, current_deadline, current_priority,
+)
+from src.services.thread_store import Thread, ThreadNotFoundError, ThreadStore
+from src.utils import metrics
+from src.utils.prompt_versions import prompt_router
+
+PREGENERATIONS = metrics.counter(
+    "thread_pregenerations_total", "Speculative next-step generations by result (generated, failed, skipped)"
+)
+PREGENERATED_LOOKUPS = metrics.counter(
+    "thread_pregenerated_lookups_total", "Thread step requests by pre-generated email result (hit, stale, miss)"
+)
+
+
+class StepPregenerator:
+    """
+    Generates the next step of threads in the background and serves it when requested.
+
+    Args:
+        thread_store: Store the threads are read from
+        email_generator: Generator of the emails
+        ttl_seconds: Time after which an unused pre-generated email is dropped
+        max_entries: Most pre-generated emails kept, least recent dropped first
+    """
+
+    def __init__(self, thread_store: ThreadStore, email_generator, ttl_seconds: float, max_entries: int):
+        self.thread_store = thread_store
+        self.email_generator = email_generator
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # (thread ID, step) -> (created at, fingerprint, email)
+        self._emails: "OrderedDict[Tuple[str, int], Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        # (thread ID, step) -> (fingerprint, running job)
+        self._jobs: Dict[Tuple[str, int], Tuple[str, asyncio.Task]] = {}
+        # Keeps running jobs referenced until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def fingerprint(thread: Thread, step_number: int, theme: Optional[str]) -> str:
+        """Fingerprint of everything the prompt of a thread step depends on"""
+        basis = orjson.dumps([
+            thread.request.model_dump(mode="json", exclude_unset=True),
+            thread.email_history(),
+            step_number,
+            theme,
+            prompt_router.current().name,
+        ], option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(basis, digest_size=16).hexdigest()
+
+    def schedule(self, thread_id: str) -> Optional[asyncio.Task]:
+        """
+        Start generating the next step of a thread in the background
+
+        Nothing is scheduled while interactive LLM calls would have to wait
+        for a slot, or if the step is already being generated.
+
+        Args:
+            thread_id: Thread whose next step to generate
+
+        Returns:
+            The background job, if one was started
+        """
+        if admission_controller.estimated_wait(INTERACTIVE) > 0:
+            PREGENERATIONS.inc(result="skipped")
+            return None
+        try:
+            thread = self.thread_store.get(thread_id)
+        except ThreadNotFoundError:
+            return None
+        step_number = thread.next_step()
+        key = (thread_id, step_number)
+        if key in self._jobs or key in self._emails:
+            return None
+
+        # The task copies the request's context (tenant, prompt version) and
+        # lowers the priority in its own copy
+        fingerprint = self.fingerprint(thread, step_number, None)
+        task = asyncio.ensure_future(self._pregenerate(thread, step_number, fingerprint))
+        self._jobs[key] = (fingerprint, task)
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: (self._tasks.discard(done), self._jobs.pop(key, None)))
+        return task
+
+    async def _pregenerate(self, thread: Thread, step_number: int, fingerprint: str) -> None:
+        current_priority.set(BATCH)
+        current_deadline.set(None)
+        try:
+            email_request = thread.request.to_email_request(thread.metadata(step_number))
+            email_data = await self.email_generator.generate_email(email_request)
+            email = {"step_number": step_number, **EmailResponse.content_from(email_data)}
+        except Exception as e:
+            print(f"Pre-generating step {step_number} of thread {thread.thread_id} failed: {str(e)}")
+            PREGENERATIONS.inc(result="failed")
+            return
+        # Template emails are not kept, so the step gets a real one once OpenAI recovers
+        if email["theme_used"] == "error" or email["synthesized"]:
+            PREGENERATIONS.inc(result="failed")
+            return
+
+        PREGENERATIONS.inc(result="generated")
+        self._emails[(thread.thread_id, step_number)] = (time.monotonic(), fingerprint, email)
+        self._emails.move_to_end((thread.thread_id, step_number))
+        while len(self._emails) > self.max_entries:
+            self._emails.popitem(last=False)
+
+    async def take(self, thread: Thread, step_number: int, theme: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Remove and return the pre-generated email of a thread step, if it is still valid
+
+        Waits for the step's background job if it is running and would
+        produce the email the request asks for.
+
+        Args:
+            thread: The thread, with any new signals already merged
+            step_number: The requested step
+            theme: The theme requested for the step
+
+        Returns:
+            The email, or None if the step has to be generated
+        """
+        key = (thread.thread_id, step_number)
+        expected = self.fingerprint(thread, step_number, theme)
+        job = self._jobs.get(key)
+        if job is not None and job[0] == expected:
+            # Shielded, so a client that disconnects does not cancel the job
+            await asyncio.shield(job[1])
+
+        entry = self._emails.pop(key, None)
+        if entry is None:
+            PREGENERATED_LOOKUPS.inc(result="miss")
+            return None
+        created_at, fingerprint, email = entry
+        if time.monotonic() - created_at > self.ttl_seconds or fingerprint != expected:
+            PREGENERATED_LOOKUPS.inc(result="stale")
+            return None
+        PREGENERATED_LOOKUPS.inc(result="hit")
+        return email
@@ -0,0 +1,240 @@
+# src/services/theme_scorer.py
+"""
+Local selection of the outbound theme and anchor signal of an email.
+
+The system prompt lists twelve themes and asks the LLM to pick the one whose
+anchor signal is freshest, most costly and most solvable. ThemeScorer makes
+that choice deterministically from the prospect and company fields: each
+field is matched against keyword rules that vote for themes, weighted by
+how fresh the field's information is, and the highest scoring theme wins,
+with ties going to the theme listed first in THEMES. The anchor signal is
+the clause of the field that gave the theme its strongest vote.
+
+With a theme chosen, the system prompt's theme catalog and selection logic
+are replaced by the rules of that one theme (see ThemeScorer.system_prompt).
+"""
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.api.models import CompanyData, ProspectData
+from src.utils import metrics
+
+THEMES_SELECTED = metrics.counter("email_themes_selected_total", "Emails by locally selected theme and how it was chosen")
+
+# Themes in tie-break order, with the rules sent to the LLM for each
+THEMES: Dict[str, str] = {
+    "trigger_event": "Open on the recent event (funding, hiring, launch, new role) and why it makes now the moment to act.",
+    "personal_achievement": "Open by congratulating the prospect on their achievement, then tie it to what comes next for them.",
+    "pain_first": "Name the costly manual or slow process first, then show how it goes away.",
+    "competitive_displace": "Acknowledge the tool they run today and the gap it leaves, without disparaging it.",
+    "risk_compliance": "Lead with the compliance or data risk of their industry and how to reduce it.",
+    "time_back": "Quantify the hours the team loses and what they get back.",
+    "roi_money_math": "Do simple money math: cost of the problem against the gain, in one sentence.",
+    "visionary_future": "Paint the near future their initiative points to and how to get there first.",
+    "social_proof": "Cite a similar customer and the result they got.",
+    "peer_benchmark": "Compare them with peers of similar size in their industry.",
+    "micro_win": "Offer one small, concrete quick win they can get in their first months.",
+    "thought_leadership_give": "Lead with a useful insight for their role, with no hard pitch.",
+}
+FALLBACK_THEME = "thought_leadership_give"
+
+# Field weights: fresher information counts more
+FIELD_WEIGHTS: Dict[str, float] = {
+    "recent_news": 1.5,
+    "growth_signals": 1.25,
+    "notable_achievement": 1.25,
+    "funding_stage": 1.0,
+    "technography": 1.0,
+    "description": 0.75,
+    "industry": 1.0,
+    "job_title": 0.5,
+}
+
+# (field, theme, keyword pattern or None for any value, votes)
+RULES: Sequence[Tuple[str, str, Optional[str], float]] = (
+    ("recent_news", "trigger_event",
+     r"rais(ed|es|ing)|funding|series [a-f]\b|acquir\w*|merg\w*|ipo\b|launch\w*|hir(ed|es|ing)|appoint\w*|expan\w*", 3.0),
+    ("recent_news", "visionary_future", r"\bai\b|artificial intelligence|new product|platform|roadmap|vision", 1.5),
+    ("recent_news", "risk_compliance", r"breach|fine[ds]?\b|lawsuit|regulat\w*|compliance|audit", 2.0),
+    ("growth_signals", "trigger_event", r"hiring|headcount|funding|raised|new office|expan\w*", 2.0),
+    ("growth_signals", "time_back", r"hiring|scaling|headcount|team grow\w*", 1.0),
+    ("growth_signals", "roi_money_math", r"\d+\s*%|yoy|revenue|arr\b", 1.0),
+    ("notable_achievement", "personal_achievement", None, 2.5),
+    ("funding_stage", "trigger_event", r"series [a-f]\b|seed", 1.0),
+    ("funding_stage", "roi_money_math", r"bootstrap\w*|profitab\w*|public", 1.0),
+    ("technography", "competitive_displace",
+     r"outreach|salesloft|apollo|zoominfo|clay\b|lusha|seamless\.ai|reply\.io|lemlist", 2.0),
+    ("description", "pain_first", r"manual|spreadsheet|legacy|paper|slow|backlog|long (sales )?cycles?", 2.0),
+    ("description", "visionary_future", r"\bai\b|machine learning|automation", 0.5),
+    ("industry", "risk_compliance",
+     r"financ\w*|fintech|bank\w*|insurance|health\w*|pharma\w*|medical|legal|government|crypto", 1.5),
+    ("industry", "peer_benchmark", None, 0.5),
+    ("job_title", "thought_leadership_give", None, 0.5),
+)
+
+# Months in role up to which the prospect counts as new in the role
+NEW_IN_ROLE_MONTHS = 6
+
+# Clause boundaries: commas, semicolons, pipes, line breaks and sentence ends (not the dot of a domain)
+_CLAUSE_END = re.compile(r"[,;|\n]|\.(?=\s|$)")
+_THEME_SECTION = re.compile(r"^##\s*THEME", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class ThemeChoice:
+    theme: str
+    anchor_signal: str
+    score: float
+
+
+def _clause(text: str, position: int) -> str:
+    """The comma/sentence-delimited clause of `text` around `position`"""
+    start = 0
+    for boundary in _CLAUSE_END.finditer(text):
+        if boundary.start() > position:
+            return text[start:boundary.start()].strip()
+        start = boundary.end()
+    return text[start:].strip()
+
+
+class ThemeScorer:
+    """Picks the theme and anchor signal of emails from prospect and company data"""
+
+    def __init__(self):
+        self._rules = [
+            (field, theme, re.compile(pattern, re.IGNORECASE) if pattern else None, votes * FIELD_WEIGHTS[field],
+             0 if field in ProspectData.model_fields else 1)
+            for field, theme, pattern, votes in RULES
+        ]
+        self._system_prompts: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+    def score(self, prospect: ProspectData, company: CompanyData, theme: Optional[str] = None) -> ThemeChoice:
+        """
+        Choose the theme and anchor signal of one email
+
+        Args:
+            prospect: The prospect
+            company: The prospect's company
+            theme: Theme requested in the email metadata, used when it is one of THEMES
+
+        Returns:
+            The chosen theme
+        """
+        return self.score_batch([(prospect, company)], [theme])[0]
+
+    def score_batch(self, records: Sequence[Tuple[ProspectData, CompanyData]],
+                    themes: Optional[Sequence[Optional[str]]] = None) -> List[ThemeChoice]:
+        """
+        Choose the themes of many emails at once
+
+        Records are scored column by column: each rule's compiled pattern is
+        applied to its field of every record before moving to the next rule.
+
+        Args:
+            records: (prospect, company) pairs
+            themes: Requested theme per record, or None
+
+        Returns:
+            The choice for each record, in order
+        """
+        scores: List[Dict[str, float]] = [dict() for _ in records]
+        # theme -> (votes, anchor) of the strongest vote, per record
+        anchors: List[Dict[str, Tuple[float, str]]] = [dict() for _ in records]
+
+        for field, theme, pattern, votes, source in self._rules:
+            for record, record_scores, record_anchors in zip(records, scores, anchors):
+                text = getattr(record[source], field)
+                if not text:
+                    continue
+                if pattern is None:
+                    anchor = text.strip()
+                else:
+                    match = pattern.search(text)
+                    if match is None:
+                        continue
+                    anchor = _clause(text, match.start())
+                record_scores[theme] = record_scores.get(theme, 0.0) + votes
+                if votes > record_anchors.get(theme, (0.0, ""))[0]:
+                    record_anchors[theme] = (votes, anchor)
+
+        for (prospect, _), record_scores, record_anchors in zip(records, scores, anchors):
+            if prospect.tenure_months is not None and prospect.tenure_months <= NEW_IN_ROLE_MONTHS:
+                anchor = f"{prospect.tenure_months} months into the {prospect.job_title} role"
+                for theme, votes in (("micro_win", 2.0), ("trigger_event", 1.0)):
+                    record_scores[theme] = record_scores.get(theme, 0.0) + votes
+                    if votes > record_anchors.get(theme, (0.0, ""))[0]:
+                        record_anchors[theme] = (votes, anchor)
+
+        choices = []
+        for index, (record_scores, record_anchors) in enumerate(zip(scores, anchors)):
+            requested = themes[index] if themes else None
+            if requested in THEMES:
+                THEMES_SELECTED.inc(theme=requested, source="requested")
+                best = self._best(record_scores)
+                anchor = record_anchors.get(requested) or record_anchors.get(best) or (0.0, "")
+                choices.append(ThemeChoice(requested, anchor[1], record_scores.get(requested, 0.0)))
+                continue
+            theme = self._best(record_scores)
+            THEMES_SELECTED.inc(theme=theme, source="scored")
+            choices.append(ThemeChoice(theme, record_anchors.get(theme, (0.0, ""))[1],
+                                       record_scores.get(theme, 0.0)))
+        return choices
+
+    @staticmethod
+    def _best(record_scores: Dict[str, float]) -> str:
+        best, best_score = FALLBACK_THEME, 0.0
+        for theme in THEMES:
+            if record_scores.get(theme, 0.0) > best_score:
+                best, best_score = theme, record_scores[theme]
+        return best
+
+    def system_prompt(self, base_prompt: str, theme: str) -> str:
+        """
+        The system prompt restricted to one theme
+
+        Sections whose heading starts with "THEME" (the catalog and the
+        selection logic) are replaced by a section with the chosen theme's
+        rules. A prompt without such sections gets the section appended.
+        Results are cached per prompt and theme.
+
+        Args:
+            base_prompt: The system prompt with all themes
+            theme: The chosen theme
+
+        Returns:
+            The slimmed system prompt
+        """
+        key = (base_prompt, theme)
+        prompt = self._system_prompts.get(key)
+        if prompt is not None:
+            return prompt
+
+        section = (f"## THEME\nUse the theme {theme}, anchored on the anchor signal given with the prospect data.\n"
+                   f"  • {THEMES.get(theme, THEMES[FALLBACK_THEME])}\n")
+        kept: List[str] = []
+        inserted = False
+        for part in re.split(r"(?m)^(?=##\s)", base_prompt):
+            if _THEME_SECTION.match(part):
+                if not inserted:
+                    kept.append(section + "\n")
+                    inserted = True
+            else:
+                kept.append(part)
+        prompt = "".join(kept)
+        if not inserted:
+            prompt = prompt.rstrip("\n") + "\n\n" + section
+        prompt = prompt.replace("<one of the 12 themes>", theme)
+
+        self._system_prompts[key] = prompt
+        # A new pulled prompt makes the entries of the old one unused
+        if len(self._system_prompts) > 4 * len(THEMES):
+            self._system_prompts.popitem(last=False)
+        return prompt
+
+    @staticmethod
+    def anchor_context(choice: ThemeChoice) -> str:
+        """The lines telling the LLM which theme and anchor signal to use, added to the user prompt"""
+        anchor = choice.anchor_signal or "none found; use the best available detail without inventing facts"
+        return f"\n\n## THEME\n- theme: {choice.theme}\n- anchor_signal: {anchor}"
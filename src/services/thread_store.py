@@ -0,0 +1,244 @@
+# src/services/thread_store.py
+"""
+Server-side state of email sequences ("threads").
+
+A thread keeps the context shared by every step of a sequence (prospect,
+company, seller, CTA, ...) and the emails generated so far, so follow-up
+requests only carry the step and any new signals. The store is pluggable:
+THREAD_STORE_URL selects an in-memory store ("memory://") or a SQLite file
+("sqlite:///path/to/threads.db"). Both are local to the process or host; a
+deployment with several instances needs a store they share.
+"""
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from src.api.models import EmailMetadata, ThreadRequest
+from src.services.history_digest import split_emails
+
+THREAD_ID_PREFIX = "thr_"
+
+
+class ThreadNotFoundError(Exception):
+    """Raised when a thread ID is unknown or the thread has expired"""
+
+
+class Thread:
+    """Shared context of a sequence and the emails generated for it"""
+
+    def __init__(self, thread_id: str, request: ThreadRequest, emails: Optional[List[Dict[str, Any]]] = None):
+        self.thread_id = thread_id
+        self.request = request
+        self.emails = emails or []
+
+    def next_step(self) -> int:
+        """The step after the last email of the thread, counting emails sent before it was created"""
+        imported = len(split_emails(self.request.email_history)) if self.request.email_history else 0
+        return imported + len(self.emails) + 1
+
+    def email_history(self) -> Optional[str]:
+        """The thread's history in the "Email N / Subject:" form the history digest splits on"""
+        parts = [self.request.email_history] if self.request.email_history else []
+        for email in self.emails:
+            parts.append(
+                f"Email {email['step_number']}\nSubject: {email['subject_line']}\n\n{email['email_body']}"
+            )
+        return "\n\n---\n\n".join(parts) or None
+
+    def metadata(self, step_number: Optional[int] = None, theme: Optional[str] = None) -> EmailMetadata:
+        """Metadata of the email request for a step of the thread"""
+        return EmailMetadata(
+            step_number=step_number or self.next_step(),
+            theme=theme,
+            email_history=self.email_history(),
+        )
+
+
+class ThreadStore(ABC):
+    """
+    Storage of threads.
+
+    Threads expire `ttl_seconds` after they were last created, updated or
+    appended to.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def new_thread_id() -> str:
+        return THREAD_ID_PREFIX + secrets.token_hex(12)
+
+    def create(self, request: ThreadRequest) -> Thread:
+        """
+        Create a thread
+
+        Args:
+            request: Context shared by every step of the sequence
+
+        Returns:
+            The new thread
+        """
+        thread = Thread(self.new_thread_id(), request)
+        self._save(thread)
+        return thread
+
+    @abstractmethod
+    def get(self, thread_id: str) -> Thread:
+        """
+        Get a thread with its emails
+
+        Raises:
+            ThreadNotFoundError: If the thread is unknown or expired
+        """
+
+    @abstractmethod
+    def update_request(self, thread_id: str, request: ThreadRequest) -> None:
+        """Replace the shared context of a thread, e.g. with new company signals"""
+
+    @abstractmethod
+    def append_email(self, thread_id: str, email: Dict[str, Any]) -> None:
+        """Add a generated email to a thread"""
+
+    @abstractmethod
+    def _save(self, thread: Thread) -> None:
+        """Store a new thread"""
+
+
+class MemoryThreadStore(ThreadStore):
+    """Threads held in process memory, evicting the least recently used beyond `max_entries`"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._threads: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _save(self, thread: Thread) -> None:
+        self._threads[thread.thread_id] = (time.time(), thread)
+        self._threads.move_to_end(thread.thread_id)
+        while len(self._threads) > self.max_entries:
+            self._threads.popitem(last=False)
+
+    def get(self, thread_id: str) -> Thread:
+        entry = self._threads.get(thread_id)
+        if entry is None or time.time() - entry[0] > self.ttl_seconds:
+            self._threads.pop(thread_id, None)
+            raise ThreadNotFoundError(f"Thread {thread_id} does not exist or has expired")
+        return entry[1]
+
+    def update_request(self, thread_id: str, request: ThreadRequest) -> None:
+        thread = self.get(thread_id)
+        thread.request = request
+        self._save(thread)
+
+    def append_email(self, thread_id: str, email: Dict[str, Any]) -> None:
+        thread = self.get(thread_id)
+        thread.emails.append(email)
+        self._save(thread)
+
+
+class SQLiteThreadStore(ThreadStore):
+    """Threads persisted in a SQLite database file, surviving restarts"""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS threads ("
+                "thread_id TEXT PRIMARY KEY, request TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS thread_emails ("
+                "thread_id TEXT NOT NULL, position INTEGER NOT NULL, email TEXT NOT NULL, "
+                "PRIMARY KEY (thread_id, position))"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at)")
+
+    def _save(self, thread: Thread) -> None:
+        now = time.time()
+        with self._lock:
+            # New threads sweep out expired ones, so the file does not grow without bound
+            for (expired_id,) in self._connection.execute(
+                    "SELECT thread_id FROM threads WHERE updated_at < ?", (now - self.ttl_seconds,)
+            ).fetchall():
+                self._delete(expired_id)
+            self._connection.execute(
+                "INSERT INTO threads (thread_id, request, updated_at) VALUES (?, ?, ?)",
+                (thread.thread_id, thread.request.model_dump_json(exclude_unset=True), now),
+            )
+
+    def get(self, thread_id: str) -> Thread:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT request, updated_at FROM threads WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._delete(thread_id)
+                raise ThreadNotFoundError(f"Thread {thread_id} does not exist or has expired")
+            emails = self._connection.execute(
+                "SELECT email FROM thread_emails WHERE thread_id = ? ORDER BY position", (thread_id,)
+            ).fetchall()
+        return Thread(thread_id, ThreadRequest.model_validate_json(row[0]), [orjson.loads(e[0]) for e in emails])
+
+    def update_request(self, thread_id: str, request: ThreadRequest) -> None:
+        with self._lock:
+            updated = self._connection.execute(
+                "UPDATE threads SET request = ?, updated_at = ? WHERE thread_id = ?",
+                (request.model_dump_json(exclude_unset=True), time.time(), thread_id),
+            ).rowcount
+        if not updated:
+            raise ThreadNotFoundError(f"Thread {thread_id} does not exist or has expired")
+
+    def append_email(self, thread_id: str, email: Dict[str, Any]) -> None:
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                updated = self._connection.execute(
+                    "UPDATE threads SET updated_at = ? WHERE thread_id = ?", (time.time(), thread_id)
+                ).rowcount
+                if not updated:
+                    raise ThreadNotFoundError(f"Thread {thread_id} does not exist or has expired")
+                self._connection.execute(
+                    "INSERT INTO thread_emails (thread_id, position, email) VALUES (?, "
+                    "(SELECT COALESCE(MAX(position), 0) + 1 FROM thread_emails WHERE thread_id = ?), ?)",
+                    (thread_id, thread_id, orjson.dumps(email).decode()),
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def _delete(self, thread_id: str) -> None:
+        self._connection.execute("DELETE FROM thread_emails WHERE thread_id = ?", (thread_id,))
+        self._connection.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+
+def create_thread_store(url: str, ttl_seconds: float, max_entries: int) -> ThreadStore:
+    """
+    Create the thread store a THREAD_STORE_URL names
+
+    Args:
+        url: "memory://" or "sqlite:///<path>" (e.g. sqlite:///threads.db, sqlite:////tmp/threads.db)
+        ttl_seconds: Inactivity after which threads expire
+        max_entries: Most threads held by the in-memory store
+
+    Raises:
+        ValueError: If the URL names an unknown store
+    """
+    if url == "memory://":
+        return MemoryThreadStore(ttl_seconds, max_entries)
+    if url.startswith("sqlite:///"):
+        return SQLiteThreadStore(url[len("sqlite:///"):], ttl_seconds)
+    raise ValueError(f"Unsupported thread store URL: {url}")
@@ -0,0 +1,103 @@
+# src/utils/idempotency.py
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when an idempotency key is reused with a different request payload"""
+
+
+class IdempotencyStore:
+    """
+    Deduplicates requests carrying the same idempotency key.
+
+    While an operation is running, duplicates attach to its future instead of
+    starting a second one. Once it has completed, its result is replayed until
+    the TTL expires. Failed or cancelled operations are not remembered, so a
+    retry after an error runs again.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._inflight: Dict[str, Tuple[str, "asyncio.Future[Any]"]] = {}
+        self._completed: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def fingerprint(payload: str) -> str:
+        """Hash the request payload so key reuse with a different body can be detected"""
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_completed(self, key: str) -> Optional[Tuple[str, Any]]:
+        entry = self._completed.get(key)
+        if entry is None:
+            return None
+        stored_at, fingerprint, result = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._completed[key]
+            return None
+        return fingerprint, result
+
+    def _store(self, key: str, fingerprint: str, result: Any) -> None:
+        self._completed[key] = (time.monotonic(), fingerprint, result)
+        self._completed.move_to_end(key)
+        while len(self._completed) > self.max_entries:
+            self._completed.popitem(last=False)
+
+    async def run(
+            self,
+            key: str,
+            payload: str,
+            operation: Callable[[], Awaitable[Any]],
+            should_store: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Run an operation at most once per idempotency key
+
+        Args:
+            key: Idempotency key, already namespaced by the caller
+            payload: Serialized request, used to detect key reuse
+            operation: Zero-argument coroutine factory doing the actual work
+            should_store: Optional predicate deciding whether a result may be replayed
+
+        Returns:
+            Tuple of the operation result and whether it was replayed or shared
+            with an in-flight duplicate
+
+        Raises:
+            IdempotencyConflictError: If the key was used for a different payload
+        """
+        fingerprint = self.fingerprint(payload)
+
+        completed = self._get_completed(key)
+        if completed is not None:
+            stored_fingerprint, result = completed
+            if stored_fingerprint != fingerprint:
+                raise IdempotencyConflictError("Idempotency-Key was already used with a different request")
+            return result, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            inflight_fingerprint, future = inflight
+            if inflight_fingerprint != fingerprint:
+                raise IdempotencyConflictError("Idempotency-Key is in use by a different request")
+            # Shield so a disconnecting duplicate does not cancel the shared work
+            return await asyncio.shield(future), True
+
+        future = asyncio.ensure_future(operation())
+        self._inflight[key] = (fingerprint, future)
+
+        def on_done(done: "asyncio.Future[Any]") -> None:
+            self._inflight.pop(key, None)
+            if done.cancelled() or done.exception() is not None:
+                return
+            result = done.result()
+            if should_store is None or should_store(result):
+                self._store(key, fingerprint, result)
+
+        future.add_done_callback(on_done)
+        # The original caller going away must not cancel work a retry may attach to
+        return await asyncio.shield(future), False
@@ -1,8 +1,15 @@
 # src/utils/langsmith_prompt_manager.py
-from typing import Dict, Any, Optional
-from langsmith import Client
+from typing import Dict, Any, Optional, TYPE_CHECKING
 
-from langsmith.client import convert_prompt_to_openai_format
+from src.config import settings
+from src.utils.native_prompt import NativePrompt, compile_prompt
+from src.utils.tracing import langchain_tracing
+
+# langsmith.client is imported inside the methods that need it; importing it
+# here would add a few hundred milliseconds to every Lambda cold start.
+
+if TYPE_CHECKING:
+    from src.api.models import EmailRequest
 
 
 class LangsmithPromptManager:
@@ -12,8 +19,11 @@ class LangsmithPromptManager:
     """
     _instance = None
     _client = None
-    _system_prompt = None
+    # Prompt ID -> system prompt text, so every prompt version keeps its own
+    _system_prompts = {}
     _user_prompt_templates = {}
+    # Prompt ID -> (pulled template, its compiled form or None), see _render_user_prompt
+    _native_prompts = {}
 
     def __new__(cls):
         if cls._instance is None:
@@ -23,9 +33,16 @@ class LangsmithPromptManager:
 
     @classmethod
     def _initialize(cls):
-        """Initialize the LangSmith client and load prompts"""
-        cls._client = Client()
-        # Prompts will be loaded on demand
+        """Initialize the manager; the client and prompts are loaded on demand"""
+        cls._client = None
+
+    @classmethod
+    def _get_client(cls):
+        """Get the LangSmith client, creating it on first use"""
+        if cls._client is None:
+            from langsmith import Client
+            cls._client = Client()
+        return cls._client
 
     @classmethod
     def get_system_prompt(cls, prompt_id: Optional[str] = None) -> str:
@@ -39,21 +56,19 @@ class LangsmithPromptManager:
             The system prompt as a string
         """
         # Return cached version or try to load from environment
-        if cls._system_prompt:
-            return cls._system_prompt
+        if prompt_id in cls._system_prompts:
+            return cls._system_prompts[prompt_id]
 
         if prompt_id:
             try:
-                prompt = cls._client.pull_prompt(prompt_id, include_model=False)
+                from langsmith.client import convert_prompt_to_openai_format
+                prompt = cls._get_client().pull_prompt(prompt_id, include_model=False)
                 prompt_value = prompt.invoke({})
                 openai_payload = convert_prompt_to_openai_format(prompt_value)
-                cls._system_prompt = openai_payload["messages"][0]["content"]
-                return cls._system_prompt
+                cls._system_prompts[prompt_id] = openai_payload["messages"][0]["content"]
+                return cls._system_prompts[prompt_id]
             except Exception as e:
-                print(f"Error loading system prompt from LangSmith: {str(e)}")
-                # Fall back to cached version if available
-                if cls._system_prompt:
-                    return cls._system_prompt
+                print(f"Error loading system prompt {prompt_id} from LangSmith: {str(e)}")
                 return "You are an AI assistant that helps generate personalized emails."
 
 
@@ -77,7 +92,7 @@ class LangsmithPromptManager:
 
         if prompt_id:
             try:
-                prompt = cls._client.pull_prompt(prompt_id, include_model=False)
+                prompt = cls._get_client().pull_prompt(prompt_id, include_model=False)
                 cls._user_prompt_templates[prompt_id] = prompt
                 return prompt
             except Exception as e:
@@ -88,85 +103,107 @@ class LangsmithPromptManager:
         return "Write a personalized email."
 
     @classmethod
-    def render_prompt(cls, request_data: Dict[str, Any],
+    def render_prompt(cls, request: "EmailRequest",
                       user_prompt_id: Optional[str] = None,
                       system_prompt_id: Optional[str] = None,
-                      user_prompt_followup_id: Optional[str] = None) -> Dict[str, str]:
+                      user_prompt_followup_id: Optional[str] = None,
+                      shared_context: Optional[Dict[str, str]] = None,
+                      email_history: Optional[str] = None,
+                      company_context: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """
         Render both system and user prompts using the request data
 
         Args:
-            request_data: Email request data containing prospect, company, etc.
+            request: Validated email request containing prospect, company, etc.
             user_prompt_id: Optional ID of the user prompt in LangSmith
             system_prompt_id: Optional ID of the system prompt in LangSmith
             user_prompt_followup_id: Optional ID of the follow-up user prompt in LangSmith
+            shared_context: Pre-flattened campaign variables, see EmailRequest.to_template_context
+            email_history: History for the follow-up prompt instead of the request's own, e.g. a digest
+            company_context: company_* variables instead of the request's company, e.g. a digest
 
         Returns:
             Dictionary with rendered 'system_prompt' and 'user_prompt'
         """
+        with langchain_tracing():
+            return cls._render_prompt(request, user_prompt_id, system_prompt_id,
+                                      user_prompt_followup_id, shared_context, email_history, company_context)
+
+    @classmethod
+    def _render_prompt(cls, request: "EmailRequest",
+                       user_prompt_id: Optional[str],
+                       system_prompt_id: Optional[str],
+                       user_prompt_followup_id: Optional[str],
+                       shared_context: Optional[Dict[str, str]],
+                       email_history: Optional[str],
+                       company_context: Optional[Dict[str, str]]) -> Dict[str, str]:
         # Get templates
         system_prompt = cls.get_system_prompt(system_prompt_id)
         user_prompt_template = cls.get_user_prompt_template(user_prompt_id)
 
-        # Create a flat dictionary for template substitution
-        template_data = {}
-
-        # Add prospect data (ensure it's not None)
-        prospect = request_data.get("prospect", {}) or {}
-        for key, value in prospect.items():
-            template_data[f"prospect_{key}"] = str(value) if value is not None else ""
-
-        # Add company data (ensure it's not None)
-        company = request_data.get("company", {}) or {}
-        for key, value in company.items():
-            template_data[f"company_{key}"] = str(value) if value is not None else ""
-
-        # Add seller data with defaults (ensure it's not None)
-        default_seller = {
-            "product_name": "Ingren.ai",
-            "category": "AI‑powered outbound automation",
-            "headline_benefit": "Turns 8 hrs of prospect research into 8 min",
-            "unique_proof": "87% faster research → 22% more first‑call bookings",
-            "marquee_case_studies": ""
-        }
-        seller = request_data.get("seller") or {}
-        seller_data = {**default_seller, **seller}
-        for key, value in seller_data.items():
-            template_data[f"seller_{key}"] = str(value) if value is not None else ""
-
-        # Add CTA data (ensure it's not None)
-        cta = request_data.get("cta", {}) or {}
-        for key, value in cta.items():
-            template_data[f"cta_{key}"] = str(value) if value is not None else ""
-
-        # Replace sender_name and email_tone from root object
-        template_data["sender_name"] = request_data.get("sender_name", "Ingren AI")
-        template_data["email_tone"] = request_data.get("email_tone", "professional")
-
-        # Add sample email (if provided)
-        if "sample_email" in request_data:
-            template_data["sample_email"] = request_data["sample_email"]
-
-        # Add metadata (ensure it's not None)
-        metadata = request_data.get("metadata", {}) or {}
-        for key, value in metadata.items():
-            template_data[f"{key}"] = str(value) if value is not None else ""
-
-        user_prompt_invoked = user_prompt_template.invoke(template_data)
-
-        openai_payload = convert_prompt_to_openai_format(user_prompt_invoked)
-        user_prompt = openai_payload["messages"][0]["content"]
+        # Flat dictionary for template substitution, built from the model directly
+        template_data = request.to_template_context(shared_context, company_context)
 
         response = {
             "system_prompt": system_prompt,
-            "user_prompt": user_prompt
+            "user_prompt": cls._render_user_prompt(user_prompt_id, user_prompt_template, template_data)
         }
 
-        if request_data.get("metadata").get("step_number", 1) > 1:
+        metadata = request.metadata
+        if metadata is not None and metadata.step_number > 1:
             followup_prompt_template = cls.get_user_prompt_template(user_prompt_followup_id)
-            followup_prompt_invoked = followup_prompt_template.invoke(request_data.get("metadata"))
-            openai_payload = convert_prompt_to_openai_format(followup_prompt_invoked)
-            followup_prompt = openai_payload["messages"][0]["content"]
-            response["user_followup_prompt"] = followup_prompt
+            followup_context = dict(metadata)
+            if email_history is not None:
+                followup_context["email_history"] = email_history
+            response["user_followup_prompt"] = cls._render_user_prompt(
+                user_prompt_followup_id, followup_prompt_template, followup_context
+            )
+
+        return response
+
+    @classmethod
+    def _render_user_prompt(cls, prompt_id: Optional[str], template, values: Dict[str, Any]) -> str:
+        """
+        Render the first message of a user prompt template
 
-        return response
\ No newline at end of file
+        Templates are compiled to native format strings on first use. The first
+        native render of each template is compared with the LangChain render;
+        a template whose renders differ keeps using LangChain.
+        """
+        native = cls._native_prompt(prompt_id, template)
+        if native is not None:
+            try:
+                content = native.render(values)[0]["content"]
+            except Exception:
+                # Let LangChain raise its own error for missing variables
+                return cls._render_with_langchain(template, values)
+            if native.verified:
+                return content
+
+            langchain_content = cls._render_with_langchain(template, values)
+            if content == langchain_content:
+                native.verified = True
+            else:
+                print(f"Native render of prompt {prompt_id} differs from LangChain; using LangChain for it")
+                cls._native_prompts[prompt_id] = (template, None)
+            return langchain_content
+
+        return cls._render_with_langchain(template, values)
+
+    @classmethod
+    def _native_prompt(cls, prompt_id: Optional[str], template) -> Optional[NativePrompt]:
+        """The compiled form of a template, compiling it when the template for the ID changes"""
+        if not settings.PROMPT_NATIVE_RENDER:
+            return None
+        entry = cls._native_prompts.get(prompt_id)
+        if entry is None or entry[0] is not template:
+            entry = (template, compile_prompt(template))
+            cls._native_prompts[prompt_id] = entry
+        return entry[1]
+
+    @staticmethod
+    def _render_with_langchain(template, values: Dict[str, Any]) -> str:
+        from langsmith.client import convert_prompt_to_openai_format
+
+        openai_payload = convert_prompt_to_openai_format(template.invoke(values))
+        return openai_payload["messages"][0]["content"]
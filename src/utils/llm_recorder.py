@@ -0,0 +1,163 @@
+# src/utils/llm_recorder.py
+"""
+Record and replay of OpenAI chat completion traffic.
+
+In record mode every chat completion made through a wrapped client is
+appended to a JSON-lines corpus together with its latency, keyed by a hash
+of the request. In replay mode the corpus answers instead of OpenAI, so
+benchmarks and regression runs are reproducible and need no network.
+Replays are instant unless original timing is requested.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from src.config import settings
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+MODES = (OFF, RECORD, REPLAY)
+
+# Per-call options that do not change what the model is asked
+_UNKEYED_OPTIONS = {"timeout", "extra_headers", "extra_query"}
+
+
+class ReplayMissError(Exception):
+    """Raised in replay mode when the corpus has no response for a request"""
+
+
+class LLMRecorder:
+    """
+    Records chat completions to, or replays them from, an on-disk corpus.
+
+    A request recorded several times (e.g. one payload sent repeatedly while
+    recording a benchmark) is replayed by cycling through its responses.
+    """
+
+    def __init__(self, mode: str = OFF, corpus_path: str = "llm_corpus.jsonl", replay_timing: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"LLM record mode must be one of {', '.join(MODES)}, got {mode!r}")
+        self.mode = mode
+        self.corpus_path = Path(corpus_path)
+        self.replay_timing = replay_timing
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._replay_positions: Dict[str, int] = defaultdict(int)
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def request_key(request: Dict[str, Any]) -> str:
+        """Content hash identifying a chat completion request"""
+        keyed = {name: value for name, value in request.items() if name not in _UNKEYED_OPTIONS}
+        return hashlib.sha256(orjson.dumps(keyed, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def wrap(self, client: Any) -> Any:
+        """Route a client's chat completions through the recorder, unless it is off"""
+        if self.mode == OFF:
+            return client
+        return _RecordingClient(client, self)
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._entries is None:
+            entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+            if self.corpus_path.exists():
+                with self.corpus_path.open("rb") as corpus:
+                    for line in corpus:
+                        if line.strip():
+                            entry = orjson.loads(line)
+                            entries[entry["key"]].append(entry)
+            self._entries = entries
+        return self._entries
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = orjson.dumps(entry) + b"\n"
+        with self._write_lock:
+            self.corpus_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.corpus_path.open("ab") as corpus:
+                corpus.write(line)
+
+    async def complete(self, create: Callable[..., Any], request: Dict[str, Any]) -> Any:
+        """
+        Make a chat completion, recording or replaying it according to the mode
+
+        Args:
+            create: The underlying client's chat.completions.create
+            request: Keyword arguments of the call
+
+        Returns:
+            The chat completion
+
+        Raises:
+            ReplayMissError: In replay mode, if the request was never recorded
+        """
+        key = self.request_key(request)
+
+        if self.mode == REPLAY:
+            recorded = self._load().get(key)
+            if not recorded:
+                raise ReplayMissError(f"No recorded response for request {key[:12]} in {self.corpus_path}")
+            position = self._replay_positions[key]
+            self._replay_positions[key] = position + 1
+            entry = recorded[position % len(recorded)]
+            if self.replay_timing:
+                await asyncio.sleep(entry["latency"])
+            from openai.types.chat import ChatCompletion
+            return ChatCompletion.model_validate(entry["response"])
+
+        started_at = time.monotonic()
+        response = await create(**request)
+        if self.mode == RECORD:
+            # The corpus write is blocking file I/O, keep it off the event loop
+            await asyncio.to_thread(self._append, {
+                "key": key,
+                "latency": round(time.monotonic() - started_at, 4),
+                "model": request.get("model"),
+                "messages": request.get("messages"),
+                "response": response.model_dump(mode="json", exclude_none=True),
+            })
+        return response
+
+
+class _RecordingCompletions:
+    def __init__(self, completions: Any, recorder: LLMRecorder):
+        self._completions = completions
+        self._recorder = recorder
+
+    async def create(self, **request: Any) -> Any:
+        return await self._recorder.complete(self._completions.create, request)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._completions, name)
+
+
+class _RecordingChat:
+    def __init__(self, chat: Any, recorder: LLMRecorder):
+        self._chat = chat
+        self.completions = _RecordingCompletions(chat.completions, recorder)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._chat, name)
+
+
+class _RecordingClient:
+    """Client proxy whose chat.completions.create goes through the recorder"""
+
+    def __init__(self, client: Any, recorder: LLMRecorder):
+        self._client = client
+        self.chat = _RecordingChat(client.chat, recorder)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+llm_recorder = LLMRecorder(
+    mode=settings.LLM_RECORD_MODE,
+    corpus_path=settings.LLM_CORPUS_PATH,
+    replay_timing=settings.LLM_REPLAY_TIMING,
+)
@@ -0,0 +1,133 @@
+# src/utils/metrics.py
+"""
+Minimal in-process metrics exported in the Prometheus text format.
+
+Metrics are registered once at import time of the module that owns them and
+rendered by the /metrics route. Labels are passed as keyword arguments.
+"""
+import bisect
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def total(self) -> float:
+        """Sum over every label combination"""
+        return sum(self._values.values())
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[_label_key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        """Read the value from `function` whenever the gauge is exported"""
+        self._functions[_label_key(labels)] = function
+
+    def samples(self) -> List[str]:
+        for key, function in self._functions.items():
+            self._values[key] = function()
+        return super().samples()
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        # Per-bucket counts, followed by the total count and the sum
+        series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, **labels: str) -> float:
+        series = self._series.get(_label_key(labels))
+        return sum(series[:-1]) if series else 0.0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+_registry: Dict[str, object] = {}
+
+
+def _register(metric):
+    return _registry.setdefault(metric.name, metric)
+
+
+def counter(name: str, description: str) -> Counter:
+    """Get or create a counter"""
+    return _register(Counter(name, description))
+
+
+def gauge(name: str, description: str) -> Gauge:
+    """Get or create a gauge"""
+    return _register(Gauge(name, description))
+
+
+def histogram(name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a histogram"""
+    return _register(Histogram(name, description, buckets))
+
+
+def render_prometheus() -> str:
+    """Render every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+# src/utils/native_prompt.py
+"""
+Pulled LangSmith chat prompts compiled to plain format strings.
+
+Rendering a LangChain ChatPromptTemplate builds message objects, and
+convert_prompt_to_openai_format then constructs a ChatOpenAI client just to
+turn them into OpenAI message dicts. For prompts made of f-string message
+templates the result is simply each template formatted with the request's
+variables, which str.format_map does directly.
+
+Prompts with other parts (mustache or jinja2 templates, message
+placeholders, callable partials, ...) are not compiled and keep the
+LangChain path.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# LangChain message types and the OpenAI roles they are sent as
+OPENAI_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+class NativePrompt:
+    """
+    A chat prompt compiled to (role, f-string template) pairs.
+
+    `source` is the LangChain prompt it was compiled from, and `verified`
+    whether a render has been checked against the LangChain output.
+    """
+
+    def __init__(self, source: Any, messages: List[Tuple[str, str]], partials: Dict[str, Any]):
+        self.source = source
+        self.messages = messages
+        self.partials = partials
+        self.verified = False
+
+    def render(self, values: Mapping[str, Any]) -> List[Dict[str, str]]:
+        """
+        Format the prompt's messages
+
+        Args:
+            values: Template variables
+
+        Returns:
+            OpenAI chat messages, as convert_prompt_to_openai_format returns them
+
+        Raises:
+            KeyError: If a template variable is missing
+        """
+        if self.partials:
+            values = {**self.partials, **values}
+        return [{"role": role, "content": template.format_map(values)} for role, template in self.messages]
+
+
+def compile_prompt(prompt: Any) -> Optional[NativePrompt]:
+    """
+    Compile a pulled chat prompt
+
+    Args:
+        prompt: Prompt returned by the LangSmith client's pull_prompt
+
+    Returns:
+        The compiled prompt, or None if it has parts that are only rendered by LangChain
+    """
+    from langchain_core.messages import BaseMessage
+    from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+    from langchain_core.prompts.chat import (
+        AIMessagePromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate,
+    )
+
+    if type(prompt) is not ChatPromptTemplate:
+        return None
+    partials = dict(prompt.partial_variables)
+
+    messages = []
+    for message in prompt.messages:
+        if isinstance(message, BaseMessage):
+            role = OPENAI_ROLES.get(message.type)
+            if role is None or not isinstance(message.content, str):
+                return None
+            # A fixed message is formatted like a template without variables
+            template = message.content.replace("{", "{{").replace("}", "}}")
+        elif type(message) in (HumanMessagePromptTemplate, SystemMessagePromptTemplate, AIMessagePromptTemplate):
+            inner = message.prompt
+            if (type(inner) is not PromptTemplate or inner.template_format != "f-string"
+                    or not isinstance(inner.template, str) or inner.partial_variables
+                    or message.additional_kwargs):
+                return None
+            role = _role(message)
+            template = inner.template
+        else:
+            return None
+        messages.append((role, template))
+
+    if any(callable(value) for value in partials.values()):
+        return None
+    return NativePrompt(prompt, messages, partials)
+
+
+def _role(message: Any) -> str:
+    from langchain_core.prompts.chat import AIMessagePromptTemplate, SystemMessagePromptTemplate
+
+    if isinstance(message, SystemMessagePromptTemplate):
+        return "system"
+    if isinstance(message, AIMessagePromptTemplate):
+        return "assistant"
+    return "user"
@@ -0,0 +1,191 @@
+# src/utils/profiler.py
+"""
+On-demand sampling profiler.
+
+A background thread wakes every `interval` seconds, reads the current stack
+of every other thread (sys._current_frames) and counts each stack. Nothing
+runs while no profile is being taken, so there is no overhead otherwise.
+
+Profiles are returned in the collapsed-stack format read by flamegraph.pl,
+speedscope and similar tools: one line per distinct stack, root first,
+frames separated by ";", followed by the number of samples, e.g.
+
+    thread:MainThread;uvicorn.server:Server.serve;...;orjson:loads 12
+
+A profile can cover everything the process does (`start()`), or only the
+stacks running a given frame (`start(anchor)`), e.g. the coroutine of one
+request. Samples are wall-clock: an event loop waiting for I/O shows up as
+its selector's frames, while a coroutine waiting on OpenAI is not on any
+stack and so is not sampled at all.
+"""
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from types import CodeType, FrameType
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.utils import metrics
+
+PROFILES = metrics.counter("profiles_total", "Profiles taken, by kind (window or request)")
+
+# Most request profiles kept for /debug/profile/{profile_id}
+MAX_REQUEST_PROFILES = 100
+
+_PACKAGE_DIRS = sorted({os.path.dirname(os.path.dirname(os.path.abspath(__file__)))} |
+                       {os.path.abspath(path) for path in sys.path if path and os.path.isdir(path)},
+                       key=len, reverse=True)
+
+
+class ProfileSession:
+    """Samples counted for one profile"""
+
+    def __init__(self, kind: str, anchor: Optional[FrameType] = None, profile_id: Optional[str] = None):
+        self.profile_id = profile_id or secrets.token_hex(8)
+        self.kind = kind
+        self.anchor = anchor
+        self.samples: "Counter[str]" = Counter()
+        self.started_at = time.monotonic()
+        self.duration: Optional[float] = None
+
+    def collapsed(self) -> str:
+        """The profile in the collapsed-stack format, most sampled stacks first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the process's threads while profiles are being taken.
+
+    Args:
+        interval: Seconds between samples
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions: List[ProfileSession] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[CodeType, str] = {}
+        self._request_profiles: "OrderedDict[str, ProfileSession]" = OrderedDict()
+
+    def start(self, anchor: Optional[FrameType] = None, kind: str = "window",
+              profile_id: Optional[str] = None) -> ProfileSession:
+        """
+        Start a profile
+
+        Args:
+            anchor: Only count stacks running this frame, or every stack if None
+            kind: Kind of profile, for the metrics
+            profile_id: ID of the profile, generated if not given
+
+        Returns:
+            The session collecting the profile's samples
+        """
+        session = ProfileSession(kind, anchor, profile_id)
+        with self._lock:
+            self._sessions.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        PROFILES.inc(kind=kind)
+        return session
+
+    def stop(self, session: ProfileSession, keep: bool = False) -> ProfileSession:
+        """
+        Stop a profile; the sampler thread exits with the last one
+
+        Args:
+            session: The profile to stop
+            keep: Keep the profile for `request_profile`
+        """
+        session.duration = time.monotonic() - session.started_at
+        session.anchor = None
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+            if keep:
+                self._request_profiles[session.profile_id] = session
+                while len(self._request_profiles) > MAX_REQUEST_PROFILES:
+                    self._request_profiles.popitem(last=False)
+        return session
+
+    def profile_request(self, function: Callable[[], Awaitable[Any]]) -> "RequestProfile":
+        """
+        Wrap a coroutine function so its call is profiled, counting only the stacks running it
+
+        Args:
+            function: The request's work, e.g. the generate() of a route
+
+        Returns:
+            A coroutine function doing the same work, with the `profile_id` its profile is kept under
+        """
+        return RequestProfile(self, function)
+
+    def request_profile(self, profile_id: str) -> Optional[ProfileSession]:
+        """A finished request profile, if it is still kept"""
+        return self._request_profiles.get(profile_id)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions)
+                if not sessions:
+                    self._thread = None
+                    return
+            self._sample(own_id, sessions)
+            time.sleep(self.interval)
+
+    def _sample(self, own_id: int, sessions: List[ProfileSession]) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack: List[str] = []
+            frames = set()
+            current: Optional[FrameType] = frame
+            while current is not None:
+                stack.append(self._label(current.f_code))
+                frames.add(id(current))
+                current = current.f_back
+            stack.append(f"thread:{names.get(thread_id, thread_id)}")
+            key = ";".join(reversed(stack))
+            for session in sessions:
+                anchor = session.anchor
+                if session.duration is None and (anchor is None or id(anchor) in frames):
+                    session.samples[key] += 1
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.abspath(code.co_filename)
+            for directory in _PACKAGE_DIRS:
+                if filename.startswith(directory + os.sep):
+                    filename = filename[len(directory) + 1:]
+                    break
+            module = filename[:-3] if filename.endswith(".py") else filename
+            module = module.replace(os.sep, ".").replace(";", ":")
+            label = f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+            self._labels[code] = label
+        return label
+
+
+class RequestProfile:
+    """A coroutine function profiled while it runs, see SamplingProfiler.profile_request"""
+
+    def __init__(self, profiler: SamplingProfiler, function: Callable[[], Awaitable[Any]]):
+        self.profiler = profiler
+        self.function = function
+        self.profile_id = secrets.token_hex(8)
+
+    async def __call__(self) -> Any:
+        coroutine = self.function()
+        # The coroutine's frame is on the stack whenever its work runs
+        session = self.profiler.start(anchor=coroutine.cr_frame, kind="request", profile_id=self.profile_id)
+        try:
+            return await coroutine
+        finally:
+            self.profiler.stop(session, keep=True)
@@ -0,0 +1,138 @@
+# src/utils/prompt_versions.py
+"""
+Prompt versions served side by side by one process.
+
+Each version names the LangSmith prompts it uses. The default version uses
+the LANGSMITH_*_PROMPT_ID settings; PROMPT_VERSIONS adds versions (or
+overrides the default's IDs), each falling back to the default's IDs for
+the prompts it does not name, e.g.
+
+    PROMPT_VERSIONS='{"v2": {"system": "ingren_email_system:v2"}}'
+
+A request pins a version with the X-Prompt-Version header or the
+/api/<version>/ path prefix. Other requests are split across
+PROMPT_VERSION_WEIGHTS, or get the default version when no weights are set.
+The version of the current request is kept in a context variable, like the
+tenant and priority in src.services.admission.
+"""
+import contextvars
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, Mapping, Optional
+
+from src.config import settings
+from src.utils import metrics
+
+PROMPT_VERSION_REQUESTS = metrics.counter(
+    "prompt_version_requests_total", "Requests by prompt version and how the version was selected"
+)
+
+
+class UnknownPromptVersionError(Exception):
+    """Raised when a request asks for a prompt version that is not configured"""
+
+
+@dataclass(frozen=True)
+class PromptVersion:
+    name: str
+    system_prompt_id: Optional[str]
+    user_prompt_id: Optional[str]
+    user_prompt_followup_id: Optional[str]
+
+
+current_prompt_version: contextvars.ContextVar[Optional[PromptVersion]] = contextvars.ContextVar(
+    "current_prompt_version", default=None
+)
+# Version the current request pinned by header or path, None if it was left to the split
+pinned_prompt_version: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "pinned_prompt_version", default=None
+)
+
+
+class PromptRouter:
+    """
+    Selects the prompt version of each request.
+
+    Args:
+        versions: Version name -> {"system", "user", "followup"} LangSmith prompt IDs
+        default_version: Name of the version built from the `default_ids`
+        default_ids: {"system", "user", "followup"} IDs of the default version
+        weights: Version name -> share of the requests that do not pin a version
+    """
+
+    def __init__(self, versions: Mapping[str, Mapping[str, str]], default_version: str,
+                 default_ids: Mapping[str, Optional[str]], weights: Optional[Mapping[str, float]] = None,
+                 rng: Callable[[], float] = random.random):
+        default_ids = {**default_ids, **versions.get(default_version, {})}
+        self.default_version = default_version
+        self.versions: Dict[str, PromptVersion] = {}
+        for name in [default_version, *versions]:
+            ids = {**default_ids, **versions.get(name, {})}
+            self.versions[name] = PromptVersion(name, ids.get("system"), ids.get("user"), ids.get("followup"))
+
+        unknown = set(weights or {}) - set(self.versions)
+        if unknown:
+            raise ValueError(f"PROMPT_VERSION_WEIGHTS names unknown prompt versions: {', '.join(sorted(unknown))}")
+        self._weights = [(name, weight) for name, weight in (weights or {}).items() if weight > 0]
+        self._total_weight = sum(weight for _, weight in self._weights)
+        self._rng = rng
+
+    @classmethod
+    def from_settings(cls, config) -> "PromptRouter":
+        return cls(
+            config.PROMPT_VERSIONS,
+            config.PROMPT_DEFAULT_VERSION,
+            {
+                "system": config.LANGSMITH_SYSTEM_PROMPT_ID,
+                "user": config.LANGSMITH_USER_PROMPT_ID,
+                "followup": config.LANGSMITH_USER_FOLLOWUP_PROMPT_ID,
+            },
+            config.PROMPT_VERSION_WEIGHTS,
+        )
+
+    def select(self, requested: Optional[str] = None) -> PromptVersion:
+        """
+        Choose the prompt version of a request and make it the current one
+
+        Args:
+            requested: Version pinned by the request, if any
+
+        Returns:
+            The selected version
+
+        Raises:
+            UnknownPromptVersionError: If the requested version is not configured
+        """
+        if requested is not None:
+            version = self.versions.get(requested)
+            if version is None:
+                raise UnknownPromptVersionError(
+                    f"Unknown prompt version {requested}; configured versions: {', '.join(self.versions)}"
+                )
+            selected_by = "request"
+        elif self._weights:
+            version = self.versions[self._weighted_choice()]
+            selected_by = "split"
+        else:
+            version = self.versions[self.default_version]
+            selected_by = "default"
+
+        PROMPT_VERSION_REQUESTS.inc(version=version.name, selected_by=selected_by)
+        current_prompt_version.set(version)
+        pinned_prompt_version.set(requested)
+        return version
+
+    def _weighted_choice(self) -> str:
+        point = self._rng() * self._total_weight
+        for name, weight in self._weights:
+            point -= weight
+            if point < 0:
+                return name
+        return self._weights[-1][0]
+
+    def current(self) -> PromptVersion:
+        """The version selected for the current request, or the default one outside requests"""
+        return current_prompt_version.get() or self.versions[self.default_version]
+
+
+prompt_router = PromptRouter.from_settings(settings)
@@ -0,0 +1,345 @@
+# src/utils/tracing.py
+"""
+Lazy, sampled and buffered LangSmith tracing.
+
+Importing langsmith's tracing machinery (and openai for wrap_openai) costs a
+few hundred milliseconds, so these helpers defer it until a traced function
+first runs or a client is first created, keeping it out of Lambda cold start.
+
+Whether a request is traced is decided once, when it starts: per route
+(TRACING_ROUTE_SAMPLE_RATES) or otherwise at TRACING_SAMPLE_RATE. Requests
+that are not sampled bypass langsmith entirely.
+
+Runs of sampled requests are not serialized or sent on the request path. The
+LangSmith client hands them to a bounded TraceBuffer, whose worker thread
+exports them when no traced call is running (or after a bounded delay), and
+drops runs rather than blocking when the buffer is full. On Lambda, where
+the process is frozen between invocations, an internal extension flushes the
+buffer after the response has been returned.
+"""
+import atexit
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+from src.config import settings
+from src.utils import metrics
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+TRACES_DROPPED = metrics.counter("tracing_dropped_runs_total", "Trace operations dropped because the buffer was full")
+TRACES_BUFFERED = metrics.gauge("tracing_buffered_runs", "Trace operations waiting to be exported")
+
+# Whether the current request is traced; None until decided
+_sampled: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar("tracing_sampled", default=None)
+
+
+def tracing_enabled() -> bool:
+    """Whether LangSmith tracing is switched on at all"""
+    return str(settings.LANGSMITH_TRACING).lower() == "true"
+
+
+def should_sample(route: Optional[str] = None) -> bool:
+    """
+    Make a sampling decision for a new request
+
+    Args:
+        route: Route name looked up in TRACING_ROUTE_SAMPLE_RATES
+
+    Returns:
+        Whether the request should be traced
+    """
+    if not tracing_enabled():
+        return False
+    rate = settings.TRACING_ROUTE_SAMPLE_RATES.get(route, settings.TRACING_SAMPLE_RATE)
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def sample_route(route: str) -> None:
+    """Decide whether the current request, served by `route`, is traced"""
+    _sampled.set(should_sample(route))
+
+
+def is_sampled() -> bool:
+    """Whether the current request is traced, deciding at the default rate if no route did"""
+    sampled = _sampled.get()
+    if sampled is None:
+        sampled = should_sample()
+        _sampled.set(sampled)
+    return sampled
+
+
+class TraceBuffer:
+    """
+    Bounded queue of trace operations exported by a background thread.
+
+    The worker waits for a moment when no traced call is active before each
+    export, but never longer than `idle_delay` seconds, so exports use idle
+    time without being starved by a busy process.
+    """
+
+    def __init__(self, send: Callable[[str, Dict[str, Any]], None], max_size: int, idle_delay: float):
+        self._send = send
+        self._queue: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue(max_size)
+        self.idle_delay = idle_delay
+        self._idle = threading.Event()
+        self._idle.set()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def put(self, operation: str, kwargs: Dict[str, Any]) -> bool:
+        """
+        Queue a trace operation without blocking
+
+        Returns:
+            False if the buffer was full and the operation was dropped
+        """
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                    self._worker.start()
+        try:
+            self._queue.put_nowait((operation, kwargs))
+            return True
+        except queue.Full:
+            TRACES_DROPPED.inc()
+            return False
+
+    def call_started(self) -> None:
+        with self._lock:
+            self._active += 1
+            self._idle.clear()
+
+    def call_finished(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active <= 0:
+                self._active = 0
+                self._idle.set()
+
+    def _run(self) -> None:
+        while True:
+            operation, kwargs = self._queue.get()
+            try:
+                self._idle.wait(self.idle_delay)
+                self._send(operation, kwargs)
+            except Exception as e:
+                print(f"Error exporting trace: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float) -> bool:
+        """
+        Wait until every queued operation has been exported
+
+        Returns:
+            False if operations were still queued when the timeout expired
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+
+_client = None
+_buffer: Optional[TraceBuffer] = None
+
+
+def get_buffer() -> Optional[TraceBuffer]:
+    """The trace buffer, if tracing has been used in this process"""
+    return _buffer
+
+
+def _get_client():
+    """LangSmith client whose run uploads go through the trace buffer, created on first use"""
+    global _client, _buffer
+    if _client is not None:
+        return _client
+
+    from langsmith import Client
+
+    class BufferedClient(Client):
+        def create_run(self, *args, **kwargs):
+            if args:
+                kwargs.update(zip(("name", "inputs", "run_type"), args))
+            _buffer.put("create", kwargs)
+
+        def update_run(self, run_id, **kwargs):
+            _buffer.put("update", {"run_id": run_id, **kwargs})
+
+        def send(self, operation: str, kwargs: Dict[str, Any]) -> None:
+            if operation == "create":
+                Client.create_run(self, **kwargs)
+            else:
+                Client.update_run(self, **kwargs)
+
+        def flush(self, timeout: Optional[float] = None) -> None:
+            _buffer.flush(settings.TRACING_FLUSH_TIMEOUT_SECONDS if timeout is None else timeout)
+            Client.flush(self)
+
+    client = BufferedClient()
+    _buffer = TraceBuffer(client.send, settings.TRACING_BUFFER_SIZE, settings.TRACING_IDLE_DELAY_SECONDS)
+    TRACES_BUFFERED.set_function(lambda: len(_buffer))
+    atexit.register(flush)
+    _client = client
+    return _client
+
+
+def flush(timeout: Optional[float] = None) -> None:
+    """Export buffered traces, waiting at most `timeout` (defaults to settings) for the buffer"""
+    if _client is not None:
+        try:
+            _client.flush(timeout)
+        except Exception as e:
+            print(f"Error flushing traces: {str(e)}")
+
+
+def traceable(func: F) -> F:
+    """
+    Drop-in for langsmith.traceable on async functions
+
+    langsmith is imported when a sampled call first runs. Calls of requests
+    that are not sampled run the function directly.
+
+    Args:
+        func: Coroutine function to trace
+
+    Returns:
+        Coroutine function that runs `func` under langsmith.traceable when sampled
+    """
+    traced = None
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        nonlocal traced
+        if not is_sampled():
+            return await func(*args, **kwargs)
+        if traced is None:
+            from langsmith import traceable as langsmith_traceable
+            traced = langsmith_traceable(client=_get_client())(func)
+        _buffer.call_started()
+        try:
+            return await traced(*args, **kwargs)
+        finally:
+            _buffer.call_finished()
+
+    return wrapper  # type: ignore[return-value]
+
+
+@contextlib.contextmanager
+def langchain_tracing() -> Iterator[None]:
+    """
+    Apply the request's sampling decision to LangChain calls made in the block
+
+    LangChain runnables (e.g. prompt templates) trace themselves whenever
+    LANGSMITH_TRACING is set. Within this block they are only traced for
+    sampled requests, and then through the buffered client.
+    """
+    if not tracing_enabled():
+        yield
+        return
+    from langsmith.run_helpers import tracing_context
+
+    sampled = is_sampled()
+    with tracing_context(enabled=sampled, client=_get_client() if sampled else None):
+        yield
+
+
+def wrap_openai(client: Any) -> Any:
+    """
+    Wrap an OpenAI client for LangSmith tracing, importing the wrapper lazily
+
+    Completions of requests that are not sampled go straight to the unwrapped
+    method. With tracing switched off the client is returned as is.
+    """
+    if not tracing_enabled():
+        return client
+    from langsmith.wrappers import wrap_openai as langsmith_wrap_openai
+
+    completions = client.chat.completions
+    untraced_create = completions.create
+    langsmith_wrap_openai(client, tracing_extra={"client": _get_client()})
+    traced_create = completions.create
+
+    if inspect.iscoroutinefunction(untraced_create):
+        async def create(*args, **kwargs):
+            method = traced_create if is_sampled() else untraced_create
+            return await method(*args, **kwargs)
+    else:
+        def create(*args, **kwargs):
+            method = traced_create if is_sampled() else untraced_create
+            return method(*args, **kwargs)
+
+    completions.create = create
+    return client
+
+
+# Set by the Lambda handler once it has produced its response
+invocation_done = threading.Event()
+
+
+def start_lambda_extension() -> None:
+    """
+    Register an internal Lambda extension that flushes traces after each invocation
+
+    Lambda keeps the execution environment running until every extension
+    has asked for its next event, so the flush happens after the response is
+    returned instead of delaying it. Must be called during the init phase,
+    i.e. at import of the handler module. Does nothing outside Lambda or with
+    tracing switched off.
+    """
+    runtime_api = os.environ.get("AWS_LAMBDA_RUNTIME_API")
+    if not runtime_api or not tracing_enabled():
+        return
+
+    import urllib.request
+
+    base_url = f"http://{runtime_api}/2020-01-01/extension"
+    try:
+        register = urllib.request.Request(
+            f"{base_url}/register",
+            data=b'{"events": ["INVOKE"]}',
+            headers={"Lambda-Extension-Name": "trace-flush"},
+            method="POST",
+        )
+        with urllib.request.urlopen(register, timeout=2) as response:
+            extension_id = response.headers["Lambda-Extension-Identifier"]
+    except Exception as e:
+        print(f"Could not register the trace flush extension: {str(e)}")
+        return
+
+    threading.Thread(
+        target=_run_lambda_extension, args=(base_url, extension_id), name="trace-flush", daemon=True
+    ).start()
+
+
+def _run_lambda_extension(base_url: str, extension_id: str) -> None:
+    import urllib.request
+
+    while True:
+        next_event = urllib.request.Request(
+            f"{base_url}/event/next",
+            headers={"Lambda-Extension-Identifier": extension_id},
+        )
+        # Blocks until the next invocation starts
+        with urllib.request.urlopen(next_event) as response:
+            response.read()
+        invocation_done.wait()
+        invocation_done.clear()
+        flush()
@@ -0,0 +1,311 @@
+# tests/test_admission.py
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+from src.api.routes import _cancel_on_disconnect
+from src.main import create_app
+from src.services.admission import (
+    BATCH, INTERACTIVE, AdaptiveLimiter, AdmissionController, FairQueue, OverloadedError, QuotaExceededError,
+    admission_controller, current_deadline, current_priority, current_tenant,
+)
+
+
+def test_quota_rejects_after_burst():
+    controller = AdmissionController(max_concurrency=1, rate_per_second=1.0, burst=2)
+
+    controller.check_quota("tenant-a")
+    controller.check_quota("tenant-a")
+    with pytest.raises(QuotaExceededError) as exc_info:
+        controller.check_quota("tenant-a")
+
+    assert 0 < exc_info.value.retry_after <= 1.0
+    # Buckets are per tenant
+    controller.check_quota("tenant-b")
+
+
+def test_tenant_quota_overrides():
+    controller = AdmissionController(
+        max_concurrency=1, rate_per_second=1.0, burst=1,
+        tenant_quotas={"big": {"burst": 3, "weight": 2.0}},
+    )
+
+    for _ in range(3):
+        controller.check_quota("big")
+    assert controller.weight("big", BATCH) == 2.0
+    assert controller.weight("other", INTERACTIVE) == controller.interactive_weight
+
+
+def test_quota_buckets_are_bounded():
+    controller = AdmissionController(max_concurrency=1, rate_per_second=1.0, burst=1, max_buckets=2)
+
+    controller.check_quota("tenant-a")
+    controller.check_quota("tenant-b")
+    with pytest.raises(QuotaExceededError):
+        controller.check_quota("tenant-a")
+    controller.check_quota("tenant-c")
+
+    # tenant-b was the least recently used and is dropped
+    assert list(controller._buckets) == ["tenant-a", "tenant-c"]
+
+
+@pytest.mark.asyncio
+async def test_fair_queue_interleaves_flows_by_weight():
+    """A backlogged campaign does not delay a later interactive request behind all of its items"""
+    queue = FairQueue(capacity=1)
+    order = []
+    await queue.acquire("holder", 1.0)
+
+    async def waiter(flow, weight, priority):
+        await queue.acquire(flow, weight, priority)
+        order.append(flow)
+        queue.release()
+
+    tasks = [asyncio.create_task(waiter("campaign", 1.0, BATCH)) for _ in range(5)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(waiter("preview", 8.0, INTERACTIVE)))
+    await asyncio.sleep(0)
+    assert queue.depth(BATCH) == 5
+    assert queue.depth(INTERACTIVE) == 1
+
+    queue.release()
+    await asyncio.gather(*tasks)
+
+    assert order.index("preview") == 0
+    assert queue.in_flight == 0
+    assert queue.depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue():
+    queue = FairQueue(capacity=1)
+    await queue.acquire("holder", 1.0)
+
+    waiter = asyncio.create_task(queue.acquire("tenant", 1.0))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert queue.depth() == 0
+
+    queue.release()
+    assert queue.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_fair_queue_resize_admits_waiters():
+    queue = FairQueue(capacity=1)
+    await queue.acquire("holder", 1.0)
+    waiter = asyncio.create_task(queue.acquire("tenant", 1.0))
+    await asyncio.sleep(0)
+    assert queue.depth() == 1
+
+    queue.resize(2)
+    await waiter
+    assert queue.in_flight == 2
+    assert queue.depth() == 0
+
+
+def test_adaptive_limiter_aimd():
+    limiter = AdaptiveLimiter(min_limit=2, max_limit=10)
+
+    # Throttling halves the limit, once per round trip however many calls report it
+    limiter.on_throttle(latency=5.0)
+    limiter.on_throttle(latency=5.0)
+    assert limiter.limit == 5.0
+
+    # Calls near the baseline grow it by about one per round trip, only while saturated
+    limiter.on_success(0.1, saturated=False)
+    assert limiter.limit == 5.0
+    for _ in range(5):
+        limiter.on_success(0.1, saturated=True)
+    assert 5.9 < limiter.limit < 6.1
+
+    # A call far above the baseline cuts it, down to the floor at most
+    limiter._decreased_at = float("-inf")
+    limiter.on_success(0.5, saturated=True)
+    assert limiter.limit == pytest.approx(6.0 * limiter.backoff, abs=0.1)
+    for _ in range(10):
+        limiter._decreased_at = float("-inf")
+        limiter.on_throttle(latency=0.1)
+    assert limiter.limit == 2.0
+
+
+@pytest.mark.asyncio
+async def test_llm_slot_shrinks_pool_on_throttling():
+    class RateLimitError(Exception):
+        status_code = 429
+
+    controller = AdmissionController(
+        max_concurrency=8, rate_per_second=1.0, burst=1, limiter=AdaptiveLimiter(min_limit=1, max_limit=8),
+    )
+    with pytest.raises(RateLimitError):
+        async with controller.llm_slot():
+            raise RateLimitError()
+
+    assert controller.queue.capacity == 4
+    assert controller.queue.in_flight == 0
+    # Throttled calls do not count towards the typical call duration
+    assert controller.service_time is None
+
+    async with controller.llm_slot():
+        pass
+    assert controller.queue.capacity == 4
+
+
+@pytest.mark.asyncio
+async def test_llm_slot_ignores_failed_and_cancelled_calls():
+    """Test that a fast error or a cancelled call does not pull down the latency baseline"""
+    class BadRequestError(Exception):
+        status_code = 400
+
+    controller = AdmissionController(
+        max_concurrency=8, rate_per_second=1.0, burst=1, limiter=AdaptiveLimiter(min_limit=1, max_limit=8),
+    )
+    async with controller.llm_slot():
+        await asyncio.sleep(0.05)
+    baseline = controller.limiter.baseline
+    service_time = controller.service_time
+
+    with pytest.raises(BadRequestError):
+        async with controller.llm_slot():
+            raise BadRequestError()
+
+    async def cancelled_call():
+        async with controller.llm_slot():
+            await asyncio.sleep(10)
+
+    task = asyncio.ensure_future(cancelled_call())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert controller.limiter.baseline == baseline
+    assert controller.service_time == service_time
+    assert controller.queue.in_flight == 0
+
+    # A normal call after them is not mistaken for congestion
+    async with controller.llm_slot():
+        await asyncio.sleep(0.05)
+    assert controller.queue.capacity == 8
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+    with TestClient(app) as client:
+        yield client
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_generate_email_quota_returns_429(mock_generate_email, client):
+    mock_generate_email.return_value = {
+        "theme_used": "trigger_event",
+        "anchor_signal": "Series B",
+        "subject_line": "Hello",
+        "email_body": "Hi",
+    }
+    payload = {
+        "prospect": {"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"},
+        "company": {"company_name": "TechNova"},
+    }
+    headers = {"x-api-key": "test-quota-key"}
+
+    with patch.dict(admission_controller.tenant_quotas, {"test-quota-key": {"rate": 0.001, "burst": 1}}):
+        assert client.post("/api/v1/generate-email", json=payload, headers=headers).status_code == 200
+        response = client.post("/api/v1/generate-email", json=payload, headers=headers)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_metrics_exports_queue_gauges(client):
+    response = client.get("/api/v1/metrics")
+
+    assert response.status_code == 200
+    assert 'llm_queue_depth{priority="batch"}' in response.text
+    assert "llm_in_flight" in response.text
+
+
+@pytest.mark.asyncio
+async def test_llm_slot_uses_context_priority():
+    current_tenant.set("tenant-a")
+    current_priority.set(BATCH)
+    async with admission_controller.llm_slot():
+        assert admission_controller.queue.in_flight == 1
+    assert admission_controller.queue.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_llm_slot_sheds_when_queue_outlasts_deadline():
+    controller = AdmissionController(max_concurrency=1, rate_per_second=1.0, burst=1)
+    controller.service_time = 0.05
+    current_deadline.set(time.monotonic() + 0.1)
+
+    async with controller.llm_slot():
+        # One call in flight and one queued: the estimate exceeds what is left
+        waiter = asyncio.create_task(controller.queue.acquire("other", 1.0))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError) as exc_info:
+            async with controller.llm_slot():
+                pass
+        assert exc_info.value.retry_after >= 1.0
+    await waiter
+    controller.queue.release()
+
+
+@pytest.mark.asyncio
+async def test_llm_slot_gives_up_waiting_at_deadline():
+    controller = AdmissionController(max_concurrency=1, rate_per_second=1.0, burst=1)
+    await controller.queue.acquire("holder", 1.0)
+    current_deadline.set(time.monotonic() + 0.05)
+
+    with pytest.raises(OverloadedError):
+        async with controller.llm_slot():
+            pass
+    assert controller.queue.depth() == 0
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_generate_email_sheds_with_503(mock_generate_email, client):
+    payload = {
+        "prospect": {"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"},
+        "company": {"company_name": "TechNova"},
+    }
+
+    with patch.object(admission_controller, "service_time", 10.0):
+        response = client.post("/api/v1/generate-email", json=payload, headers={"X-Request-Timeout": "5"})
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    mock_generate_email.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_operation():
+    cancelled = asyncio.Event()
+
+    async def slow_operation():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def receive():
+        await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    http_request = MagicMock()
+    http_request.receive = receive
+
+    with pytest.raises(HTTPException) as exc_info:
+        await _cancel_on_disconnect(http_request, slow_operation())
+
+    assert exc_info.value.status_code == 499
+    await asyncio.sleep(0)
+    assert cancelled.is_set()
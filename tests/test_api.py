@@ -1,10 +1,12 @@
 # tests/test_api.py
 import json
+import time
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch, MagicMock
 
 from src.main import create_app
+from src.services.health_prober import HealthProber
 from src.config import settings
 
 
@@ -23,36 +25,81 @@ def test_health_check(client):
     assert response.json()["version"] == settings.API_VERSION
 
 
+def fresh_health_prober():
+    """A health prober without state from earlier tests, probing only the (mocked) OpenAI client"""
+    from src.api import routes
+    # routes.health_probes also holds a live LangSmith probe when LANGSMITH_API_KEY is set
+    return HealthProber({"openai": routes.health_probes["openai"]}, interval=30, timeout=1, failure_threshold=2)
+
+
 @patch("src.api.routes.email_generator")
 def test_deep_health_check_success(mock_email_generator, client):
     """Test the deep health check endpoint with successful OpenAI connection"""
     # Setup mock
-    mock_email_generator.client.models.list.return_value = MagicMock()
+    mock_email_generator.client.with_options.return_value.models.list.return_value = MagicMock()
 
-    # Make request
-    response = client.get("/api/v1/health/deep")
+    # Make requests; the second is answered from the background probe's state
+    with patch("src.api.routes.health_prober", fresh_health_prober()):
+        response = client.get("/api/v1/health/deep")
+        second = client.get("/api/v1/health/deep")
 
     # Assert response
     assert response.status_code == 200
     assert response.json()["status"] == "healthy"
     assert response.json()["version"] == settings.API_VERSION
+    openai = second.json()["dependencies"]["openai"]
+    assert openai["status"] == "ok"
+    assert openai["last_latency_ms"] is not None
 
-    # Verify OpenAI client was called
-    mock_email_generator.client.models.list.assert_called_once_with(limit=1)
+    # Verify OpenAI was probed once, not per health check
+    mock_email_generator.client.with_options.return_value.models.list.assert_called_once_with()
+    mock_email_generator.client.with_options.assert_called_with(
+        timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS, max_retries=0
+    )
 
 
 @patch("src.api.routes.email_generator")
 def test_deep_health_check_failure(mock_email_generator, client):
     """Test the deep health check endpoint with failed OpenAI connection"""
     # Setup mock to raise an exception
-    mock_email_generator.client.models.list.side_effect = Exception("OpenAI connection failed")
+    mock_email_generator.client.with_options.return_value.models.list.side_effect = Exception(
+        "OpenAI connection failed"
+    )
 
     # Make request
-    response = client.get("/api/v1/health/deep")
+    with patch("src.api.routes.health_prober", fresh_health_prober()):
+        response = client.get("/api/v1/health/deep")
 
     # Assert response
     assert response.status_code == 503
     assert "Service unavailable" in response.json()["detail"]
+    assert response.json()["dependencies"]["openai"]["last_error"] == "OpenAI connection failed"
+
+
+def test_openai_probe_lists_models_once(monkeypatch):
+    """Test the real OpenAI probe against a stubbed transport: one request, no retries"""
+    import asyncio
+    import httpx
+    from openai import OpenAI
+    from src.api import routes
+
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        status = 200 if len(requests) == 1 else 500
+        return httpx.Response(status, json={"object": "list", "data": []})
+
+    client = OpenAI(api_key="x", http_client=httpx.Client(transport=httpx.MockTransport(handle)))
+    monkeypatch.setattr(routes.email_generator, "client", client)
+
+    asyncio.run(routes._probe_openai())
+    assert requests[0].url.path == "/v1/models"
+
+    with pytest.raises(Exception):
+        asyncio.run(routes._probe_openai())
+    # A failing probe is not retried by the SDK
+    assert len(requests) == 2
 
 
 @patch("src.services.email_generator.EmailGenerator.generate_email")
@@ -99,14 +146,14 @@ def test_generate_email_success(mock_generate_email, client):
 
     # Assert response
     assert response.status_code == 200
-    assert response.json() == mock_response
+    assert response.json() == {**mock_response, "synthesized": False}
 
     # Verify the email generator was called with the correct data
     mock_generate_email.assert_called_once()
     # Convert the arg to dict for comparison
     call_arg = mock_generate_email.call_args[0][0]
-    assert call_arg["prospect"]["first_name"] == "Sarah"
-    assert call_arg["company"]["company_name"] == "TechNova Solutions"
+    assert call_arg.prospect.first_name == "Sarah"
+    assert call_arg.company.name == "TechNova Solutions"
 
 
 @patch("src.services.email_generator.EmailGenerator.generate_email")
@@ -132,4 +179,282 @@ def test_generate_email_error(mock_generate_email, client):
 
     # Assert response
     assert response.status_code == 500
-    assert "Email generation failed" in response.json()["detail"]
\ No newline at end of file
+    assert "Email generation failed" in response.json()["detail"]
+
+
+@patch("src.api.routes.company_info_service._search_company")
+def test_company_descriptions_batch(mock_search_company, client):
+    """Test the batch endpoint dedupes domains and reports failures per domain"""
+    from src.api import routes
+    routes.company_info_service._cache.clear()
+    routes.company_info_service._store("cached.io", {"company_name": "Cached", "description": "From cache"})
+
+    async def search_company(company_url):
+        if "broken" in company_url:
+            raise Exception("search failed")
+        return {"company_name": "Acme", "description": "Widgets"}
+    mock_search_company.side_effect = search_company
+
+    response = client.post("/api/v1/company-descriptions:batch", json={
+        "company_urls": ["https://acme.com", "www.acme.com/about", "cached.io", "broken.io"]
+    })
+
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    by_domain = {result["domain"]: result for result in results}
+    assert len(results) == 3
+    # Cached domains are streamed before any lookup completes
+    assert results[0]["domain"] == "cached.io" and results[0]["cached"] is True
+    assert by_domain["acme.com"]["status"] == "ok"
+    assert by_domain["acme.com"]["company_urls"] == ["https://acme.com", "www.acme.com/about"]
+    assert by_domain["broken.io"]["status"] == "error"
+    assert by_domain["broken.io"]["error"] == "search failed"
+    assert mock_search_company.call_count == 2
+
+
+@patch("src.api.routes.company_info_service._search_company")
+def test_company_descriptions_batch_outlasts_request_deadline(mock_search_company, client, monkeypatch):
+    """Test that lookups starting after REQUEST_DEADLINE_SECONDS are not shed from a streamed batch"""
+    import asyncio
+    from src.api import routes
+    from src.services.admission import admission_controller
+    routes.company_info_service._cache.clear()
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_SECONDS", 0.1)
+    monkeypatch.setattr(settings, "COMPANY_BATCH_CONCURRENCY", 1)
+
+    async def search_company(company_url):
+        async with admission_controller.llm_slot():
+            await asyncio.sleep(0.05)
+        return {"company_name": "Acme", "description": "Widgets"}
+    mock_search_company.side_effect = search_company
+
+    response = client.post("/api/v1/company-descriptions:batch", json={
+        "company_urls": [f"https://company{index}.com" for index in range(6)]
+    })
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["status"] for result in results] == ["ok"] * 6
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_generate_email_idempotency_key_replays(mock_generate_email, client):
+    """Test that a retried request with the same Idempotency-Key is not regenerated"""
+    mock_generate_email.return_value = {
+        "theme_used": "growth",
+        "anchor_signal": "hiring burst",
+        "subject_line": "Scaling the sales team",
+        "email_body": "Hi John,"
+    }
+    test_data = {
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Idempotent Co"}
+    }
+    headers = {"Idempotency-Key": "retry-test-1"}
+
+    first = client.post("/api/v1/generate-email", json=test_data, headers=headers)
+    second = client.post("/api/v1/generate-email", json=test_data, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+    mock_generate_email.assert_called_once()
+
+    # Reusing the key for a different request is rejected
+    test_data["prospect"]["first_name"] = "Jane"
+    conflict = client.post("/api/v1/generate-email", json=test_data, headers=headers)
+    assert conflict.status_code == 422
+
+
+@patch("src.api.routes.email_generator.generate_email", new_callable=AsyncMock)
+def test_idempotency_keys_are_scoped_per_api_key(mock_generate_email, client):
+    """Test that two API keys sending the same Idempotency-Key neither share results nor conflict"""
+    async def generate_email(request):
+        return {"theme_used": "growth", "anchor_signal": "a", "subject_line": "s",
+                "email_body": f"Hi {request.prospect.first_name}, call {mock_generate_email.call_count}"}
+    mock_generate_email.side_effect = generate_email
+    test_data = {
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Tenant Co"}
+    }
+
+    first = client.post("/api/v1/generate-email", json=test_data,
+                        headers={"Idempotency-Key": "shared-key", "X-API-Key": "tenant-a"})
+    other_tenant = client.post("/api/v1/generate-email", json=test_data,
+                               headers={"Idempotency-Key": "shared-key", "X-API-Key": "tenant-b"})
+    test_data["prospect"]["first_name"] = "Jane"
+    other_body = client.post("/api/v1/generate-email", json=test_data,
+                             headers={"Idempotency-Key": "shared-key", "X-API-Key": "tenant-c"})
+
+    assert "Idempotent-Replayed" not in other_tenant.headers
+    assert other_tenant.json()["email_body"] != first.json()["email_body"]
+    assert other_body.status_code == 200
+    assert mock_generate_email.call_count == 3
+
+
+def test_register_campaign_and_unknown_campaign(client):
+    """Test that campaign IDs are stable and unknown campaigns return 404"""
+    campaign = {"cta": {"ask": "15-min chat?"}, "sender_name": "John Doe"}
+
+    first = client.post("/api/v1/campaigns", json=campaign)
+    second = client.post("/api/v1/campaigns", json=campaign)
+
+    assert first.status_code == 200
+    assert first.json()["campaign_id"] == second.json()["campaign_id"]
+
+    response = client.post("/api/v1/generate-email", json={
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Campaign Co"},
+        "campaign_id": "cmp_unknown",
+    })
+    assert response.status_code == 404
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_thread_steps_append_emails(mock_generate_email, client):
+    """Test that thread steps carry only new signals and build on the thread's emails"""
+    mock_generate_email.return_value = {
+        "theme_used": "growth",
+        "anchor_signal": "hiring burst",
+        "subject_line": "Scaling the sales team",
+        "email_body": "Hi John,\n\nSaw the hiring burst."
+    }
+    created = client.post("/api/v1/threads", json={
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Thread Co"},
+        "cta": {"ask": "15-min chat?"},
+    })
+    assert created.status_code == 200
+    thread_id = created.json()["thread_id"]
+    assert created.json()["emails"] == []
+
+    first = client.post(f"/api/v1/threads/{thread_id}/emails", json={})
+    second = client.post(f"/api/v1/threads/{thread_id}/emails", json={
+        "company": {"recent_news": "Opened a Berlin office"}
+    })
+
+    assert first.status_code == 200
+    assert first.json()["step_number"] == 1
+    assert second.json()["step_number"] == 2
+    first_request = mock_generate_email.call_args_list[0][0][0]
+    second_request = mock_generate_email.call_args_list[1][0][0]
+    assert first_request.cta.ask == "15-min chat?"
+    assert first_request.metadata.email_history is None
+    assert second_request.company.name == "Thread Co"
+    assert second_request.company.recent_news == "Opened a Berlin office"
+    assert "Subject: Scaling the sales team" in second_request.metadata.email_history
+
+    thread = client.get(f"/api/v1/threads/{thread_id}").json()
+    assert [email["step_number"] for email in thread["emails"]] == [1, 2]
+
+    assert client.get("/api/v1/threads/thr_unknown").status_code == 404
+    assert client.post("/api/v1/threads/thr_unknown/emails", json={}).status_code == 404
+
+
+@patch("src.api.routes.email_generator.generate_email", new_callable=AsyncMock)
+def test_thread_next_step_served_from_pregeneration(mock_generate_email, client):
+    """Test that with pre-generation on, the next step is generated in the background and served from there"""
+    mock_generate_email.return_value = {
+        "theme_used": "growth",
+        "anchor_signal": "hiring burst",
+        "subject_line": "Scaling the sales team",
+        "email_body": "Hi John,\n\nSaw the hiring burst."
+    }
+    thread_id = client.post("/api/v1/threads", json={
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Thread Co"},
+    }).json()["thread_id"]
+
+    with patch.object(settings, "THREAD_PREGENERATION", True):
+        first = client.post(f"/api/v1/threads/{thread_id}/emails", json={})
+        second = client.post(f"/api/v1/threads/{thread_id}/emails", json={})
+
+    assert first.json()["step_number"] == 1
+    assert second.json()["step_number"] == 2
+    # Step 2 was only generated once, in the background after step 1
+    steps = [call[0][0].metadata.step_number for call in mock_generate_email.call_args_list]
+    assert steps[:2] == [1, 2] and steps.count(2) == 1
+    thread = client.get(f"/api/v1/threads/{thread_id}").json()
+    assert [email["step_number"] for email in thread["emails"]] == [1, 2]
+
+
+def test_generate_email_synthesized_on_request(client):
+    """Test that a synthesize request is answered from templates and flagged"""
+    response = client.post("/api/v1/generate-email", json={
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Tech Co", "recent_news": "Raised a Series A"},
+        "synthesize": True,
+    })
+
+    assert response.status_code == 200
+    assert response.json()["synthesized"] is True
+    assert "Tech Co" in response.json()["subject_line"] + response.json()["email_body"]
+
+
+def test_generate_email_open_circuit_returns_error_email(client, monkeypatch):
+    """Test that requests made while the circuit is open keep getting the error email"""
+    from src.api import routes
+    monkeypatch.setattr(settings, "EMAIL_SYNTHESIS_FALLBACK", False)
+    monkeypatch.setattr(routes.email_generator.circuit_breaker, "allow", lambda: False)
+
+    response = client.post("/api/v1/generate-email", json={
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Tech Co"},
+    })
+
+    assert response.status_code == 200
+    assert response.json()["theme_used"] == "error"
+    assert "OpenAI is failing" in response.json()["email_body"]
+
+
+def test_debug_profile_hidden_unless_configured(client, monkeypatch):
+    """Test that the profiler answers 404 without a token configured and 403 for a wrong token"""
+    monkeypatch.setattr(settings, "DEBUG_PROFILE_TOKEN", None)
+    assert client.get("/api/v1/debug/profile?seconds=1", headers={"X-Debug-Token": "secret"}).status_code == 404
+
+    monkeypatch.setattr(settings, "DEBUG_PROFILE_TOKEN", "secret")
+    assert client.get("/api/v1/debug/profile?seconds=1", headers={"X-Debug-Token": "wrong"}).status_code == 403
+    response = client.get("/api/v1/debug/profile?seconds=600", headers={"X-Debug-Token": "secret"})
+    assert response.status_code == 422
+
+
+def test_debug_profile_returns_collapsed_stacks(client, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG_PROFILE_TOKEN", "secret")
+    response = client.get("/api/v1/debug/profile?seconds=0.2", headers={"X-Debug-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack.startswith("thread:") and int(count) > 0
+
+
+@patch("src.api.routes.email_generator.generate_email", new_callable=AsyncMock)
+def test_generate_email_profiled_on_request(mock_generate_email, client, monkeypatch):
+    """Test that an X-Profile header profiles the generation, kept under the X-Profile-Id header"""
+    def busy_generation(request):
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            pass
+        return {"theme_used": "growth", "anchor_signal": "growth", "subject_line": "Hi", "email_body": "Hi John"}
+
+    mock_generate_email.side_effect = busy_generation
+    monkeypatch.setattr(settings, "DEBUG_PROFILE_TOKEN", "secret")
+    request = {
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Tech Co"},
+    }
+
+    assert "X-Profile-Id" not in client.post("/api/v1/generate-email", json=request).headers
+    response = client.post("/api/v1/generate-email", json=request,
+                           headers={"X-Profile": "1", "X-Debug-Token": "secret"})
+    assert response.status_code == 200
+
+    profile = client.get(f"/api/v1/debug/profile/{response.headers['X-Profile-Id']}",
+                         headers={"X-Debug-Token": "secret"})
+    assert profile.status_code == 200
+    assert "busy_generation" in profile.text
+    assert client.get("/api/v1/debug/profile/unknown", headers={"X-Debug-Token": "secret"}).status_code == 404
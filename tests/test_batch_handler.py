@@ -0,0 +1,121 @@
+# tests/test_batch_handler.py
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+import lambda_handler
+
+EMAIL_REQUEST = {
+    "prospect": {"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"},
+    "company": {"name": "TechNova Solutions"}
+}
+
+
+def sqs_event(bodies):
+    """Build a synthetic SQS event with one record per message body"""
+    return {"Records": [
+        {"messageId": f"msg-{index}", "body": body, "eventSource": "aws:sqs"}
+        for index, body in enumerate(bodies)
+    ]}
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_batch_handler_reports_partial_failures(mock_generate_email):
+    """Test invalid records and failed generations are reported per record"""
+    async def generate_email(request):
+        if request.prospect.first_name == "Broken":
+            return {"theme_used": "error", "anchor_signal": "error",
+                    "subject_line": "Error in email generation", "email_body": "upstream timeout"}
+        return {"theme_used": "trigger_event", "anchor_signal": "Series B",
+                "subject_line": f"Hi {request.prospect.first_name}", "email_body": "Body"}
+    mock_generate_email.side_effect = generate_email
+
+    broken = {**EMAIL_REQUEST, "prospect": {**EMAIL_REQUEST["prospect"], "first_name": "Broken"}}
+    event = sqs_event([json.dumps(EMAIL_REQUEST), "{not json", json.dumps(broken)])
+
+    response = lambda_handler.batch_handler(event, None)
+
+    assert response["batchItemFailures"] == [{"itemIdentifier": "msg-1"}, {"itemIdentifier": "msg-2"}]
+    results = {result["id"]: result for result in response["results"]}
+    assert results["msg-0"]["status"] == "ok"
+    assert results["msg-0"]["email"]["subject_line"] == "Hi Sarah"
+    assert "Invalid email request" in results["msg-1"]["error"]
+    assert results["msg-2"]["error"] == "upstream timeout"
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_batch_handler_generates_direct_records_concurrently(mock_generate_email):
+    """Test a direct invocation runs its records concurrently in one invocation"""
+    in_flight = 0
+    max_in_flight = 0
+
+    async def generate_email(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"theme_used": "micro_win", "anchor_signal": "a", "subject_line": "s", "email_body": "b"}
+    mock_generate_email.side_effect = generate_email
+
+    response = lambda_handler.batch_handler({"records": [EMAIL_REQUEST] * 5}, None)
+
+    assert response["batchItemFailures"] == []
+    assert [result["id"] for result in response["results"]] == ["0", "1", "2", "3", "4"]
+    assert max_in_flight > 1
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_batch_results_are_delivered_to_the_result_queue(mock_generate_email):
+    """Test generated emails reach the result queue and undelivered records are retried"""
+    from src.api.routes import email_generator
+    from src.services.batch_processor import BatchProcessor, SqsResultSink
+
+    async def generate_email(request):
+        return {"theme_used": "micro_win", "anchor_signal": "a",
+                "subject_line": f"Hi {request.prospect.first_name}", "email_body": "b"}
+    mock_generate_email.side_effect = generate_email
+    client = MagicMock()
+    client.send_message_batch.side_effect = [
+        {"Successful": [{"Id": str(index)} for index in range(9)],
+         "Failed": [{"Id": "9", "Code": "InternalError", "Message": "try again"}]},
+        {"Successful": [{"Id": "0"}, {"Id": "1"}]},
+    ]
+    processor = BatchProcessor(email_generator, result_sink=SqsResultSink("https://sqs/results", client=client))
+
+    event = sqs_event([json.dumps(EMAIL_REQUEST)] * 12 + ["{not json"])
+    response = asyncio.run(processor.process_event(event))
+
+    calls = client.send_message_batch.call_args_list
+    assert [len(call.kwargs["Entries"]) for call in calls] == [10, 2]
+    assert calls[0].kwargs["QueueUrl"] == "https://sqs/results"
+    message = json.loads(calls[0].kwargs["Entries"][0]["MessageBody"])
+    assert message["id"] == "msg-0"
+    assert message["email"]["subject_line"] == "Hi Sarah"
+    assert message["request"]["prospect"]["first_name"] == "Sarah"
+    assert response["batchItemFailures"] == [{"itemIdentifier": "msg-9"}, {"itemIdentifier": "msg-12"}]
+    assert "try again" in response["results"][9]["error"]
+
+
+@patch("src.services.email_generator.EmailGenerator.generate_email")
+def test_batch_handler_leaves_records_unstarted_near_the_deadline(mock_generate_email):
+    """Test records not started before the invocation deadline are reported for retry"""
+    from src.services.admission import remaining_time
+    deadlines = []
+
+    async def generate_email(request):
+        deadlines.append(remaining_time())
+        await asyncio.sleep(0.2)
+        return {"theme_used": "micro_win", "anchor_signal": "a", "subject_line": "s", "email_body": "b"}
+    mock_generate_email.side_effect = generate_email
+    context = MagicMock()
+    context.get_remaining_time_in_millis.return_value = 5100
+
+    with patch.object(lambda_handler, "_batch_processor", None), \
+            patch("src.config.settings.BATCH_CONCURRENCY", 2):
+        response = lambda_handler.batch_handler({"records": [EMAIL_REQUEST] * 5}, context)
+
+    # Two records fill the pool and the deadline passes while they run
+    assert response["batchItemFailures"] == [{"itemIdentifier": "2"}, {"itemIdentifier": "3"}, {"itemIdentifier": "4"}]
+    assert response["results"][2]["error"] == "Not started before the invocation deadline"
+    assert len(deadlines) == 2 and all(0 < remaining <= 0.1 for remaining in deadlines)
@@ -0,0 +1,72 @@
+# tests/test_company_digest.py
+from unittest.mock import patch
+
+from src.api.models import CompanyData, EmailRequest
+from src.services.company_digest import CompanyDigester, company_key
+
+DESCRIPTION = (
+    "TechNova Solutions is a cloud-based project management company. "
+    "Founded in 2015, it serves more than 4,000 customers in 60 countries. "
+    "Its platform combines task management, resource planning and reporting. "
+    "TechNova raised a $40.5M Series B led by Accel. "
+)
+COMPANY = CompanyData(
+    name="TechNova Solutions",
+    url="https://www.technova.io/about",
+    industry="SaaS",
+    recent_news="TechNova raised a $40.5M Series B led by Accel.",
+    technography="Salesforce, HubSpot, Outreach, Gong, ZoomInfo, Slack, Jira, Snowflake",
+    description=DESCRIPTION * 3,
+)
+
+
+def test_company_key_prefers_the_domain():
+    assert company_key(COMPANY) == "technova.io"
+    assert company_key(CompanyData(name="  TechNova  Solutions ")) == "technova solutions"
+
+
+def test_digest_drops_repeated_sentences_and_fits_the_budget():
+    """Test that sentences given by a fresher field are dropped and the block stays under max_chars"""
+    variables = CompanyDigester(max_chars=300, ttl_seconds=60, max_entries=10).build(COMPANY)
+
+    assert sum(len(value) for value in variables.values()) <= 300
+    assert variables["company_recent_news"] == "TechNova raised a $40.5M Series B led by Accel."
+    assert "Series B" not in variables["company_description"]
+    assert variables["company_description"].startswith("TechNova Solutions is a cloud-based")
+    assert variables["company_description"].endswith("…")
+    assert variables["company_technography"].startswith("Salesforce, HubSpot")
+    assert variables["company_annual_revenue"] == ""
+
+
+def test_short_company_is_sent_as_is():
+    company = CompanyData(name="Acme", industry="Logistics", description="Freight  software.")
+    variables = CompanyDigester(max_chars=1200, ttl_seconds=60, max_entries=10).build(company)
+    assert variables["company_name"] == "Acme"
+    assert variables["company_description"] == "Freight software."
+
+
+def test_digest_is_built_once_per_company_version():
+    """Test that prospects at one company share its digest until the company data or TTL changes"""
+    digester = CompanyDigester(max_chars=600, ttl_seconds=60, max_entries=10)
+    with patch.object(digester, "build", wraps=digester.build) as build:
+        first = digester.digest(COMPANY)
+        assert digester.digest(COMPANY.model_copy()) is first
+        assert build.call_count == 1
+
+        digester.digest(COMPANY.model_copy(update={"recent_news": "TechNova opened a Berlin office."}))
+        assert build.call_count == 2
+
+        with patch("src.services.company_digest.time.monotonic", return_value=10 ** 9):
+            digester.digest(COMPANY)
+        assert build.call_count == 3
+
+
+def test_digest_replaces_company_variables_in_the_template_context():
+    request = EmailRequest(
+        prospect={"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"},
+        company=COMPANY,
+    )
+    digest = CompanyDigester(max_chars=300, ttl_seconds=60, max_entries=10).digest(request.company)
+    context = request.to_template_context(company_context=digest)
+    assert context["company_description"] == digest["company_description"]
+    assert context["prospect_first_name"] == "Sarah"
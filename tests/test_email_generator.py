@@ -0,0 +1,265 @@
+# tests/test_email_generator.py
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.api.models import CampaignRequest, CompanyData, EmailRequest
+from src.config import settings
+from src.services.campaign_store import CampaignNotFoundError, CampaignStore
+from src.services.company_index import name_alias, registrable_domain
+from src.services.company_info_service import CompanyInfoService, normalize_company_domain
+from src.services.email_generator import EmailGenerator
+
+
+PROSPECT = {"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"}
+
+
+def make_completion(content):
+    """Build a minimal chat completion object with the given message content"""
+    completion = MagicMock()
+    completion.choices = [MagicMock()]
+    completion.choices[0].message.content = content
+    return completion
+
+
+@pytest.fixture
+def generator():
+    company_info_service = CompanyInfoService()
+    generator = EmailGenerator(company_info_service)
+    generator.prompt_manager = MagicMock()
+    generator.prompt_manager.render_prompt.return_value = {
+        "system_prompt": "system",
+        "user_prompt": "user",
+    }
+    generator.async_client = MagicMock()
+    generator.async_client.chat.completions.create = AsyncMock(return_value=make_completion(json.dumps({
+        "theme_used": "trigger_event",
+        "anchor_signal": "Series B",
+        "subject_line": "Congrats on the round",
+        "email_body": "Hi Sarah,"
+    })))
+    return generator
+
+
+def test_company_accepts_bare_url():
+    """A plain string company is treated as the URL to enrich"""
+    request = EmailRequest(prospect=PROSPECT, company="https://www.technova.io/about")
+    assert request.company.url == "https://www.technova.io/about"
+    assert request.company.name is None
+
+
+def test_company_requires_name_or_url():
+    with pytest.raises(ValueError):
+        EmailRequest(prospect=PROSPECT, company={"industry": "SaaS"})
+
+
+def test_normalize_company_domain():
+    assert normalize_company_domain("https://www.Acme.com/login") == "acme.com"
+    assert normalize_company_domain("acme.com:8080") == "acme.com"
+    assert normalize_company_domain("app.acme.com") == "app.acme.com"
+
+
+@pytest.mark.asyncio
+async def test_lookup_company_is_cached():
+    service = CompanyInfoService()
+    service._search_company = AsyncMock(return_value={"company_name": "Acme", "description": "Widgets"})
+
+    first = await service.lookup_company("https://acme.com")
+    second = await service.lookup_company("www.acme.com/pricing")
+
+    assert first == second == {"company_name": "Acme", "description": "Widgets"}
+    service._search_company.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_generate_email_enriches_company_from_url(generator):
+    generator.company_info_service._search_company = AsyncMock(return_value={
+        "company_name": "TechNova Solutions",
+        "description": "Cloud-based project management software",
+        "industry": "SaaS",
+    })
+    request = EmailRequest(
+        prospect=PROSPECT,
+        company={"url": "technova.io", "industry": "Software"},
+    )
+
+    email_data = await generator.generate_email(request)
+
+    # The theme is chosen locally from the enriched company
+    assert email_data["theme_used"] == "peer_benchmark"
+    rendered_company = generator.prompt_manager.render_prompt.call_args[0][0].company
+    assert rendered_company.name == "TechNova Solutions"
+    assert rendered_company.description == "Cloud-based project management software"
+    # Fields supplied by the client win over the lookup
+    assert rendered_company.industry == "Software"
+
+
+def test_merge_enrichment_validates_lookup_values():
+    """Test that lookup values are validated into a new company, coercing or dropping employee counts"""
+    company = CompanyData(url="technova.io")
+    merged = EmailGenerator._merge_enrichment(company, {"company_name": "TechNova", "employee_count": "250-500"})
+    assert merged.name == "TechNova" and merged.employee_count == 250
+    assert company.name is None
+
+    merged = EmailGenerator._merge_enrichment(company, {"company_name": "TechNova", "employee_count": "about 300"})
+    assert merged.name == "TechNova" and merged.employee_count is None
+    assert EmailGenerator._merge_enrichment(company, {"employee_count": "10,000+"}).employee_count == 10000
+
+
+@pytest.mark.asyncio
+async def test_generate_email_leaves_request_unchanged(generator):
+    generator.company_info_service._search_company = AsyncMock(return_value={"company_name": "TechNova"})
+    request = EmailRequest(prospect=PROSPECT, company={"url": "technova.io"})
+
+    await generator.generate_email(request)
+
+    assert request.company.name is None
+    assert generator.prompt_manager.render_prompt.call_args[0][0].company.name == "TechNova"
+
+
+@pytest.mark.asyncio
+async def test_generate_email_continues_when_enrichment_fails(generator):
+    generator.company_info_service._search_company = AsyncMock(side_effect=Exception("search down"))
+    request = EmailRequest(prospect=PROSPECT, company={"url": "technova.io", "name": "TechNova"})
+
+    email_data = await generator.generate_email(request)
+
+    assert email_data["theme_used"] == "thought_leadership_give"
+    rendered_company = generator.prompt_manager.render_prompt.call_args[0][0].company
+    assert rendered_company.name == "TechNova"
+
+
+def test_template_context_fills_every_variable():
+    """The flat context covers every template variable, with empty strings for gaps"""
+    request = EmailRequest(
+        prospect={**PROSPECT, "tenure_months": 18},
+        company={"company_name": "TechNova Solutions", "employee_count": 250},
+        metadata={"step_number": 2, "email_history": "Step 1"},
+    )
+
+    context = request.to_template_context()
+
+    assert context["prospect_first_name"] == "Sarah"
+    assert context["prospect_tenure_months"] == "18"
+    assert context["prospect_department"] == ""
+    assert context["company_name"] == "TechNova Solutions"
+    assert context["company_employee_count"] == "250"
+    assert context["seller_product_name"] == "Ingren.ai"
+    assert context["seller_marquee_case_studies"] == ""
+    assert context["cta_ask"] == ""
+    assert context["sender_name"] == "Ingren AI"
+    assert context["email_tone"] == "professional"
+    assert context["step_number"] == "2"
+    assert context["theme"] == ""
+
+
+def test_registrable_domain_and_name_alias():
+    assert registrable_domain("app.acme.com") == "acme.com"
+    assert registrable_domain("shop.acme.co.uk") == "acme.co.uk"
+    assert registrable_domain("acme.io") == "acme.io"
+    # Private suffixes from the Public Suffix List
+    assert registrable_domain("acme.github.io") == "acme.github.io"
+    assert registrable_domain("shop.acme.myshopify.com") == "acme.myshopify.com"
+    assert registrable_domain("127.0.0.1") == "127.0.0.1"
+    assert name_alias("Acme, Inc.") == "acme"
+    assert name_alias("TechNova Solutions") == "technova"
+
+
+@pytest.mark.asyncio
+async def test_lookup_company_resolves_near_duplicate_domains(monkeypatch):
+    monkeypatch.setattr(settings, "COMPANY_ALIAS_MATCHING", True)
+    service = CompanyInfoService()
+    service._search_company = AsyncMock(return_value={"company_name": "Acme Inc", "description": "Widgets"})
+
+    first = await service.lookup_company("https://www.acme.com")
+    # Same registrable domain, then a sibling domain matching the company name
+    assert await service.lookup_company("app.acme.com/login") == first
+    assert await service.lookup_company("acme.io") == first
+    service._search_company.assert_awaited_once()
+
+    # A different company claiming the alias makes it ambiguous
+    service.index.add("acme-robotics.net", {"company_name": "Acme"})
+    assert service.index.resolve("acme.de") is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_company_keeps_companies_on_shared_hosts_apart():
+    """Test that sites on a private suffix, and sibling brand labels by default, are looked up separately"""
+    service = CompanyInfoService()
+    service._search_company = AsyncMock(side_effect=[
+        {"company_name": "Acme", "description": "Widgets"},
+        {"company_name": "Other", "description": "Gadgets"},
+        {"company_name": "Acme Robotics", "description": "Robots"},
+    ])
+
+    await service.lookup_company("acme.github.io")
+    assert (await service.lookup_company("other.github.io"))["company_name"] == "Other"
+    assert (await service.lookup_company("acme.io"))["company_name"] == "Acme Robotics"
+
+
+@pytest.mark.asyncio
+async def test_generate_email_uses_campaign_context(generator):
+    campaign_store = CampaignStore(ttl_seconds=60, max_entries=10)
+    campaign = campaign_store.register(CampaignRequest(
+        cta={"ask": "15-min chat?"},
+        sender_name="John Doe",
+    ))
+    generator.campaign_store = campaign_store
+    request = EmailRequest(
+        prospect=PROSPECT,
+        company={"name": "TechNova"},
+        campaign_id=campaign.campaign_id,
+        sender_name="Jane Roe",
+    )
+
+    await generator.generate_email(request)
+
+    shared_context = generator.prompt_manager.render_prompt.call_args.kwargs["shared_context"]
+    assert shared_context["cta_ask"] == "15-min chat?"
+    assert shared_context["seller_product_name"] == "Ingren.ai"
+    # Fields set on the email request override the campaign
+    assert shared_context["sender_name"] == "Jane Roe"
+    context = request.to_template_context(shared_context)
+    assert context["prospect_first_name"] == "Sarah"
+    assert context["cta_ask"] == "15-min chat?"
+
+
+@pytest.mark.asyncio
+async def test_generate_email_unknown_campaign_raises(generator):
+    generator.campaign_store = CampaignStore(ttl_seconds=60, max_entries=10)
+    request = EmailRequest(prospect=PROSPECT, company={"name": "TechNova"}, campaign_id="cmp_missing")
+
+    with pytest.raises(CampaignNotFoundError):
+        await generator.generate_email(request)
+
+
+@pytest.mark.asyncio
+async def test_followup_uses_history_digest(generator):
+    history = "\n\n---\n\n".join(
+        f"Subject: Idea {step}\n\nHi Sarah,\n\n{'Long paragraph about research time. ' * 20}\n\nOpen to a chat?"
+        for step in range(1, 5)
+    )
+    request = EmailRequest(
+        prospect=PROSPECT,
+        company={"name": "TechNova"},
+        metadata={"email_history": history, "step_number": 5},
+    )
+
+    await generator.generate_email(request)
+
+    email_history = generator.prompt_manager.render_prompt.call_args.kwargs["email_history"]
+    assert email_history.startswith("Digest of the 4 earlier emails")
+    assert len(email_history) < len(history) / 4
+
+
+@pytest.mark.asyncio
+async def test_prospects_at_one_company_share_its_digest(generator):
+    company = {"name": "TechNova", "description": "Project management software. " * 100}
+    for first_name in ("Sarah", "Tom"):
+        request = EmailRequest(prospect={**PROSPECT, "first_name": first_name}, company=company)
+        await generator.generate_email(request)
+
+    first, second = (call.kwargs["company_context"] for call in generator.prompt_manager.render_prompt.call_args_list)
+    assert first is second
+    assert len(first["company_description"]) < len(company["description"]) / 2
+    assert len(generator.company_digester) == 1
@@ -0,0 +1,87 @@
+# tests/test_email_quality.py
+import json
+import pytest
+from unittest.mock import AsyncMock
+
+from src.api.models import EmailRequest
+from src.services.email_quality import (
+    BODY_LENGTH, FIRST_NAME, MAX_SUBJECT_CHARS, POSTSCRIPT, RULE_VIOLATIONS, SIGNATURE, SUBJECT_LENGTH, WHITESPACE,
+    check_email,
+)
+from tests.test_email_generator import PROSPECT, generator, make_completion  # noqa: F401
+
+
+def test_safe_fixes_are_applied_locally():
+    report = check_email({
+        "theme_used": "trigger_event",
+        "subject_line": "Subject: Sarah, your Series B means your reps are buried in research",
+        "email_body": "Hi Sarah,\r\n\r\n\r\nCongrats on the  Series B.\n\n"
+                      "Does manual research slow your reps down, Sarah?\n\n"
+                      "Best regards, [Your Name]\n\nP.S. We also do X.",
+    }, "Sarah", "John Doe")
+
+    assert not report.needs_regeneration
+    assert set(report.fixed) == {WHITESPACE, POSTSCRIPT, SIGNATURE, FIRST_NAME, SUBJECT_LENGTH}
+    assert report.email["theme_used"] == "trigger_event"
+    assert len(report.email["subject_line"]) <= MAX_SUBJECT_CHARS
+    assert report.email["subject_line"] == "Sarah, your Series B means your reps are buried"
+    assert report.email["email_body"] == (
+        "Hi Sarah,\n\nCongrats on the Series B.\n\n"
+        "Does manual research slow your reps down?\n\n"
+        "Best regards,\nJohn Doe"
+    )
+
+
+def test_missing_signature_is_added_and_missing_name_regenerated():
+    """Test that the signature is added, while a body without the first name is left for regeneration"""
+    report = check_email({"subject_line": "Quick idea", "email_body": "Hi there,\n\nCongrats on the round."},
+                         "Sarah", "John Doe")
+
+    assert report.fixed == [SIGNATURE]
+    assert report.violations == [FIRST_NAME]
+    assert report.email["email_body"] == "Hi there,\n\nCongrats on the round.\n\nBest,\nJohn Doe"
+    assert "(Sarah) exactly once, not 0 times" in report.feedback()
+
+
+def test_compliant_email_is_unchanged():
+    email = {"subject_line": "Quick idea", "email_body": "Hi Sarah,\n\nCongrats on the round.\n\nThanks,\nJohn"}
+    report = check_email(email, "Sarah", "John Doe")
+
+    assert report.fixed == [] and report.violations == []
+    assert report.email == email
+
+
+def test_hard_violations_need_regeneration():
+    before = RULE_VIOLATIONS.value(rule=BODY_LENGTH, outcome="regenerate")
+    report = check_email({
+        "subject_line": "A subject line that goes on and on about everything your team might possibly need",
+        "email_body": "Hi Sarah,\n\n" + "word " * 130 + "\n\nSarah, reply? Sarah is great.\n\nBest,\nJohn Doe",
+    }, "Sarah", "John Doe")
+
+    assert report.violations == [FIRST_NAME, BODY_LENGTH, SUBJECT_LENGTH]
+    assert "120 words" in report.feedback()
+    assert RULE_VIOLATIONS.value(rule=BODY_LENGTH, outcome="regenerate") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_generate_email_regenerates_only_for_hard_violations(generator):  # noqa: F811
+    long_email = {"theme_used": "pain_first", "anchor_signal": "a", "subject_line": "Idea",
+                  "email_body": "Hi Sarah,\n\n" + "word " * 130}
+    short_email = {"theme_used": "pain_first", "anchor_signal": "a", "subject_line": "Idea",
+                   "email_body": "Hi Sarah,\n\nShort and sweet."}
+    generator.async_client.chat.completions.create = AsyncMock(side_effect=[
+        make_completion(json.dumps(long_email)), make_completion(json.dumps(short_email)),
+    ])
+    request = EmailRequest(prospect=PROSPECT, company={"name": "TechNova"}, sender_name="John Doe")
+
+    email = await generator.generate_email(request)
+
+    assert email["email_body"] == "Hi Sarah,\n\nShort and sweet.\n\nBest,\nJohn Doe"
+    calls = generator.async_client.chat.completions.create.await_args_list
+    assert len(calls) == 2
+    assert "120 words" in calls[1].kwargs["messages"][-1]["content"]
+
+    # Locally fixable emails cost no extra call
+    generator.async_client.chat.completions.create = AsyncMock(return_value=make_completion(json.dumps(short_email)))
+    await generator.generate_email(request)
+    generator.async_client.chat.completions.create.assert_awaited_once()
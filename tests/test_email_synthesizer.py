@@ -0,0 +1,156 @@
+# tests/test_email_synthesizer.py
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.api.models import EmailMetadata, EmailRequest
+from src.config import settings
+from src.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, is_outage
+from src.services.email_generator import EmailGenerator
+from src.services.email_synthesizer import EmailSynthesizer, seed_templates, templatize
+from src.services.theme_scorer import THEMES, ThemeChoice
+
+REQUEST = EmailRequest(
+    prospect={"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"},
+    company={"url": "https://www.technova.io", "recent_news": "Raised $20M Series B"},
+    cta={"ask": "Open to a 15-min chat Tuesday?"},
+    sender_name="Alex Kim",
+)
+
+
+@pytest.fixture(scope="module")
+def synthesizer():
+    return EmailSynthesizer.from_file(settings.EMAIL_TEMPLATES_PATH)
+
+
+def test_every_theme_has_templates_following_the_copy_rules(synthesizer):
+    """Test that the shipped templates cover every theme and fill into valid emails"""
+    assert set(THEMES) <= set(synthesizer.templates)
+    for theme in THEMES:
+        email = synthesizer.synthesize(REQUEST, ThemeChoice(theme, "Raised $20M Series B", 1.0), "requested")
+        assert email["synthesized"] is True
+        assert email["theme_used"] == theme
+        assert "{" not in email["subject_line"] + email["email_body"]
+        assert email["email_body"].count("Sarah") == 1
+        assert email["email_body"].endswith("Best,\nAlex Kim")
+
+
+def test_synthesized_email_fills_request_fields(synthesizer):
+    """Test that prospect, company, seller and CTA fields are filled in, naming the company from its domain"""
+    email = synthesizer.synthesize(REQUEST, ThemeChoice("trigger_event", "Raised $20M Series B", 5.0), "requested")
+    assert "Technova" in email["subject_line"] + email["email_body"]
+    assert "Raised $20M Series B" in email["email_body"]
+    assert "Ingren.ai" in email["email_body"]
+    assert "Open to a 15-min chat Tuesday?" in email["email_body"]
+
+
+def test_follow_up_steps_use_follow_up_templates(synthesizer):
+    request = REQUEST.model_copy(update={"metadata": EmailMetadata(step_number=2, email_history="Email 1")})
+    email = synthesizer.synthesize(request, ThemeChoice("trigger_event", "", 0.0), "requested")
+    assert email["subject_line"] == "Following up for Technova"
+
+
+def test_templates_are_validated():
+    with pytest.raises(ValueError):
+        EmailSynthesizer({"thought_leadership_give": [{"subject_line": "{unknown}", "email_body": "Hi"}]})
+    with pytest.raises(ValueError):
+        EmailSynthesizer({"pain_first": [{"subject_line": "Hi", "email_body": "Hi"}]})
+
+
+def test_templates_seeded_from_approved_emails():
+    """Test that an approved email becomes a template that reproduces it"""
+    approved = {
+        "theme_used": "trigger_event",
+        "anchor_signal": "Raised $20M Series B",
+        "subject_line": "Technova after the Series B",
+        "email_body": "Hi Sarah,\n\nCongrats: Raised $20M Series B. {Curly} stays literal.\n\n"
+                      "Open to a 15-min chat Tuesday?\n\nBest,\nAlex Kim",
+    }
+    template = templatize(REQUEST, approved)
+    assert template["email_body"].startswith("Hi {first_name},\n\nCongrats: {anchor}. {{Curly}}")
+    assert template["email_body"].endswith("{cta}\n\nBest,\n{sender}")
+
+    seeded = seed_templates([{"request": REQUEST.model_dump(), "email": approved}] * 2)
+    assert seeded == {"trigger_event": [template]}
+    synthesizer = EmailSynthesizer({**seeded, "thought_leadership_give": [template]})
+    email = synthesizer.synthesize(REQUEST, ThemeChoice("trigger_event", "Raised $20M Series B", 5.0), "requested")
+    assert email["email_body"] == approved["email_body"]
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test that the circuit opens after consecutive failures and closes after a successful trial"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() > 1
+
+    breaker._opened_at -= 60
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+@pytest.fixture
+def failing_generator(synthesizer):
+    generator = EmailGenerator(circuit_breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60))
+    generator.synthesizer = synthesizer
+    generator.prompt_manager = MagicMock()
+    generator.prompt_manager.render_prompt.return_value = {"system_prompt": "system", "user_prompt": "user"}
+    generator.async_client = MagicMock()
+    generator.async_client.chat.completions.create = AsyncMock(side_effect=ConnectionError("OpenAI is down"))
+    return generator
+
+
+def test_only_outages_count_as_circuit_failures():
+    """Test that request errors and timeouts of the request's own deadline do not open the circuit"""
+    import httpx
+    from openai import APIConnectionError, APITimeoutError, BadRequestError, InternalServerError
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    assert is_outage(APIConnectionError(request=request))
+    assert is_outage(InternalServerError("down", response=httpx.Response(502, request=request), body=None))
+    assert not is_outage(BadRequestError("bad", response=httpx.Response(400, request=request), body=None))
+    assert not is_outage(ValueError("bad JSON"))
+    assert is_outage(APITimeoutError(request=request))
+    assert not is_outage(APITimeoutError(request=request), deadline_bound=True)
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_answers_with_error_email_without_fallback(failing_generator, monkeypatch):
+    """Test that OpenAI is not called while the circuit is open, and the error email is kept"""
+    monkeypatch.setattr(settings, "EMAIL_SYNTHESIS_FALLBACK", False)
+    request = REQUEST.model_copy(update={"company": REQUEST.company.model_copy(update={"name": "TechNova"})})
+
+    assert (await failing_generator.generate_email(request))["theme_used"] == "error"
+    short_circuited = await failing_generator.generate_email(request)
+    assert short_circuited["theme_used"] == "error"
+    assert "OpenAI is failing" in short_circuited["email_body"]
+    assert failing_generator.async_client.chat.completions.create.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_answered_with_synthesized_emails(failing_generator, monkeypatch):
+    """Test that with the fallback on, failed and short-circuited requests get template emails"""
+    monkeypatch.setattr(settings, "EMAIL_SYNTHESIS_FALLBACK", True)
+    request = REQUEST.model_copy(update={"company": REQUEST.company.model_copy(update={"name": "TechNova"})})
+
+    failed = await failing_generator.generate_email(request)
+    short_circuited = await failing_generator.generate_email(request)
+
+    assert failed["synthesized"] and short_circuited["synthesized"]
+    assert short_circuited["theme_used"] == "trigger_event"
+    assert failing_generator.async_client.chat.completions.create.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_synthesize_request_skips_the_llm(failing_generator):
+    request = REQUEST.model_copy(update={"synthesize": True})
+    email = await failing_generator.generate_email(request)
+    assert email["synthesized"] is True
+    assert failing_generator.async_client.chat.completions.create.call_count == 0
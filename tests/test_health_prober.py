@@ -0,0 +1,56 @@
+# tests/test_health_prober.py
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from src.services.health_prober import FAILING, OK, HealthProber
+
+
+@pytest.mark.asyncio
+async def test_brief_failures_do_not_mark_a_dependency_failing():
+    """Test that a healthy dependency is only failing after consecutive failed probes"""
+    outcomes = iter([None, "blip", None, "down", "down"])
+
+    async def openai():
+        error = next(outcomes)
+        if error:
+            raise Exception(error)
+
+    async def langsmith():
+        raise Exception("unreachable")
+
+    prober = HealthProber({"openai": (openai, True), "langsmith": (langsmith, False)},
+                          interval=30, timeout=1, failure_threshold=2)
+    statuses = []
+    for _ in range(5):
+        await prober.probe_once()
+        statuses.append(prober.dependencies["openai"].status)
+
+    assert statuses == [OK, OK, OK, OK, FAILING]
+    assert not prober.healthy
+    report = prober.report()
+    assert report["openai"]["success_rate"] == 0.4
+    assert report["openai"]["last_error"] == "down"
+    # A failing optional dependency only degrades the service
+    assert report["langsmith"]["status"] == FAILING and not report["langsmith"]["critical"]
+
+
+@pytest.mark.asyncio
+async def test_stale_state_is_refreshed_in_the_background():
+    calls = []
+
+    async def openai():
+        calls.append(1)
+
+    prober = HealthProber({"openai": (openai, True)}, interval=30, timeout=1, failure_threshold=2)
+    await prober.ensure_running()
+    await prober.ensure_running()
+    assert len(calls) == 1
+
+    with patch("src.services.health_prober.time.monotonic", return_value=10 ** 9):
+        await prober.ensure_running()
+        await asyncio.sleep(0)
+        await prober._round
+    assert len(calls) == 2
+    prober.stop()
@@ -0,0 +1,57 @@
+# tests/test_history_digest.py
+from src.services.history_digest import DIGEST_LINES, HistoryDigester, digest_email, split_emails
+
+
+def make_email(step):
+    return (
+        f"Email {step}\n"
+        f"Subject: Idea {step} for TechNova\n\n"
+        "Hi Sarah,\n\n"
+        f"Congrats on the Series B, milestone {step}. Your reps likely spend 8 hours a week on research.\n\n"
+        "Worth a 15-min chat next Tuesday?\n\n"
+        "Best,\nJohn Doe"
+    )
+
+
+def make_history(steps):
+    return "\n\n---\n\n".join(make_email(step) for step in range(1, steps + 1))
+
+
+def test_split_emails_on_headers_subjects_and_separators():
+    assert len(split_emails(make_history(3))) == 3
+    assert split_emails("Subject: a\nFirst body.\nSubject: b\nSecond body?") == [
+        "Subject: a\nFirst body.", "Subject: b\nSecond body?",
+    ]
+    assert split_emails("Just one free-form note.") == ["Just one free-form note."]
+
+
+def test_digest_email_keeps_subject_opening_and_ask():
+    assert digest_email(make_email(2)) == (
+        'subject "Idea 2 for TechNova"; opened: Congrats on the Series B, milestone 2.; '
+        "asked: Worth a 15-min chat next Tuesday?"
+    )
+
+
+def test_short_history_is_verbatim():
+    digester = HistoryDigester(max_chars=1000, max_entries=100)
+    history = make_history(1)
+
+    assert digester.digest(history) == history
+    assert digester.digest(None) is None
+
+
+def test_digest_size_stays_bounded_and_extends_incrementally():
+    digester = HistoryDigester(max_chars=300, max_entries=100)
+    sizes = []
+    for steps in range(2, 8):
+        misses_before = DIGEST_LINES.value(cache="miss")
+        digest = digester.digest(make_history(steps))
+        sizes.append(len(digest))
+        # Only the newly appended email is digested
+        assert DIGEST_LINES.value(cache="miss") - misses_before == (2 if steps == 2 else 1)
+
+    assert max(sizes) <= 300 + 50
+    assert digest.startswith("Digest of the 7 earlier emails")
+    assert "- Email 7: " in digest
+    assert "- Email 1: " not in digest
+    assert len(digester) == 7
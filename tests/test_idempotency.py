@@ -0,0 +1,59 @@
+# tests/test_idempotency.py
+import asyncio
+import pytest
+
+from src.utils.idempotency import IdempotencyConflictError, IdempotencyStore
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_in_flight_result():
+    store = IdempotencyStore(ttl_seconds=60, max_entries=10)
+    calls = 0
+    release = asyncio.Event()
+
+    async def operation():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"subject_line": "Hello"}
+
+    first = asyncio.create_task(store.run("key", "payload", operation))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(store.run("key", "payload", operation))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == ({"subject_line": "Hello"}, False)
+    assert await second == ({"subject_line": "Hello"}, True)
+    assert calls == 1
+
+    # Completed results are replayed without running the operation again
+    assert await store.run("key", "payload", operation) == ({"subject_line": "Hello"}, True)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_operations_are_not_replayed():
+    store = IdempotencyStore(ttl_seconds=60, max_entries=10)
+
+    async def failing():
+        raise RuntimeError("upstream timeout")
+
+    async def succeeding():
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        await store.run("key", "payload", failing)
+    assert await store.run("key", "payload", succeeding) == ("ok", False)
+
+
+@pytest.mark.asyncio
+async def test_key_reuse_with_different_payload_conflicts():
+    store = IdempotencyStore(ttl_seconds=60, max_entries=10)
+
+    async def operation():
+        return "ok"
+
+    await store.run("key", "payload", operation)
+    with pytest.raises(IdempotencyConflictError):
+        await store.run("key", "other payload", operation)
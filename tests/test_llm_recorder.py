@@ -0,0 +1,80 @@
+# tests/test_llm_recorder.py
+import threading
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from openai.types.chat import ChatCompletion
+
+from src.utils.llm_recorder import LLMRecorder, ReplayMissError
+
+
+def make_completion(content):
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-test",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    })
+
+
+def make_client(*contents):
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=[make_completion(content) for content in contents])
+    return client
+
+
+REQUEST = {"model": "gpt-test", "messages": [{"role": "user", "content": "Write an email"}], "temperature": 0.7}
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay(tmp_path):
+    corpus_path = tmp_path / "corpus.jsonl"
+    recording = LLMRecorder("record", str(corpus_path)).wrap(make_client("first", "second"))
+
+    await recording.chat.completions.create(**REQUEST)
+    await recording.chat.completions.create(**REQUEST, timeout=5.0)
+
+    replay_client = make_client()
+    replaying = LLMRecorder("replay", str(corpus_path)).wrap(replay_client)
+    contents = [
+        (await replaying.chat.completions.create(**REQUEST)).choices[0].message.content
+        for _ in range(3)
+    ]
+
+    # The timeout is not part of the key, and repeats cycle through the recordings
+    assert contents == ["first", "second", "first"]
+    replay_client.chat.completions.create.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_record_writes_off_the_event_loop(tmp_path):
+    recorder = LLMRecorder("record", str(tmp_path / "corpus.jsonl"))
+    append = recorder._append
+    writer_threads = []
+
+    def tracking_append(entry):
+        writer_threads.append(threading.get_ident())
+        append(entry)
+
+    recorder._append = tracking_append
+    await recorder.wrap(make_client("first")).chat.completions.create(**REQUEST)
+
+    assert writer_threads and writer_threads[0] != threading.get_ident()
+    assert len((tmp_path / "corpus.jsonl").read_bytes().splitlines()) == 1
+
+
+@pytest.mark.asyncio
+async def test_replay_miss_raises(tmp_path):
+    replaying = LLMRecorder("replay", str(tmp_path / "missing.jsonl")).wrap(make_client())
+
+    with pytest.raises(ReplayMissError):
+        await replaying.chat.completions.create(**REQUEST)
+
+
+def test_off_mode_returns_client_unchanged():
+    client = make_client()
+    assert LLMRecorder("off").wrap(client) is client
+    with pytest.raises(ValueError):
+        LLMRecorder("playback")
@@ -0,0 +1,73 @@
+# tests/test_native_prompt.py
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langsmith.client import convert_prompt_to_openai_format
+
+from src.utils.langsmith_prompt_manager import LangsmithPromptManager
+from src.utils.native_prompt import compile_prompt
+
+VALUES = {
+    "prospect_first_name": "Sarah",
+    "prospect_tenure_months": 18,
+    "company_name": "Tech{Nova} Solutions",
+    "email_history": None,
+    "step_number": 2,
+}
+
+PROMPTS = [
+    ChatPromptTemplate.from_messages([("human", "Hi {prospect_first_name} at {company_name}")]),
+    ChatPromptTemplate.from_messages([
+        ("system", "Rules: use {{braces}} literally"),
+        ("human", "Step {step_number:>3}, tenure {prospect_tenure_months!r}, history:\n{email_history}"),
+        ("ai", "Noted."),
+    ]),
+    ChatPromptTemplate.from_messages([
+        SystemMessage(content="Fixed {not a variable}"),
+        ("human", "{prospect_first_name}{suffix}"),
+    ]).partial(suffix="!"),
+]
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_native_render_matches_langchain(prompt):
+    """Test that compiled prompts render exactly the messages LangChain sends to OpenAI"""
+    expected = convert_prompt_to_openai_format(prompt.invoke(VALUES))["messages"]
+    native = compile_prompt(prompt)
+
+    assert native is not None
+    assert native.render(VALUES) == expected
+
+
+def test_prompts_langchain_must_render_are_not_compiled():
+    """Test that mustache templates and message placeholders keep the LangChain path"""
+    mustache = ChatPromptTemplate.from_messages([("human", "Hi {{prospect_first_name}}")], template_format="mustache")
+    placeholder = ChatPromptTemplate.from_messages([("placeholder", "{history}"), ("human", "Hi")])
+
+    assert compile_prompt(mustache) is None
+    assert compile_prompt(placeholder) is None
+    assert compile_prompt("Write a personalized email") is None
+
+
+def test_render_falls_back_when_native_render_differs():
+    """Test that a template whose native render differs from LangChain keeps using LangChain"""
+    template = ChatPromptTemplate.from_messages([("human", "Hi {prospect_first_name}")])
+    LangsmithPromptManager._native_prompts.pop("test_prompt", None)
+
+    with patch("src.utils.native_prompt.NativePrompt.render", return_value=[{"role": "user", "content": "wrong"}]):
+        first = LangsmithPromptManager._render_user_prompt("test_prompt", template, VALUES)
+        second = LangsmithPromptManager._render_user_prompt("test_prompt", template, VALUES)
+
+    assert first == second == "Hi Sarah"
+    assert LangsmithPromptManager._native_prompts["test_prompt"] == (template, None)
+
+    # A newly pulled template is compiled and verified again
+    template = ChatPromptTemplate.from_messages([("human", "Hello {prospect_first_name}")])
+    assert LangsmithPromptManager._render_user_prompt("test_prompt", template, VALUES) == "Hello Sarah"
+    assert LangsmithPromptManager._native_prompts["test_prompt"][1].verified
+    assert LangsmithPromptManager._render_user_prompt("test_prompt", template, VALUES) == "Hello Sarah"
+
+    with pytest.raises(KeyError):
+        LangsmithPromptManager._render_user_prompt("test_prompt", template, {})
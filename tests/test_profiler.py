@@ -0,0 +1,73 @@
+# tests/test_profiler.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.profiler import MAX_REQUEST_PROFILES, SamplingProfiler
+
+
+def spin(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+def test_window_profile_samples_every_thread():
+    """Test that a profile counts the stacks of other threads, root first, and the sampler then stops"""
+    profiler = SamplingProfiler(interval=0.001)
+    worker = threading.Thread(target=spin, args=(0.2,), name="worker")
+    worker.start()
+    session = profiler.start()
+    time.sleep(0.1)
+    profiler.stop(session)
+    worker.join()
+
+    stacks = [line.rsplit(" ", 1)[0] for line in session.collapsed().splitlines()]
+    assert any(stack.startswith("thread:worker;") and stack.endswith("tests.test_profiler:spin")
+               for stack in stacks)
+    assert not any("sampling-profiler" in stack for stack in stacks)
+    time.sleep(0.05)
+    assert profiler._thread is None
+
+
+@pytest.mark.asyncio
+async def test_request_profile_only_counts_its_coroutine():
+    """Test that a request profile leaves out the event loop's other work and is kept under its ID"""
+    profiler = SamplingProfiler(interval=0.001)
+
+    async def profiled_work():
+        spin(0.05)
+        await asyncio.sleep(0.01)
+        spin(0.05)
+        return "email"
+
+    async def concurrent_work():
+        await asyncio.sleep(0.02)
+        spin(0.05)
+
+    profiled = profiler.profile_request(profiled_work)
+    other = asyncio.ensure_future(concurrent_work())
+    assert await profiled() == "email"
+    await other
+
+    profile = profiler.request_profile(profiled.profile_id).collapsed()
+    assert "profiled_work" in profile
+    assert "concurrent_work" not in profile
+
+
+@pytest.mark.asyncio
+async def test_request_profiles_are_bounded():
+    profiler = SamplingProfiler(interval=0.01)
+
+    async def request():
+        return None
+
+    ids = []
+    for _ in range(MAX_REQUEST_PROFILES + 1):
+        profiled = profiler.profile_request(request)
+        await profiled()
+        ids.append(profiled.profile_id)
+    assert profiler.request_profile(ids[0]) is None
+    assert profiler.request_profile(ids[-1]) is not None
@@ -0,0 +1,105 @@
+# tests/test_prompt_versions.py
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import create_app
+from src.utils.langsmith_prompt_manager import LangsmithPromptManager
+from src.utils.prompt_versions import (
+    PromptRouter, UnknownPromptVersionError, current_prompt_version, pinned_prompt_version,
+)
+
+DEFAULT_IDS = {"system": "email_system", "user": "email_user", "followup": "email_followup"}
+VERSIONS = {"v2": {"system": "email_system:v2"}}
+
+
+@pytest.fixture(autouse=True)
+def reset_prompt_version():
+    """Keep versions selected by these tests from leaking into later tests"""
+    token = current_prompt_version.set(None)
+    pinned_token = pinned_prompt_version.set(None)
+    yield
+    pinned_prompt_version.reset(pinned_token)
+    current_prompt_version.reset(token)
+
+
+def test_versions_fall_back_to_the_default_prompt_ids():
+    router = PromptRouter(VERSIONS, "v1", DEFAULT_IDS)
+
+    assert router.versions["v1"].system_prompt_id == "email_system"
+    assert router.versions["v2"].system_prompt_id == "email_system:v2"
+    assert router.versions["v2"].user_prompt_id == "email_user"
+    assert router.select().name == "v1"
+    assert router.select("v2").name == "v2"
+    assert router.current().name == "v2"
+    with pytest.raises(UnknownPromptVersionError):
+        router.select("v3")
+    with pytest.raises(ValueError):
+        PromptRouter(VERSIONS, "v1", DEFAULT_IDS, weights={"v3": 1})
+
+
+def test_weighted_split():
+    draws = iter([0.0, 0.5, 0.89, 0.9, 0.99])
+    router = PromptRouter(VERSIONS, "v1", DEFAULT_IDS, weights={"v1": 9, "v2": 1}, rng=lambda: next(draws))
+
+    assert [router.select().name for _ in range(5)] == ["v1", "v1", "v1", "v2", "v2"]
+    # A pinned version is not subject to the split
+    assert router.select("v1").name == "v1"
+
+
+def test_system_prompts_are_cached_per_prompt_id():
+    with patch.dict(LangsmithPromptManager._system_prompts, {"email_system": "one", "email_system:v2": "two"}):
+        assert LangsmithPromptManager.get_system_prompt("email_system") == "one"
+        assert LangsmithPromptManager.get_system_prompt("email_system:v2") == "two"
+
+
+def test_routes_select_prompt_version_by_path_and_header():
+    router = PromptRouter(VERSIONS, "v1", DEFAULT_IDS)
+    used = []
+
+    async def generate_email(self, request):
+        used.append(current_prompt_version.get().system_prompt_id)
+        return {"theme_used": "micro_win", "anchor_signal": "a", "subject_line": "s", "email_body": "b"}
+
+    body = {
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Versioned Co"},
+    }
+    with patch("src.main.prompt_router", router), patch("src.api.routes.prompt_router", router), \
+            patch("src.services.email_generator.EmailGenerator.generate_email", generate_email):
+        with TestClient(create_app()) as client:
+            default = client.post("/api/v1/generate-email", json=body)
+            by_path = client.post("/api/v2/generate-email", json=body)
+            by_header = client.post("/api/v1/generate-email", json=body, headers={"X-Prompt-Version": "v2"})
+            unknown = client.post("/api/v1/generate-email", json=body, headers={"X-Prompt-Version": "v3"})
+
+    assert default.headers["X-Prompt-Version"] == "v1"
+    assert by_path.headers["X-Prompt-Version"] == by_header.headers["X-Prompt-Version"] == "v2"
+    assert used == ["email_system", "email_system:v2", "email_system:v2"]
+    assert unknown.status_code == 400
+
+
+def test_idempotency_key_does_not_replay_across_prompt_versions():
+    """Test that a key reused for another pinned prompt version is a conflict, not the other version's email"""
+    router = PromptRouter(VERSIONS, "v1", DEFAULT_IDS)
+
+    async def generate_email(self, request):
+        version = current_prompt_version.get().name
+        return {"theme_used": "micro_win", "anchor_signal": "a", "subject_line": version, "email_body": "b"}
+
+    body = {
+        "prospect": {"first_name": "John", "last_name": "Doe", "job_title": "CTO"},
+        "company": {"name": "Versioned Co"},
+    }
+    headers = {"Idempotency-Key": "versioned-key"}
+    with patch("src.main.prompt_router", router), patch("src.api.routes.prompt_router", router), \
+            patch("src.services.email_generator.EmailGenerator.generate_email", generate_email):
+        with TestClient(create_app()) as client:
+            first = client.post("/api/v1/generate-email", json=body, headers=headers)
+            replayed = client.post("/api/v1/generate-email", json=body, headers=headers)
+            other_version = client.post("/api/v2/generate-email", json=body, headers=headers)
+
+    assert first.json()["subject_line"] == "v1"
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert other_version.status_code == 422
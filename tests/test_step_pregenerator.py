@@ -0,0 +1,115 @@
+# tests/test_step_pregenerator.py
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.api.models import ThreadRequest
+from src.services.admission import BATCH, current_priority
+from src.services.step_pregenerator import StepPregenerator
+from src.services.thread_store import MemoryThreadStore
+
+REQUEST = ThreadRequest(
+    prospect={"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"},
+    company={"company_name": "TechNova Solutions", "industry": "SaaS"},
+)
+EMAIL = {
+    "step_number": 1,
+    "theme_used": "growth",
+    "anchor_signal": "hiring burst",
+    "subject_line": "Scaling the sales team",
+    "email_body": "Hi Sarah,\n\nSaw the hiring burst.",
+}
+FOLLOW_UP = {
+    "theme_used": "growth",
+    "anchor_signal": "hiring burst",
+    "subject_line": "Re: Scaling the sales team",
+    "email_body": "Hi Sarah,\n\nFollowing up.",
+}
+
+
+def make_pregenerator(generate_email):
+    store = MemoryThreadStore(ttl_seconds=60, max_entries=10)
+    thread = store.create(REQUEST)
+    store.append_email(thread.thread_id, EMAIL)
+    email_generator = AsyncMock()
+    email_generator.generate_email.side_effect = generate_email
+    return StepPregenerator(store, email_generator, ttl_seconds=60, max_entries=10), store, thread.thread_id
+
+
+@pytest.mark.asyncio
+async def test_next_step_is_pregenerated_at_batch_priority():
+    """Test that the next step is generated with the follow-up metadata at batch priority and served once"""
+    priorities = []
+
+    async def generate_email(request):
+        priorities.append(current_priority.get())
+        return FOLLOW_UP
+
+    pregenerator, store, thread_id = make_pregenerator(generate_email)
+    await pregenerator.schedule(thread_id)
+
+    email_request = pregenerator.email_generator.generate_email.call_args[0][0]
+    assert email_request.metadata.step_number == 2
+    assert "Subject: Scaling the sales team" in email_request.metadata.email_history
+    assert priorities == [BATCH]
+    # The request's own priority is left alone
+    assert current_priority.get() != BATCH
+
+    thread = store.get(thread_id)
+    assert await pregenerator.take(thread, 2, None) == {"step_number": 2, **FOLLOW_UP, "synthesized": False}
+    assert await pregenerator.take(thread, 2, None) is None
+
+
+@pytest.mark.asyncio
+async def test_changed_context_discards_pregenerated_email():
+    """Test that new signals or another theme make the pre-generated email stale"""
+    pregenerator, store, thread_id = make_pregenerator(AsyncMock(return_value=FOLLOW_UP))
+    await pregenerator.schedule(thread_id)
+
+    thread = store.get(thread_id)
+    assert await pregenerator.take(thread, 2, "pain_first") is None
+
+    await pregenerator.schedule(thread_id)
+    store.update_request(thread_id, REQUEST.with_signals(company={"recent_news": "Opened a Berlin office"}))
+    assert await pregenerator.take(store.get(thread_id), 2, None) is None
+
+
+@pytest.mark.asyncio
+async def test_step_requested_during_pregeneration_waits_for_it():
+    """Test that a step requested while it is being pre-generated is not generated twice"""
+    release = asyncio.Event()
+
+    async def generate_email(request):
+        await release.wait()
+        return FOLLOW_UP
+
+    pregenerator, store, thread_id = make_pregenerator(generate_email)
+    assert pregenerator.schedule(thread_id) is not None
+    assert pregenerator.schedule(thread_id) is None
+
+    take = asyncio.ensure_future(pregenerator.take(store.get(thread_id), 2, None))
+    await asyncio.sleep(0)
+    assert not take.done()
+    release.set()
+
+    assert (await take)["subject_line"] == FOLLOW_UP["subject_line"]
+    assert pregenerator.email_generator.generate_email.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_no_pregeneration_while_llm_pool_is_busy():
+    """Test that speculative work is not queued when interactive calls would wait for a slot"""
+    pregenerator, store, thread_id = make_pregenerator(AsyncMock(return_value=FOLLOW_UP))
+    with patch("src.services.step_pregenerator.admission_controller.estimated_wait", return_value=1.5):
+        assert pregenerator.schedule(thread_id) is None
+    assert pregenerator.email_generator.generate_email.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_pregeneration_is_not_served():
+    """Test that an error email is not kept for the step"""
+    error = {"theme_used": "error", "anchor_signal": "error", "subject_line": "Error", "email_body": "boom"}
+    pregenerator, store, thread_id = make_pregenerator(AsyncMock(return_value=error))
+    await pregenerator.schedule(thread_id)
+    assert await pregenerator.take(store.get(thread_id), 2, None) is None
@@ -0,0 +1,98 @@
+# tests/test_theme_scorer.py
+import pytest
+
+from src.api.models import CompanyData, EmailRequest, ProspectData
+from src.services.theme_scorer import ThemeScorer
+from tests.test_email_generator import PROSPECT, generator  # noqa: F401
+
+SYSTEM_PROMPT = """You are a copywriter.
+
+## THEME CANDIDATES
+You know twelve outbound "themes" (choose ONE):
+- pain_first • trigger_event
+
+## THEME‑SELECTION LOGIC
+Pick the SINGLE theme whose anchor signal is freshest.
+
+## OUTPUT FORMAT
+{"theme_used": "<one of the 12 themes>"}
+"""
+
+
+@pytest.fixture
+def scorer():
+    return ThemeScorer()
+
+
+def test_fresh_news_wins_over_older_signals(scorer):
+    """Test that recent funding news picks trigger_event anchored on the news"""
+    choice = scorer.score(
+        ProspectData(**PROSPECT),
+        CompanyData(name="TechNova", industry="Fintech", technography="Salesforce, Outreach.io",
+                    recent_news="Raised a $20M Series B, led by Acme Ventures"),
+    )
+    assert choice.theme == "trigger_event"
+    assert choice.anchor_signal == "Raised a $20M Series B"
+
+
+def test_theme_choices(scorer):
+    """Test theme choices for single signals, requested themes and no signal at all"""
+    prospect = ProspectData(**PROSPECT)
+    achiever = ProspectData(**PROSPECT, notable_achievement="Exceeded Q1 targets by 27%")
+    new_hire = ProspectData(**PROSPECT, tenure_months=2)
+    records = [
+        (prospect, CompanyData(name="Acme", technography="Salesforce, Outreach.io")),
+        (achiever, CompanyData(name="Acme")),
+        (new_hire, CompanyData(name="Acme")),
+        (prospect, CompanyData(name="Acme", industry="Healthcare")),
+        (prospect, CompanyData(name="Acme")),
+        (prospect, CompanyData(name="Acme", technography="Outreach.io")),
+        (prospect, CompanyData(name="Acme", technography="Outreach.io")),
+    ]
+    themes = [None, None, None, None, None, "social_proof", "not_a_theme"]
+
+    choices = scorer.score_batch(records, themes)
+
+    assert [choice.theme for choice in choices] == [
+        "competitive_displace", "personal_achievement", "micro_win", "risk_compliance",
+        "thought_leadership_give", "social_proof", "competitive_displace",
+    ]
+    assert choices[0].anchor_signal == "Outreach.io"
+    assert choices[2].anchor_signal == "2 months into the VP of Sales role"
+    # A requested theme without its own signal keeps the best anchor found
+    assert choices[5].anchor_signal == "Outreach.io"
+    # Scoring a batch gives the same choices as scoring one by one
+    assert choices[:5] == [scorer.score(*record) for record in records[:5]]
+
+
+def test_system_prompt_keeps_only_the_chosen_theme(scorer):
+    prompt = scorer.system_prompt(SYSTEM_PROMPT, "pain_first")
+
+    assert "THEME CANDIDATES" not in prompt
+    assert "SELECTION LOGIC" not in prompt
+    assert prompt.index("## THEME\nUse the theme pain_first") < prompt.index("## OUTPUT FORMAT")
+    assert '"theme_used": "pain_first"' in prompt
+    assert scorer.system_prompt(SYSTEM_PROMPT, "pain_first") is prompt
+
+    appended = scorer.system_prompt("You are a copywriter.", "micro_win")
+    assert appended.startswith("You are a copywriter.\n\n## THEME\nUse the theme micro_win")
+
+
+@pytest.mark.asyncio
+async def test_generate_email_sends_and_reports_the_local_theme(generator):  # noqa: F811
+    generator.prompt_manager.render_prompt.return_value = {"system_prompt": SYSTEM_PROMPT, "user_prompt": "user"}
+    request = EmailRequest(
+        prospect=PROSPECT,
+        company={"name": "TechNova", "recent_news": "Launched an enterprise product line"},
+    )
+
+    email_data = await generator.generate_email(request)
+
+    messages = generator.async_client.chat.completions.create.call_args.kwargs["messages"]
+    assert "Use the theme trigger_event" in messages[0]["content"]
+    assert "THEME CANDIDATES" not in messages[0]["content"]
+    assert messages[1]["content"].endswith(
+        "## THEME\n- theme: trigger_event\n- anchor_signal: Launched an enterprise product line"
+    )
+    assert email_data["theme_used"] == "trigger_event"
+    assert email_data["anchor_signal"] == "Launched an enterprise product line"
@@ -0,0 +1,78 @@
+# tests/test_thread_store.py
+from unittest.mock import patch
+
+import pytest
+
+from src.api.models import ThreadRequest
+from src.services.thread_store import ThreadNotFoundError, create_thread_store
+
+REQUEST = ThreadRequest(
+    prospect={"first_name": "Sarah", "last_name": "Johnson", "job_title": "VP of Sales"},
+    company={"company_name": "TechNova Solutions", "industry": "SaaS"},
+    cta={"ask": "15-min chat next Tuesday?"},
+)
+EMAIL = {
+    "step_number": 1,
+    "theme_used": "growth",
+    "anchor_signal": "hiring burst",
+    "subject_line": "Scaling the sales team",
+    "email_body": "Hi Sarah,\n\nSaw the hiring burst.",
+}
+
+
+@pytest.fixture(params=["memory://", "sqlite:///:memory:", "file"])
+def store(request, tmp_path):
+    url = f"sqlite:///{tmp_path / 'threads.db'}" if request.param == "file" else request.param
+    return create_thread_store(url, ttl_seconds=60, max_entries=10)
+
+
+def test_thread_round_trip(store):
+    """Test that a thread keeps its context and appended emails"""
+    thread = store.create(REQUEST)
+    assert thread.thread_id.startswith("thr_")
+    assert thread.next_step() == 1
+
+    store.append_email(thread.thread_id, EMAIL)
+    store.update_request(thread.thread_id, REQUEST.with_signals(company={"recent_news": "New office"}))
+
+    loaded = store.get(thread.thread_id)
+    assert loaded.emails == [EMAIL]
+    assert loaded.request.company.name == "TechNova Solutions"
+    assert loaded.request.company.recent_news == "New office"
+    assert loaded.next_step() == 2
+    assert loaded.metadata().email_history == "Email 1\nSubject: Scaling the sales team\n\nHi Sarah,\n\nSaw the hiring burst."
+
+    email_request = loaded.request.to_email_request(loaded.metadata(theme="growth"))
+    assert email_request.prospect.first_name == "Sarah"
+    assert email_request.cta.ask == "15-min chat next Tuesday?"
+    assert email_request.metadata.step_number == 2
+
+
+def test_threads_expire(store):
+    """Test that unknown and expired threads are not found"""
+    thread = store.create(REQUEST)
+    with pytest.raises(ThreadNotFoundError):
+        store.get("thr_unknown")
+    with pytest.raises(ThreadNotFoundError):
+        store.append_email("thr_unknown", EMAIL)
+
+    with patch("src.services.thread_store.time.time", return_value=10 ** 12):
+        with pytest.raises(ThreadNotFoundError):
+            store.get(thread.thread_id)
+
+
+def test_imported_history_counts_as_earlier_steps():
+    """Test that emails sent before the thread existed come before its own"""
+    store = create_thread_store("memory://", ttl_seconds=60, max_entries=10)
+    request = REQUEST.model_copy(update={"email_history": "Email 1\nSubject: Hello\n\nHi Sarah, first note."})
+    thread = store.create(request)
+    store.append_email(thread.thread_id, {**EMAIL, "step_number": 2})
+
+    assert thread.next_step() == 3
+    assert thread.email_history().startswith("Email 1\nSubject: Hello")
+    assert "Email 2\nSubject: Scaling the sales team" in thread.email_history()
+
+
+def test_unknown_thread_store_url():
+    with pytest.raises(ValueError):
+        create_thread_store("redis://localhost", ttl_seconds=60, max_entries=10)
@@ -0,0 +1,87 @@
+# tests/test_tracing.py
+import asyncio
+import contextvars
+import threading
+
+import pytest
+from unittest.mock import patch
+
+from src.utils import tracing
+from src.utils.tracing import TraceBuffer
+
+
+def test_trace_buffer_drops_when_full_and_flushes():
+    release = threading.Event()
+    sent = []
+
+    def send(operation, kwargs):
+        release.wait()
+        sent.append((operation, kwargs["id"]))
+
+    buffer = TraceBuffer(send, max_size=2, idle_delay=0.0)
+    dropped_before = tracing.TRACES_DROPPED.total()
+
+    # The worker holds the first operation, the queue holds two more
+    results = [buffer.put("create", {"id": i}) for i in range(4)]
+    assert results.count(False) >= 1
+    assert tracing.TRACES_DROPPED.total() - dropped_before == results.count(False)
+    assert buffer.flush(timeout=0.05) is False
+
+    release.set()
+    assert buffer.flush(timeout=2.0) is True
+    assert len(buffer) == 0
+    assert [operation_id for _, operation_id in sent] == [i for i, ok in enumerate(results) if ok]
+
+
+def test_trace_buffer_waits_for_idle_before_export():
+    sent = threading.Event()
+    buffer = TraceBuffer(lambda operation, kwargs: sent.set(), max_size=10, idle_delay=5.0)
+
+    buffer.call_started()
+    buffer.put("create", {})
+    assert not sent.wait(0.1)
+
+    buffer.call_finished()
+    assert sent.wait(2.0)
+    assert buffer.flush(timeout=2.0)
+
+
+def test_sampling_per_route():
+    with patch.object(tracing.settings, "LANGSMITH_TRACING", "true"), \
+            patch.object(tracing.settings, "TRACING_SAMPLE_RATE", 0.0), \
+            patch.object(tracing.settings, "TRACING_ROUTE_SAMPLE_RATES", {"generate-email": 1.0}):
+        assert tracing.should_sample("generate-email") is True
+        assert tracing.should_sample("company-description") is False
+        assert tracing.should_sample() is False
+
+    with patch.object(tracing.settings, "LANGSMITH_TRACING", "false"), \
+            patch.object(tracing.settings, "TRACING_SAMPLE_RATE", 1.0):
+        assert tracing.should_sample("generate-email") is False
+
+
+def test_sampling_decision_is_per_request():
+    def decide(route):
+        tracing.sample_route(route)
+        return tracing.is_sampled()
+
+    with patch.object(tracing.settings, "LANGSMITH_TRACING", "true"), \
+            patch.object(tracing.settings, "TRACING_ROUTE_SAMPLE_RATES", {"traced": 1.0, "untraced": 0.0}):
+        assert contextvars.copy_context().run(decide, "traced") is True
+        assert contextvars.copy_context().run(decide, "untraced") is False
+
+
+@pytest.mark.asyncio
+async def test_unsampled_call_bypasses_langsmith():
+    @tracing.traceable
+    async def work(value):
+        await asyncio.sleep(0)
+        return value * 2
+
+    async def call():
+        tracing.sample_route("untraced")
+        return await work(21)
+
+    with patch.object(tracing.settings, "LANGSMITH_TRACING", "true"), \
+            patch.object(tracing.settings, "TRACING_ROUTE_SAMPLE_RATES", {"untraced": 0.0}), \
+            patch.object(tracing, "_get_client", side_effect=AssertionError("langsmith used")):
+        assert await call() == 42